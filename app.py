@@ -4,97 +4,258 @@ A Streamlit web application for extracting structured data from insurance forms
 using Azure Document Intelligence OCR and Azure OpenAI GPT.
 """
 
+from services.environment import configure
+
+# Load .env and start logging before services.config reads the environment
+configure()
+
 import streamlit as st
-from services.document_ocr import analyze_layout, postprocess_ocr
-from services.openai_helpers import init_openai_client, detect_language, extract_form_data
-from services.config import DOCUMENT_ENDPOINT, DOCUMENT_KEY, OPENAI_ENDPOINT, OPENAI_KEY
+from services.document_ocr import analyze_layout, document_pages, PageText
+from services.openai_helpers import detect_language
+from services.pages import prepare_pages, join_pages, extract_pages, detect_and_extract_pages, stream_extract_pages
+from services.clients import clients
+from services.config import (
+    DOCUMENT_ENDPOINT, DOCUMENT_KEY, OPENAI_ENDPOINT, OPENAI_KEY, EXTRACTION_MODE,
+    APP_CACHE_TTL_SECONDS, APP_CACHE_MAX_ENTRIES, PARSER_SERVICE_URL, STREAM_EXTRACTION, WARMUP
+)
 from services.validation import validate_completeness
+from services.confidence import WordArrays, confidence_report, flag_field
 from services.logger_config import logging
 from services.monitoring import monitoring
-import json
+from services.metrics_exporter import start_metrics_exporter
+from services.tracing import trace_document, span
+from services.results_store import results_store
+from services.service_client import ParserServiceClient
+from services.warmup import warm_up
+from dataclasses import replace
+import hashlib
 import time
 
 logger = logging.getLogger(__name__)
 
+# Prometheus exporter (no-op unless METRICS_PORT is set; started once across Streamlit reruns)
+start_metrics_exporter()
+
+
+@st.cache_resource
+def get_document_client():
+    """Shared Document Intelligence client, created once per server process."""
+    return clients.get_document_client(DOCUMENT_ENDPOINT, DOCUMENT_KEY)
+
+
+@st.cache_resource
+def get_openai_client():
+    """Shared OpenAI client, created once per server process."""
+    return clients.get_openai_client(OPENAI_ENDPOINT, OPENAI_KEY)
+
+
+@st.cache_resource
+def get_service_client():
+    """Client of the parsing service (service mode), created once per server process."""
+    return ParserServiceClient(PARSER_SERVICE_URL)
+
+
+@st.cache_resource(show_spinner="Warming up...")
+def warm_up_process() -> dict:
+    """Warm-up (WARMUP), run once per server process; service mode only needs the templates."""
+    return warm_up(create_clients=not PARSER_SERVICE_URL)
+
+
+# Pipeline stages are memoized by the upload's SHA-256 (underscore arguments are not hashed),
+# so reruns and repeated uploads never call Azure again. They must not call Streamlit
+# elements: cached functions replay those on every cache hit.
+@st.cache_data(show_spinner=False, ttl=APP_CACHE_TTL_SECONDS, max_entries=APP_CACHE_MAX_ENTRIES)
+def run_ocr(file_hash: str, _file_bytes: bytes) -> tuple[list[PageText], float, int, WordArrays]:
+    """OCR and post-process a document; returns (relevant_pages, average_confidence, page_count, word_arrays)."""
+    with monitoring.time_stage("ocr"):
+        result, _, avg_confidence = analyze_layout(
+            file_object=_file_bytes,
+            client=get_document_client()
+        )
+
+    with monitoring.time_stage("postprocess"):
+        all_pages = document_pages(result)
+        pages = prepare_pages(all_pages)
+    # Page layouts are SDK models; only the text and word arrays are needed (and pickled) from here on
+    return [replace(page, layout=None) for page in pages], avg_confidence, len(all_pages), WordArrays.from_result(result)
+
+
+@st.cache_data(show_spinner=False, ttl=APP_CACHE_TTL_SECONDS, max_entries=APP_CACHE_MAX_ENTRIES)
+def run_language_detection(file_hash: str, _pages: list[PageText]) -> str:
+    with monitoring.time_stage("language_detection"):
+        return detect_language(join_pages(_pages), get_openai_client())
+
+
+@st.cache_data(show_spinner=False, ttl=APP_CACHE_TTL_SECONDS, max_entries=APP_CACHE_MAX_ENTRIES)
+def run_extraction(file_hash: str, extraction_mode: str, language: str, _pages: list[PageText]) -> tuple[str, dict]:
+    """Extract form data; returns (language, form_data). `language` is detected here in 'combined' mode."""
+    if extraction_mode == "combined":
+        with monitoring.time_stage("combined_extraction"):
+            language, form_data = detect_and_extract_pages(_pages, get_openai_client())
+    else:
+        with monitoring.time_stage("extraction"):
+            form_data = extract_pages(_pages, language, get_openai_client())
+    return language, form_data
+
+
+def stream_extraction(file_hash: str, language: str, pages: list[PageText], words: WordArrays) -> dict:
+    """
+    Extract form data, listing each field with its checks as soon as the model writes it.
+
+    Streamed results are kept in the session, so reruns do not request them again.
+    """
+    streamed = st.session_state.setdefault("streamed_extractions", {})
+    if (file_hash, language) in streamed:
+        return streamed[(file_hash, language)]
+
+    placeholder = st.empty()
+    lines = []
+    with monitoring.time_stage("extraction"):
+        stream = stream_extract_pages(pages, language, get_openai_client())
+        for path, value in stream:
+            field = ".".join(map(str, path))
+            if not isinstance(value, str) or value == "":
+                lines.append(f"- ❗ `{field}`: missing")
+            elif flag_field(words, field, value) is not None:
+                lines.append(f"- 🔎 `{field}`: {value}")
+            else:
+                lines.append(f"- `{field}`: {value}")
+            placeholder.markdown("\n".join(lines))
+    placeholder.empty()
+    streamed[(file_hash, language)] = stream.result
+    return stream.result
+
+
 # Configure Streamlit page settings
 st.set_page_config(page_title="Form Parser", layout="wide")
 st.title("🧾 Form Parser: Azure OCR + GPT")
 
+if WARMUP:
+    warm_up_process()
+
+# Extraction mode selector (two requests vs. one combined request)
+extraction_mode = st.sidebar.radio(
+    "Extraction mode",
+    options=["two_step", "combined"],
+    index=0 if EXTRACTION_MODE != "combined" else 1,
+    format_func=lambda mode: "Detect, then extract" if mode == "two_step" else "Single combined request"
+)
+
 # File upload component
 uploaded_file = st.file_uploader("Upload PDF or Image", type=["pdf", "jpg", "jpeg", "png"])
 
 # Main file operations and API calls
 if uploaded_file:
     start_time = time.time()
-    logger.info(f"Processing uploaded file: {uploaded_file.name}")
-    try:
-        st.info("Processing document...")
-
-        # Step 1: OCR with Azure Document Intelligence
-        ocr_start = time.time()
-        result, full_text, avg_confidence = analyze_layout(
-            file_object=uploaded_file,
-            endpoint=DOCUMENT_ENDPOINT, 
-            key=DOCUMENT_KEY
-        )
-        ocr_duration = (time.time() - ocr_start) * 1000
-        monitoring.log_api_call("azure_ocr", ocr_duration, success=True)
-
-        # Post-process OCR results
-        full_text = postprocess_ocr(full_text, filepath="services/unecessary_words.txt")
-
-        st.write(f"🔍 **Average OCR Word Confidence**: {avg_confidence:.2f}")
-
-        # Step 2: Init OpenAI
-        openai_client = init_openai_client(OPENAI_ENDPOINT, OPENAI_KEY)
+    with trace_document(file_name=uploaded_file.name) as trace:
+        with span("upload"):
+            file_bytes = uploaded_file.getvalue()
+            file_hash = hashlib.sha256(file_bytes).hexdigest()
+        trace.root.attributes["file_hash"] = file_hash[:12]
+        logger.info(f"Processing uploaded file: {uploaded_file.name} ({file_hash[:12]})")
+        try:
+            with st.status("Processing document...") as status:
+                if PARSER_SERVICE_URL:
+                    # Service mode: queue workers run the pipeline, so a page refresh never loses work
+                    status.update(label="Submitting to the parsing service...")
+                    result = get_service_client().parse(
+                        file_bytes, filename=uploaded_file.name, extraction_mode=extraction_mode,
+                        on_status=lambda job: status.update(label=f"Parsing service: job {job['status']}...")
+                    )
+                    language, avg_confidence = result["language"], result["ocr_confidence"]
+                    form_data, validation_result = result["form_data"], result["validation"]
+                    confidence = result["confidence"]
+                    st.write("✔️ Processed by the parsing service")
+                else:
+                    # Step 1: OCR with Azure Document Intelligence
+                    status.update(label="Running OCR...")
+                    pages, avg_confidence, page_count, words = run_ocr(file_hash, file_bytes)
+                    st.write(f"✔️ OCR complete (average word confidence {avg_confidence:.2f}, "
+                             f"{len(pages)} of {page_count} pages with form data)")
 
-        # Step 3: Detect language
-        gpt_start = time.time()
-        language = detect_language(full_text, openai_client)
-        st.success(f"Detected language: {language}")
+                    if extraction_mode == "combined":
+                        # Steps 2+3: Detect language and extract form data in one request
+                        status.update(label="Detecting language and extracting form data...")
+                        language, form_data = run_extraction(file_hash, extraction_mode, None, pages)
+                        st.write(f"✔️ Form data extracted ({language})")
+                    else:
+                        # Step 2: Detect language
+                        status.update(label="Detecting language...")
+                        language = run_language_detection(file_hash, pages)
+                        st.write(f"✔️ Language detected: {language}")
 
-        # Step 4: Extract structured form data via GPT
-        form_data = extract_form_data(full_text, language, openai_client)
-        gpt_duration = (time.time() - gpt_start) * 1000
-        monitoring.log_api_call("openai", gpt_duration, success=True)
+                        # Step 3: Extract structured form data via GPT
+                        status.update(label="Extracting form data...")
+                        if STREAM_EXTRACTION:
+                            form_data = stream_extraction(file_hash, language, pages, words)
+                        else:
+                            language, form_data = run_extraction(file_hash, extraction_mode, language, pages)
+                        st.write("✔️ Form data extracted")
 
-        # Step 5: Validate completeness
-        validation_result = validate_completeness(form_data)
+                    # Step 4: Validate completeness
+                    status.update(label="Validating completeness...")
+                    with monitoring.time_stage("validation"):
+                        validation_result = validate_completeness(form_data)
+                    with monitoring.time_stage("confidence_analysis"):
+                        confidence = confidence_report(words, form_data)
+                status.update(label="Document processed", state="complete", expanded=False)
 
-        # Log overall metrics
-        total_duration = (time.time() - start_time) * 1000
-        monitoring.log_document_processing(
-            ocr_confidence=avg_confidence,
-            form_completeness=validation_result["completeness_score"],
-            duration_ms=total_duration
-        )
-
-        # Split layout into two columns
-        col1, col2 = st.columns(2)
+            st.write(f"🔍 **Average OCR Word Confidence**: {avg_confidence:.2f}")
+            st.success(f"Detected language: {language}")
 
-        with col1:
-            st.subheader("📋 Extracted Form Data")
-            st.json(form_data)
+            # Log overall metrics once per document and mode per session, not on every rerun
+            # (in service mode the workers record them)
+            processed = st.session_state.setdefault("processed_documents", set())
+            if not PARSER_SERVICE_URL and (file_hash, extraction_mode) not in processed:
+                processed.add((file_hash, extraction_mode))
+                monitoring.log_confidence_review(len(confidence["flagged_fields"]))
+                total_duration = (time.time() - start_time) * 1000
+                monitoring.log_document_processing(
+                    ocr_confidence=avg_confidence,
+                    form_completeness=validation_result["completeness_score"],
+                    duration_ms=total_duration,
+                    extraction_mode=extraction_mode
+                )
+                if results_store is not None:
+                    results_store.append(file_hash[:12], {
+                        "extraction_mode": extraction_mode,
+                        "language": language,
+                        "ocr_confidence": avg_confidence,
+                        "form_data": form_data,
+                        "validation": validation_result,
+                        "duration_ms": total_duration
+                    })
 
-        with col2:
-            st.subheader("✅ Validation Summary")
-            st.write(f"🧮 **Completeness Score:** {validation_result['completeness_score'] * 100:.0f}% ({validation_result['total_fields']-validation_result['missing_count']}/{validation_result['total_fields']})")
-            if validation_result["missing_fields"]:
-                st.warning(f"❗ **Missing Fields** ({validation_result['missing_count']}):")
-                for field in validation_result["missing_fields"]:
-                    st.markdown(f"- `{field}`")
-            else:
-                st.success("🎉 All required fields are filled!")
+            # Split layout into two columns
+            col1, col2 = st.columns(2)
 
-        logger.info("Document processing completed successfully")
+            with col1:
+                st.subheader("📋 Extracted Form Data")
+                st.json(form_data)
 
-    except Exception as e:
-        monitoring.log_error(
-            error_type=type(e).__name__,
-            error_message=str(e)
-        )
-        st.error(f"Error processing document: {str(e)}")
-        logger.error(f"Application error: {e}")
+            with col2:
+                st.subheader("✅ Validation Summary")
+                st.write(f"🧮 **Completeness Score:** {validation_result['completeness_score'] * 100:.0f}% ({validation_result['total_fields']-validation_result['missing_count']}/{validation_result['total_fields']})")
+                if validation_result["missing_fields"]:
+                    st.warning(f"❗ **Missing Fields** ({validation_result['missing_count']}):")
+                    for field in validation_result["missing_fields"]:
+                        st.markdown(f"- `{field}`")
+                else:
+                    st.success("🎉 All required fields are filled!")
 
+                if confidence["flagged_fields"]:
+                    st.warning(f"🔎 **Fields to Review** ({len(confidence['flagged_fields'])}):")
+                    for flagged in confidence["flagged_fields"]:
+                        reason = ("not found in the OCR text" if flagged["confidence"] is None
+                                  else f"OCR confidence {flagged['confidence']:.2f}")
+                        st.markdown(f"- `{flagged['field']}`: {flagged['value']} ({reason})")
 
+            logger.info("Document processing completed successfully")
 
+        except Exception as e:
+            monitoring.log_error(
+                error_type=type(e).__name__,
+                error_message=str(e)
+            )
+            st.error(f"Error processing document: {str(e)}")
+            logger.error(f"Application error: {e}")
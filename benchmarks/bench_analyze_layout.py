@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for the word-to-line assignment in analyze_layout.
+
+Builds synthetic multi-page layouts and compares the span-indexed assignment
+against the previous per-line scan over every word on the page.
+
+Usage:
+    python -m benchmarks.bench_analyze_layout
+"""
+
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from services.document_ocr import _assemble_text
+
+
+def make_layout(pages: int, lines_per_page: int, words_per_line: int, seed: int = 0) -> list:
+    """
+    Build a synthetic layout shaped like AnalyzeResult.pages.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Lines on each page
+        words_per_line: Words on each line
+
+    Returns:
+        list: Page objects exposing `lines` and `words`
+    """
+    rng = random.Random(seed)
+    offset = 0
+    result = []
+    for _ in range(pages):
+        lines, words = [], []
+        for _ in range(lines_per_page):
+            line_start = offset
+            tokens = []
+            for _ in range(words_per_line):
+                token = "w" * rng.randint(2, 8)
+                words.append(SimpleNamespace(
+                    content=token,
+                    span=SimpleNamespace(offset=offset, length=len(token)),
+                    confidence=rng.uniform(0.6, 1.0)
+                ))
+                tokens.append(token)
+                offset += len(token) + 1
+            lines.append(SimpleNamespace(
+                content=" ".join(tokens),
+                spans=[SimpleNamespace(offset=line_start, length=offset - line_start - 1)]
+            ))
+        rng.shuffle(words)
+        result.append(SimpleNamespace(lines=lines, words=words))
+    return result
+
+
+def _assemble_text_scan(pages, confidence_threshold: float) -> tuple[str, float, int]:
+    """Previous implementation: filter every word of the page for each line."""
+    full_text = ""
+    total_confidence = 0
+    total_words = 0
+    for page in pages:
+        for line in page.lines:
+            words = [word for word in page.words if word.span.offset >= line.spans[0].offset and
+                     (word.span.offset + word.span.length) <= (line.spans[0].offset + line.spans[0].length)]
+            if all(word.confidence >= confidence_threshold for word in words):
+                full_text += line.content + "\n"
+            for word in words:
+                total_confidence += word.confidence
+                total_words += 1
+    return full_text, total_confidence, total_words
+
+
+def _time(func, pages, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pages, 0.8)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=60, help="Lines per page")
+    parser.add_argument("--words", type=int, default=10, help="Words per line")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-baseline", action="store_true", help="Only time the span-indexed version")
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'words':>8} {'indexed ms':>11} {'us/word':>8} {'scan ms':>10} {'speedup':>8}")
+    for pages in (1, 5, 10, 25, 50):
+        layout = make_layout(pages, args.lines, args.words)
+        total_words = pages * args.lines * args.words
+
+        if not args.skip_baseline:
+            text, confidence, words = _assemble_text(layout, 0.8)
+            expected_text, expected_confidence, expected_words = _assemble_text_scan(layout, 0.8)
+            assert (text, words) == (expected_text, expected_words)
+            assert abs(confidence - expected_confidence) < 1e-6 * max(1, expected_words)
+
+        indexed_ms = _time(_assemble_text, layout, args.repeat)
+        per_word_us = indexed_ms * 1000 / total_words
+        if args.skip_baseline:
+            print(f"{pages:>6} {total_words:>8} {indexed_ms:>11.2f} {per_word_us:>8.3f}")
+            continue
+        scan_ms = _time(_assemble_text_scan, layout, args.repeat)
+        print(f"{pages:>6} {total_words:>8} {indexed_ms:>11.2f} {per_word_us:>8.3f} "
+              f"{scan_ms:>10.2f} {scan_ms / indexed_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
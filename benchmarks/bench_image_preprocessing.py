@@ -0,0 +1,91 @@
+"""
+Benchmark for image pre-processing before OCR.
+
+Reports the upload size before and after `preprocess_image` and the CPU time
+it takes. With --live, both payloads are also sent to Azure Document
+Intelligence (credentials from .env, OCR cache bypassed) to compare OCR
+latency and the reported average confidence.
+
+Usage:
+    python -m benchmarks.bench_image_preprocessing
+    python -m benchmarks.bench_image_preprocessing photo1.jpg photo2.png --live
+"""
+
+import argparse
+import random
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from services.image_preprocessing import preprocess_image
+
+
+def make_photo(width: int = 4032, height: int = 3024, seed: int = 0) -> bytes:
+    """Generate a phone-photo-like JPEG of a text page, rotated by its EXIF orientation tag."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (236, 230, 218))
+    draw = ImageDraw.Draw(image)
+    for y in range(120, height - 120, 60):
+        x = 150
+        while x < width - 400:
+            word = rng.randint(60, 300)
+            draw.rectangle((x, y, x + word, y + 28), fill=(40, 40, 48))
+            x += word + rng.randint(30, 80)
+    # Sensor noise is what makes real photos expensive to encode
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.15)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise to display
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def analyze(document_bytes: bytes) -> tuple[float, float]:
+    """Run live OCR on the payload as-is; returns (latency_ms, average_confidence)."""
+    from services.config import DOCUMENT_ENDPOINT, DOCUMENT_KEY
+    from services.document_ocr import analyze_layout
+
+    start = time.perf_counter()
+    _, _, avg_confidence = analyze_layout(file_object=document_bytes, endpoint=DOCUMENT_ENDPOINT,
+                                          key=DOCUMENT_KEY, use_cache=False)
+    return (time.perf_counter() - start) * 1000, avg_confidence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("images", nargs="*", help="Image files (default: a synthetic 12 MP photo)")
+    parser.add_argument("--target-dpi", type=int, default=200)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--max-bytes", type=int, default=0)
+    parser.add_argument("--color", action="store_true", help="Keep color instead of converting to grayscale")
+    parser.add_argument("--live", action="store_true", help="Also compare live Azure OCR on both payloads")
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.images:
+        with open(path, "rb") as f:
+            inputs.append((path, f.read()))
+    if not inputs:
+        inputs.append(("synthetic 4032x3024", make_photo()))
+
+    print(f"{'image':<30} {'original':>12} {'processed':>12} {'saved':>7} {'cpu ms':>8}")
+    for name, data in inputs:
+        start = time.perf_counter()
+        result = preprocess_image(data, target_dpi=args.target_dpi, grayscale=not args.color,
+                                  quality=args.quality, max_bytes=args.max_bytes)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{name[-30:]:<30} {result.original_bytes:>12,} {result.processed_bytes:>12,} "
+              f"{result.bytes_saved / result.original_bytes:>6.0%} {elapsed:>8.1f}")
+
+        if args.live:
+            original_ms, original_confidence = analyze(data)
+            processed_ms, processed_confidence = analyze(result.data)
+            print(f"{'':<30} OCR {original_ms:.0f} ms -> {processed_ms:.0f} ms, "
+                  f"confidence {original_confidence:.3f} -> {processed_confidence:.3f}")
+
+
+if __name__ == "__main__":
+    main()
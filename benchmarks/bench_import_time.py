@@ -0,0 +1,105 @@
+"""
+Import-time benchmark guarding the start-up budget.
+
+Imports each entry module in a fresh interpreter with `python -X importtime`
+and reports its cumulative import time (the best of several runs) and the
+slowest modules it pulled in. The run fails when an entry module exceeds the
+budget or eagerly imports one of the heavy SDKs that are meant to load lazily.
+
+Usage:
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --budget-ms 300 --json imports.json
+    python -m benchmarks.bench_import_time services.worker --top 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ENTRY_MODULES = ("services.config", "services.pipeline", "services.batch", "services.worker", "services.api")
+
+# Imported on first use (services.lazy_imports); an entry module importing them eagerly is a regression
+LAZY_MODULES = ("openai", "httpx", "requests", "azure.core", "azure.ai.documentintelligence",
+                "numpy", "pyarrow", "PIL", "pydantic")
+
+
+def import_profile(module: str) -> list[tuple[str, int, int, int]]:
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) for every module imported, in import order
+    """
+    # Quiet logging so its output does not interleave with the import timings
+    env = {**os.environ, "LOG_LEVEL": "WARNING"}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, env=env, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+
+    profile = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # The header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        profile.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return profile
+
+
+def measure(module: str, repeat: int) -> dict:
+    """Best-of-`repeat` cumulative import time of a module, with its heaviest dependencies."""
+    best = None
+    for _ in range(repeat):
+        profile = import_profile(module)
+        total_us = next(cumulative for name, _, cumulative, depth in profile if name == module and depth == 0)
+        if best is None or total_us < best[0]:
+            best = (total_us, profile)
+    total_us, profile = best
+    imported = {name for name, *_ in profile}
+    return {
+        "module": module,
+        "import_ms": total_us / 1000,
+        "modules_imported": len(profile),
+        "eager_heavy_imports": [name for name in LAZY_MODULES if name in imported],
+        "slowest": [{"module": name, "self_ms": self_us / 1000} for name, self_us, _, _ in
+                    sorted(profile, key=lambda entry: entry[1], reverse=True)]
+    }
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_MODULES), help="Entry modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; the best run counts")
+    parser.add_argument("--budget-ms", type=float, default=500, help="Fail when a module takes longer to import")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imported modules to list per entry module")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    reports = [measure(module, args.repeat) for module in args.modules]
+    failures = []
+    for report in reports:
+        print(f"{report['module']:<20} {report['import_ms']:8.1f} ms  ({report['modules_imported']} modules)")
+        for entry in report["slowest"][:args.top]:
+            print(f"    {entry['self_ms']:7.1f} ms  {entry['module']}")
+        if report["import_ms"] > args.budget_ms:
+            failures.append(f"{report['module']} takes {report['import_ms']:.0f} ms to import "
+                            f"(budget {args.budget_ms:.0f} ms)")
+        if report["eager_heavy_imports"]:
+            failures.append(f"{report['module']} eagerly imports {', '.join(report['eager_heavy_imports'])}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"budget_ms": args.budget_ms, "modules": reports}, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
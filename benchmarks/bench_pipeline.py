@@ -0,0 +1,196 @@
+"""
+Offline end-to-end pipeline benchmark.
+
+Drives `process_document` (OCR, post-processing, language detection,
+extraction and validation) against the fake Azure clients in
+`benchmarks/fakes.py`, and reports throughput, per-stage latency percentiles
+and peak traced memory. No network access or credentials are needed.
+
+Usage:
+    python -m benchmarks.bench_pipeline --documents 200 --workers 8
+    python -m benchmarks.bench_pipeline --async --max-in-flight 100 --throttle-rate 0.05
+    python -m benchmarks.bench_pipeline --layout recorded_result.json --json report.json
+"""
+
+import os
+
+# Benchmark the pipeline itself: no result caches and no log chatter on the hot path
+os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_MODE", "off")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import (
+    CannedResponder, FaultProfile, FakeAsyncDocumentIntelligenceClient, FakeAsyncOpenAIClient,
+    FakeDocumentIntelligenceClient, FakeOpenAIClient, load_analyze_result, synthetic_analyze_result
+)
+from services.monitoring import monitoring
+from services.pipeline import process_document, process_document_async
+
+
+def run_threads(args, document_client, openai_client) -> list:
+    ocr_limiter = threading.BoundedSemaphore(args.ocr_concurrency)
+    llm_limiter = threading.BoundedSemaphore(args.openai_concurrency)
+
+    def run(index: int):
+        try:
+            process_document(
+                f"document-{index}".encode("utf-8"), openai_client,
+                ocr_limiter=ocr_limiter, llm_limiter=llm_limiter,
+                extraction_mode=args.extraction_mode, document_client=document_client
+            )
+            return None
+        except Exception as e:
+            return type(e).__name__
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        return list(executor.map(run, range(args.documents)))
+
+
+async def run_async(args, document_client, openai_client) -> list:
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    ocr_limiter = asyncio.Semaphore(args.ocr_concurrency)
+    llm_limiter = asyncio.Semaphore(args.openai_concurrency)
+
+    async def run(index: int):
+        async with in_flight:
+            try:
+                await process_document_async(
+                    f"document-{index}".encode("utf-8"), openai_client, document_client,
+                    ocr_limiter=ocr_limiter, llm_limiter=llm_limiter, extraction_mode=args.extraction_mode
+                )
+                return None
+            except Exception as e:
+                return type(e).__name__
+
+    return await asyncio.gather(*(run(index) for index in range(args.documents)))
+
+
+def build_report(args, outcomes: list, elapsed: float, peak_bytes: int, ocr_faults: dict, openai_faults: dict) -> dict:
+    snapshot = monitoring.snapshot()
+    errors = {}
+    for outcome in outcomes:
+        if outcome is not None:
+            errors[outcome] = errors.get(outcome, 0) + 1
+    succeeded = len(outcomes) - sum(errors.values())
+    stages = {"document": snapshot["performance"]["document_latency_ms"], **snapshot["stages"]}
+    return {
+        "mode": "async" if args.use_async else "threads",
+        "extraction_mode": args.extraction_mode,
+        "documents": len(outcomes),
+        "succeeded": succeeded,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "docs_per_sec": succeeded / elapsed if elapsed else 0.0,
+        "peak_memory_mb": peak_bytes / (1024 * 1024) if peak_bytes is not None else None,
+        "stages": {
+            stage: {key: histogram[key] for key in ("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")}
+            for stage, histogram in stages.items() if histogram["count"]
+        },
+        "pages": snapshot["pages"],
+        "injected_faults": {"azure_ocr": ocr_faults, "openai": openai_faults}
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['documents']} documents ({report['mode']}, {report['extraction_mode']}): "
+          f"{report['succeeded']} ok in {report['elapsed_s']:.2f}s -> {report['docs_per_sec']:.1f} docs/sec")
+    if report["peak_memory_mb"] is not None:
+        print(f"peak traced memory: {report['peak_memory_mb']:.1f} MB")
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+    print(f"pages: {report['pages']}")
+    print(f"injected faults: {report['injected_faults']}")
+    print(f"\n{'stage':<20} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<20} {stats['count']:>6} {stats['mean_ms']:>9.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="Worker threads (thread mode)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Use the asyncio pipeline")
+    parser.add_argument("--max-in-flight", type=int, default=100, help="Documents in flight (async mode)")
+    parser.add_argument("--ocr-concurrency", type=int, default=4)
+    parser.add_argument("--openai-concurrency", type=int, default=4)
+    parser.add_argument("--extraction-mode", choices=["two_step", "combined"], default="two_step")
+    parser.add_argument("--layout", help="Recorded AnalyzeResult JSON to replay (default: synthetic form)")
+    parser.add_argument("--pages", type=int, default=2, help="Pages of the synthetic layout")
+    parser.add_argument("--instruction-pages", type=int, default=0,
+                        help="Trailing instruction pages of the synthetic layout")
+    parser.add_argument("--completions", help="JSON file of recorded responses keyed by prompt name")
+    parser.add_argument("--language", default="Hebrew", help="Language answered by the fake model")
+    parser.add_argument("--ocr-latency-ms", type=float, default=50)
+    parser.add_argument("--openai-latency-ms", type=float, default=30)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a connection error")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls rejected with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows the run down)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    parser.add_argument("--min-docs-per-sec", type=float, help="Exit with status 1 below this throughput")
+    args = parser.parse_args(argv)
+
+    layout = load_analyze_result(args.layout) if args.layout else synthetic_analyze_result(
+        args.pages, seed=args.seed, instruction_pages=args.instruction_pages
+    )
+    recorded = None
+    if args.completions:
+        with open(args.completions, "r", encoding="utf-8") as f:
+            recorded = json.load(f)
+    responder = CannedResponder(recorded, language=args.language, seed=args.seed)
+
+    def profile(latency_ms: float, seed: int) -> FaultProfile:
+        return FaultProfile(latency_ms=latency_ms, jitter=args.jitter, error_rate=args.error_rate,
+                            throttle_rate=args.throttle_rate, retry_after_seconds=args.retry_after, seed=seed)
+
+    if args.use_async:
+        document_client = FakeAsyncDocumentIntelligenceClient(layout, profile(args.ocr_latency_ms, args.seed))
+        openai_client = FakeAsyncOpenAIClient(responder, profile(args.openai_latency_ms, args.seed + 1))
+    else:
+        document_client = FakeDocumentIntelligenceClient(layout, profile(args.ocr_latency_ms, args.seed))
+        openai_client = FakeOpenAIClient(responder, profile(args.openai_latency_ms, args.seed + 1))
+
+    monitoring.log_interval_seconds = None
+    monitoring.reset()
+    if not args.no_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    if args.use_async:
+        outcomes = asyncio.run(run_async(args, document_client, openai_client))
+    else:
+        outcomes = run_threads(args, document_client, openai_client)
+    elapsed = time.perf_counter() - start
+
+    peak_bytes = None
+    if not args.no_memory:
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    report = build_report(args, outcomes, elapsed, peak_bytes,
+                          document_client.injector.stats(), openai_client.injector.stats())
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.min_docs_per_sec is not None and report["docs_per_sec"] < args.min_docs_per_sec:
+        print(f"FAIL: {report['docs_per_sec']:.1f} docs/sec is below {args.min_docs_per_sec}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark for boilerplate stripping in postprocess_ocr.
+
+Scales the number of boilerplate phrases and compares the compiled trie
+matcher against one `str.replace` pass per phrase.
+
+Usage:
+    python -m benchmarks.bench_postprocess
+"""
+
+import argparse
+import random
+import time
+
+from services.postprocessing import compile_phrases
+
+HEBREW_LETTERS = "אבגדהוזחטיכלמנסעפצקרשת"
+
+
+def make_phrases(count: int, rng: random.Random) -> list[str]:
+    """Generate boilerplate-like phrases of 3-8 Hebrew words."""
+    phrases = set()
+    while len(phrases) < count:
+        words = ["".join(rng.choice(HEBREW_LETTERS) for _ in range(rng.randint(2, 6)))
+                 for _ in range(rng.randint(3, 8))]
+        phrases.add(" ".join(words))
+    return list(phrases)
+
+
+def make_text(phrases: list[str], lines: int, rng: random.Random) -> str:
+    """Generate OCR-like text where roughly one line in five is boilerplate."""
+    out = []
+    for _ in range(lines):
+        if rng.random() < 0.2:
+            out.append(rng.choice(phrases))
+        else:
+            out.append(" ".join("".join(rng.choice(HEBREW_LETTERS + "0123456789") for _ in range(rng.randint(2, 7)))
+                                for _ in range(rng.randint(3, 10))))
+    return "\n".join(out)
+
+
+def strip_replace(text: str, phrases: list[str]) -> str:
+    """Previous implementation: one full pass over the text per phrase."""
+    for phrase in phrases:
+        text = text.replace(phrase, "")
+    return text
+
+
+def _time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2000, help="Lines of OCR text")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'phrases':>8} {'compile ms':>11} {'trie ms':>9} {'replace ms':>11} {'speedup':>8}")
+    for count in (5, 50, 200, 500, 1000):
+        phrases = make_phrases(count, rng)
+        text = make_text(phrases, args.lines, rng)
+
+        start = time.perf_counter()
+        pattern = compile_phrases(phrases)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        assert pattern.sub("", text) == strip_replace(text, sorted(phrases, key=len, reverse=True))
+
+        trie_ms = _time(lambda: pattern.sub("", text), args.repeat)
+        replace_ms = _time(lambda: strip_replace(text, phrases), args.repeat)
+        print(f"{count:>8} {compile_ms:>11.2f} {trie_ms:>9.2f} {replace_ms:>11.2f} {replace_ms / trie_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark for the Parquet results store and bulk completeness analytics.
+
+Writes synthetic extraction results of the default form to a temporary
+dataset, then compares `completeness_analytics` over every stored form with
+calling `validate_completeness` on each form dict.
+
+Usage:
+    python -m benchmarks.bench_results_store
+    python -m benchmarks.bench_results_store --documents 1000000 --fill-rate 0.8
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+
+from services.results_store import ResultsStore, completeness_analytics
+from services.template_registry import registry
+from services.validation import validate_completeness
+
+
+def fill_form(template: dict, rng: random.Random, fill_rate: float) -> dict:
+    """Copy a template, filling each field with probability `fill_rate`."""
+    return {key: fill_form(value, rng, fill_rate) if isinstance(value, dict)
+            else ("x" * rng.randint(1, 12) if rng.random() < fill_rate else "")
+            for key, value in template.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--language", default="Hebrew")
+    parser.add_argument("--fill-rate", type=float, default=0.85)
+    parser.add_argument("--distinct", type=int, default=1000, help="Distinct generated forms, reused round-robin")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    template = registry.get_template(args.language).template
+    forms = [fill_form(template, rng, args.fill_rate) for _ in range(args.distinct)]
+    # The per-document loggers would dominate both timings
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ResultsStore(root, flush_rows=100_000, flush_seconds=0)
+        start = time.perf_counter()
+        for index in range(args.documents):
+            store.append(index, {"language": args.language, "form_data": forms[index % len(forms)],
+                                 "extraction_mode": "two_step", "ocr_confidence": 0.9,
+                                 "validation": {"completeness_score": 0.0}, "duration_ms": 0.0})
+        store.close()
+        write_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report = completeness_analytics(root)
+        bulk_s = time.perf_counter() - start
+
+    sample = min(args.documents, 50_000)
+    start = time.perf_counter()
+    for index in range(sample):
+        validate_completeness(forms[index % len(forms)])
+    per_dict_s = (time.perf_counter() - start) * args.documents / sample
+
+    language_report = next(iter(report.values()))[args.language]
+    print(f"documents:           {language_report['documents']:,} ({language_report['fields']} fields)")
+    print(f"append + write:      {write_s:8.2f} s ({args.documents / write_s:,.0f} rows/s)")
+    print(f"bulk analytics:      {bulk_s:8.2f} s ({args.documents / bulk_s:,.0f} rows/s)")
+    print(f"per-dict validation: {per_dict_s:8.2f} s (extrapolated from {sample:,} forms)")
+    print(f"mean completeness:   {language_report['completeness']['mean']:.4f} "
+          f"(p10 {language_report['completeness']['p10']:.4f}, p50 {language_report['completeness']['p50']:.4f})")
+
+
+if __name__ == "__main__":
+    main()
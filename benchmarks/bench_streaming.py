@@ -0,0 +1,56 @@
+"""
+Benchmark for streamed form data extraction.
+
+Runs the same extraction requests through `extract_form_data` and
+`stream_form_data` against the fake OpenAI client (LLM cache off) and reports
+time-to-first-field next to the full completion time. Every streamed result is
+checked against the non-streaming one.
+
+Usage:
+    python -m benchmarks.bench_streaming
+    python -m benchmarks.bench_streaming --requests 50 --openai-latency-ms 4000
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+from benchmarks.fakes import CannedResponder, FakeOpenAIClient, FaultProfile
+from services.openai_helpers import extract_form_data, stream_form_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--language", default="Hebrew")
+    parser.add_argument("--openai-latency-ms", type=float, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text = "שם משפחה: כהן\nשם פרטי: דנה\nמספר זהות: 123456789"
+    profile = FaultProfile(latency_ms=args.openai_latency_ms, jitter=0.0, seed=args.seed)
+    logging.disable(logging.INFO)
+
+    full_ms, first_field_ms, fields = [], [], 0
+    for index in range(args.requests):
+        # Equal seeds make both clients answer with the same completion
+        expected = extract_form_data(text, args.language, FakeOpenAIClient(
+            CannedResponder(language=args.language, seed=args.seed + index), profile), cache_mode="off")
+
+        start = time.perf_counter()
+        stream = stream_form_data(text, args.language, FakeOpenAIClient(
+            CannedResponder(language=args.language, seed=args.seed + index), profile), cache_mode="off")
+        fields += sum(1 for _ in stream)
+        full_ms.append((time.perf_counter() - start) * 1000)
+        first_field_ms.append(stream.first_field_ms)
+        if stream.result != expected:
+            raise SystemExit(f"Request {index}: streamed result differs from the non-streaming one")
+
+    print(f"requests:            {args.requests} ({fields / args.requests:.0f} fields each, results identical)")
+    print(f"time to first field: {statistics.median(first_field_ms):8.0f} ms (median)")
+    print(f"full completion:     {statistics.median(full_ms):8.0f} ms (median)")
+
+
+if __name__ == "__main__":
+    main()
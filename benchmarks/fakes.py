@@ -0,0 +1,363 @@
+"""
+Offline stand-ins for the Azure Document Intelligence and Azure OpenAI clients.
+
+The fakes plug into the `client=` / `document_client=` injection points of the
+OCR helpers and the pipeline. They replay recorded `AnalyzeResult` JSON (or a
+synthetic form layout) and canned chat completions, with configurable latency,
+transient failures and HTTP 429 throttling shaped like the real SDK errors.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import httpx
+from azure.core.exceptions import HttpResponseError, ServiceRequestError
+from openai import APIConnectionError, RateLimitError
+
+from services.template_registry import registry
+
+FORM_LINES = [
+    ("שם משפחה", "כהן"), ("שם פרטי", "דנה"), ("מספר זהות", "123456789"), ("מין", "נקבה"),
+    ("תאריך לידה", "02 03 1984"), ("רחוב", "הרצל"), ("מספר בית", "12"), ("כניסה", "א"),
+    ("דירה", "4"), ("ישוב", "חיפה"), ("מיקוד", "3456712"), ("טלפון נייד", "0541234567"),
+    ("סוג העבודה", "מלצרות"), ("תאריך הפגיעה", "14 04 1999"), ("שעת הפגיעה", "14:30"),
+    ("מקום התאונה", "במפעל"), ("כתובת מקום התאונה", "הנשיא 5 חיפה"),
+    ("תיאור התאונה", "החלקתי על רצפה רטובה ונפלתי על היד"), ("האיבר שנפגע", "יד שמאל"),
+    ("חתימה", "דנה כהן"), ("תאריך מילוי הטופס", "20 04 1999"), ("תאריך קבלת הטופס בקופה", "22 04 1999"),
+]
+
+FORM_VALUES = dict(FORM_LINES)
+
+PAGE_SIZE = (8.5, 11.0)
+
+INSTRUCTION_LINES = [
+    "הנחיות למילוי הטופס",
+    "יש למלא את כל הפרטים בכתב יד ברור ובעט כחול",
+    "הטופס יוגש לסניף המוסד לביטוח לאומי הקרוב למקום מגוריך",
+    "לטופס יש לצרף אישור רפואי על הפגיעה ותיאור מפורט של נסיבות התאונה",
+    "מסירת פרטים לא נכונים היא עבירה על החוק",
+]
+
+
+@dataclass
+class FaultProfile:
+    """Latency and failure injection settings for a fake service."""
+    latency_ms: float = 0.0
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after_seconds: float = 1.0
+    seed: int = 0
+
+
+class _Injector:
+    """Thread-safe random source deciding the delay and failure of each call."""
+
+    def __init__(self, profile: FaultProfile):
+        self.profile = profile
+        self._rng = random.Random(profile.seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def draw(self) -> tuple[float, str]:
+        """Return (delay_seconds, outcome) with outcome 'ok', 'throttle' or 'error'."""
+        profile = self.profile
+        with self._lock:
+            self.calls += 1
+            jitter = self._rng.uniform(-profile.jitter, profile.jitter)
+            roll = self._rng.random()
+        delay = max(0.0, profile.latency_ms * (1 + jitter)) / 1000
+        if roll < profile.throttle_rate:
+            with self._lock:
+                self.throttled += 1
+            # Throttled requests are rejected quickly, before any work is done
+            return delay * 0.1, "throttle"
+        if roll < profile.throttle_rate + profile.error_rate:
+            with self._lock:
+                self.failed += 1
+            return delay, "error"
+        return delay, "ok"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "throttled": self.throttled, "failed": self.failed}
+
+
+def to_namespace(value):
+    """Convert `AnalyzeResult.as_dict()` style JSON into attribute-access objects."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+
+def load_analyze_result(path: str) -> dict:
+    """
+    Load a recorded analyze result.
+
+    Accepts the output of `AnalyzeResult.as_dict()` or an OCR cache entry
+    (`{"result": ..., "full_text": ..., "avg_confidence": ...}`).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("result", data)
+
+
+def synthetic_analyze_result(pages: int = 2, repeat_lines: int = 2, seed: int = 0, instruction_pages: int = 0) -> dict:
+    """
+    Build an `AnalyzeResult.as_dict()` shaped layout of a filled Hebrew form.
+
+    Args:
+        pages: Number of pages
+        repeat_lines: How many times the form lines are repeated on each page
+        seed: Seed for word confidences
+        instruction_pages: How many of the pages (the last ones) are filling instructions
+
+    Returns:
+        dict: Layout with `content` and per-page `lines` and `words`
+    """
+    rng = random.Random(seed)
+    content, result_pages, offset = [], [], 0
+    for page_number in range(1, pages + 1):
+        lines, words = [], []
+        if page_number > pages - instruction_pages:
+            page_lines = INSTRUCTION_LINES * repeat_lines
+        else:
+            page_lines = [f"{label}: {value}" for label, value in FORM_LINES] * repeat_lines
+        page_lines.append(f"עמוד {page_number} מתוך {pages}")
+        # Lines fill a letter-size page top to bottom; words are laid out right to left
+        line_height = PAGE_SIZE[1] / (len(page_lines) + 1)
+        for line_number, text in enumerate(page_lines):
+            line_start = offset
+            top, right = line_height * (line_number + 0.5), PAGE_SIZE[0] - 0.5
+            for token in text.split(" "):
+                left = right - 0.1 * len(token)
+                words.append({
+                    "content": token,
+                    "span": {"offset": offset, "length": len(token)},
+                    "confidence": round(rng.uniform(0.75, 1.0), 3),
+                    "polygon": [right, top, left, top, left, top + line_height, right, top + line_height]
+                })
+                right = left - 0.1
+                offset += len(token) + 1
+            lines.append({"content": text, "spans": [{"offset": line_start, "length": len(text)}]})
+            content.append(text)
+        result_pages.append({"pageNumber": page_number, "width": PAGE_SIZE[0], "height": PAGE_SIZE[1],
+                             "unit": "inch", "lines": lines, "words": words})
+    return {"modelId": "prebuilt-layout", "content": "\n".join(content), "pages": result_pages}
+
+
+def _throttle_error_azure(retry_after: float) -> HttpResponseError:
+    error = HttpResponseError(message="(429) Too Many Requests")
+    error.status_code = 429
+    error.response = SimpleNamespace(status_code=429, headers={"Retry-After": str(retry_after)})
+    return error
+
+
+def _throttle_error_openai(retry_after: float) -> RateLimitError:
+    response = httpx.Response(
+        429, headers={"retry-after": str(retry_after)},
+        request=httpx.Request("POST", "https://fake.openai.azure.com/openai/deployments/fake/chat/completions")
+    )
+    return RateLimitError("Rate limit exceeded", response=response, body=None)
+
+
+class _FakePoller:
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+class _FakeAsyncPoller:
+    def __init__(self, result):
+        self._result = result
+
+    async def result(self):
+        return self._result
+
+
+class FakeDocumentIntelligenceClient:
+    """Replays one analyze result for every document, after the configured latency."""
+
+    def __init__(self, analyze_result: dict = None, profile: FaultProfile = None):
+        self.profile = profile or FaultProfile()
+        self.injector = _Injector(self.profile)
+        self._result = to_namespace(analyze_result or synthetic_analyze_result())
+
+    def _outcome(self) -> tuple:
+        delay, outcome = self.injector.draw()
+        if outcome == "throttle":
+            return delay, _throttle_error_azure(self.profile.retry_after_seconds)
+        if outcome == "error":
+            return delay, ServiceRequestError("Injected connection failure")
+        return delay, None
+
+    def begin_analyze_document(self, model_id: str, **kwargs) -> _FakePoller:
+        delay, error = self._outcome()
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return _FakePoller(self._result)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncDocumentIntelligenceClient(FakeDocumentIntelligenceClient):
+    """Async variant of `FakeDocumentIntelligenceClient`."""
+
+    async def begin_analyze_document(self, model_id: str, **kwargs) -> _FakeAsyncPoller:
+        delay, error = self._outcome()
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return _FakeAsyncPoller(self._result)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def _fill_template(template, rng: random.Random, fill_rate: float, field: str = None):
+    if isinstance(template, dict):
+        return {key: _fill_template(value, rng, fill_rate, key) for key, value in template.items()}
+    if rng.random() >= fill_rate:
+        return ""
+    # Fields of the synthetic form answer with the value printed on it
+    return FORM_VALUES.get(field) or f"value{rng.randint(0, 99)}"
+
+
+class CannedResponder:
+    """
+    Produces completions by recognizing which registered system prompt a request uses.
+
+    Recorded responses (keyed by prompt name: 'language_detection', 'extraction',
+    'combined') are replayed verbatim; otherwise the request's template is filled.
+    """
+
+    def __init__(self, recorded: dict = None, language: str = "Hebrew", fill_rate: float = 0.9, seed: int = 0):
+        self.recorded = recorded or {}
+        self.language = language
+        self.fill_rate = fill_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def respond(self, messages: list[dict]) -> str:
+        system, user = messages[0]["content"], messages[-1]["content"]
+        name = next((name for name in ("language_detection", "extraction", "combined")
+                     if registry.get_prompt(name) == system), None)
+        if name in self.recorded:
+            recorded = self.recorded[name]
+            return recorded if isinstance(recorded, str) else json.dumps(recorded, ensure_ascii=False)
+
+        with self._lock:
+            if name == "language_detection":
+                return self.language
+            if name == "extraction":
+                template = json.loads(user.split("JSON template:\n", 1)[1])
+                return json.dumps(_fill_template(template, self._rng, self.fill_rate), ensure_ascii=False)
+            if name == "combined":
+                templates = json.loads(user.split("JSON templates by language:\n", 1)[1])
+                form = _fill_template(templates[self.language], self._rng, self.fill_rate)
+                return json.dumps({"language": self.language, "form": form}, ensure_ascii=False)
+        raise ValueError("Unrecognized system prompt in fake chat completion request")
+
+
+def _completion(content: str, messages: list[dict]) -> SimpleNamespace:
+    prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(content) // 4,
+                              total_tokens=prompt_tokens + len(content) // 4)
+    )
+
+
+# Share of a fake completion's latency spent before the first streamed token
+FIRST_TOKEN_SHARE = 0.1
+STREAM_CHUNK_CHARS = 8
+
+
+class _FakeStream:
+    """Iterates a completion as `stream=True` chunks, spreading the generation time across them."""
+
+    def __init__(self, completion: SimpleNamespace, generation_seconds: float, include_usage: bool):
+        self.completion = completion
+        self.generation_seconds = generation_seconds
+        self.include_usage = include_usage
+
+    def __iter__(self):
+        content = self.completion.choices[0].message.content
+        pieces = [content[start:start + STREAM_CHUNK_CHARS] for start in range(0, len(content), STREAM_CHUNK_CHARS)]
+        for index, piece in enumerate(pieces):
+            time.sleep(self.generation_seconds / len(pieces))
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=piece),
+                                         finish_reason="stop" if index == len(pieces) - 1 else None)],
+                usage=None
+            )
+        if self.include_usage:
+            yield SimpleNamespace(choices=[], usage=self.completion.usage)
+
+    def close(self):
+        pass
+
+
+class FakeOpenAIClient:
+    """Exposes `chat.completions.create` like `AzureOpenAI`, answering from a `CannedResponder`."""
+
+    def __init__(self, responder: CannedResponder = None, profile: FaultProfile = None):
+        self.profile = profile or FaultProfile()
+        self.injector = _Injector(self.profile)
+        self.responder = responder or CannedResponder()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _outcome(self) -> tuple:
+        delay, outcome = self.injector.draw()
+        if outcome == "throttle":
+            return delay, _throttle_error_openai(self.profile.retry_after_seconds)
+        if outcome == "error":
+            return delay, APIConnectionError(request=httpx.Request("POST", "https://fake.openai.azure.com"))
+        return delay, None
+
+    def _create(self, messages: list[dict], stream: bool = False, stream_options: dict = None, **kwargs):
+        delay, error = self._outcome()
+        if stream and error is None:
+            time.sleep(delay * FIRST_TOKEN_SHARE)
+            return _FakeStream(_completion(self.responder.respond(messages), messages),
+                               delay * (1 - FIRST_TOKEN_SHARE), bool((stream_options or {}).get("include_usage")))
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return _completion(self.responder.respond(messages), messages)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncOpenAIClient(FakeOpenAIClient):
+    """Async variant of `FakeOpenAIClient`."""
+
+    async def _create(self, messages: list[dict], **kwargs):
+        delay, error = self._outcome()
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return _completion(self.responder.respond(messages), messages)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
@@ -0,0 +1,189 @@
+"""
+HTTP submission API for service mode.
+Accepts documents into the durable job queue and serves job status and
+results; worker processes (`python -m services.worker`) do the processing.
+
+Endpoints:
+    POST /jobs?filename=&extraction_mode=&form_type=   raw document bytes as the body
+    GET  /jobs/<id>                                    job status
+    GET  /jobs/<id>/result?wait=<seconds>              result (long-polls up to MAX_WAIT_SECONDS)
+    POST /jobs/<id>/requeue                            queue a dead-lettered job again
+    GET  /healthz                                      liveness and job counts
+
+Usage:
+    python -m services.api --host 0.0.0.0 --port 8080
+"""
+
+from services.environment import configure
+
+if __name__ == "__main__":
+    configure()  # Before services.config reads the environment
+
+from services.logger_config import logging
+from services.config import API_HOST, API_PORT, API_MAX_UPLOAD_BYTES, JOB_DB_PATH, WARMUP
+from services.job_queue import Job, JobQueue
+from services.pipeline import EXTRACTION_MODES
+from services.template_registry import registry
+from services.warmup import warm_up
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import json
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT_SECONDS = 60
+WAIT_POLL_SECONDS = 0.25
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/result|/requeue)?$")
+
+
+def create_server(queue: JobQueue, host: str = API_HOST, port: int = API_PORT,
+                  max_upload_bytes: int = API_MAX_UPLOAD_BYTES) -> ThreadingHTTPServer:
+    """
+    Build the API server (call `serve_forever` to run it).
+
+    Args:
+        queue: Job queue shared with the workers
+        host: Interface to bind
+        port: Port to listen on (0 picks a free port)
+        max_upload_bytes: Largest accepted document
+
+    Returns:
+        ThreadingHTTPServer: The bound server
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path == "/jobs":
+                self._submit(parse_qs(url.query))
+                return
+            match = _JOB_PATH.match(url.path)
+            if match and match.group(2) == "/requeue":
+                if not queue.requeue_dead(match.group(1)):
+                    self._send(409, {"error": "Job is not dead-lettered"})
+                    return
+                self._send(200, queue.get(match.group(1)).to_dict())
+                return
+            self._send(404, {"error": "Not found"})
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/healthz":
+                self._send(200, {"status": "ok", "jobs": queue.stats()})
+                return
+            match = _JOB_PATH.match(url.path)
+            if not match or match.group(2) == "/requeue":
+                self._send(404, {"error": "Not found"})
+                return
+            job = queue.get(match.group(1))
+            if job is None:
+                self._send(404, {"error": "Unknown job"})
+                return
+            if match.group(2) == "/result":
+                self._result(job, parse_qs(url.query))
+            else:
+                self._send(200, job.to_dict())
+
+        def _submit(self, query: dict):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                self._send(411, {"error": "A document body with Content-Length is required"})
+                return
+            if length > max_upload_bytes:
+                self._send(413, {"error": f"Documents are limited to {max_upload_bytes} bytes"})
+                return
+
+            options = {}
+            extraction_mode = query.get("extraction_mode", [None])[0]
+            if extraction_mode is not None:
+                if extraction_mode not in EXTRACTION_MODES:
+                    self._send(400, {"error": f"extraction_mode must be one of {EXTRACTION_MODES}"})
+                    return
+                options["extraction_mode"] = extraction_mode
+            form_type = query.get("form_type", [None])[0]
+            if form_type is not None:
+                if form_type not in registry.form_types():
+                    self._send(400, {"error": f"Unknown form_type '{form_type}'"})
+                    return
+                options["form_type"] = form_type
+
+            document = self.rfile.read(length)
+            try:
+                job = queue.submit(document, filename=query.get("filename", [None])[0], options=options)
+            except Exception as e:
+                logger.error(f"Failed to submit job: {e}")
+                self._send(503, {"error": "Could not queue the document"})
+                return
+            self._send(200 if job.status == "done" else 202, job.to_dict(),
+                       headers={"Location": f"/jobs/{job.id}"})
+
+        def _result(self, job: Job, query: dict):
+            try:
+                wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT_SECONDS)
+            except ValueError:
+                self._send(400, {"error": "wait must be a number of seconds"})
+                return
+            deadline = time.monotonic() + wait
+            while job.status in ("queued", "running") and time.monotonic() < deadline:
+                time.sleep(WAIT_POLL_SECONDS)
+                job = queue.get(job.id)
+
+            if job.status == "done":
+                self._send(200, {**job.to_dict(), "result": job.result})
+            elif job.status == "dead":
+                self._send(409, job.to_dict())
+            else:
+                self._send(202, job.to_dict())
+
+        def _send(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logger.error(f"Could not start the API on {host}:{port}: {e}")
+        raise
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the document submission API.")
+    parser.add_argument("--host", default=API_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Port to listen on")
+    parser.add_argument("--db", default=JOB_DB_PATH, help="Job queue database")
+    parser.add_argument("--warmup", action=argparse.BooleanOptionalAction, default=WARMUP,
+                        help="Load templates before serving (the API itself never calls Azure)")
+    args = parser.parse_args(argv)
+
+    if args.warmup:
+        warm_up(create_clients=False)
+    queue = JobQueue(args.db)
+    server = create_server(queue, args.host, args.port)
+    logger.info(f"Serving the parser API on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
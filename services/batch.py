@@ -0,0 +1,307 @@
+"""
+Headless batch processing of insurance forms.
+Runs the parsing pipeline over a directory, glob or JSONL manifest with a
+bounded worker pool and streams results to a JSONL file, resuming from a
+checkpoint of finished documents.
+
+Usage:
+    python -m services.batch forms/ --output results.jsonl --workers 8
+    python -m services.batch forms/ --output results.jsonl --async --max-in-flight 200
+"""
+
+from services.environment import configure
+
+if __name__ == "__main__":
+    configure()  # Before services.config reads the environment
+
+from services.logger_config import logging
+from services.config import (
+    OPENAI_ENDPOINT, OPENAI_KEY, BATCH_WORKERS, OCR_CONCURRENCY, OPENAI_CONCURRENCY, ASYNC_MAX_IN_FLIGHT,
+    EXTRACTION_MODE, METRICS_PORT, RESULTS_STORE_DIR
+)
+from services.openai_helpers import init_openai_client
+from services.pipeline import process_document, process_documents_async
+from services.monitoring import monitoring
+from services.tracing import trace_document
+from services.results_store import ResultsStore
+from services.metrics_exporter import start_metrics_exporter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png")
+
+
+def discover_documents(sources: list[str]) -> list[dict]:
+    """
+    Expand directories, glob patterns and JSONL manifests into document entries.
+
+    Manifest lines are JSON objects with a `path` and an optional `id`.
+
+    Args:
+        sources: Directories, glob patterns, file paths or `.jsonl` manifests
+
+    Returns:
+        list: Unique entries of the form {"id": ..., "path": ...}
+    """
+    paths = []
+    for source in sources:
+        if source.endswith(".jsonl") and os.path.isfile(source):
+            with open(source, "r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    if line.strip():
+                        entry = json.loads(line)
+                        paths.append((entry.get("id"), entry["path"]))
+        elif os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        paths.append((None, os.path.join(root, name)))
+        else:
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                logger.error(f"No documents match: {source}")
+            paths.extend((None, path) for path in matches if os.path.isfile(path))
+
+    documents = {}
+    for doc_id, path in paths:
+        doc_id = doc_id or os.path.normpath(path)
+        documents.setdefault(doc_id, {"id": doc_id, "path": path})
+    return list(documents.values())
+
+
+class Checkpoint:
+    """Append-only record of finished document ids, flushed after every write."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def mark_done(self, doc_id: str):
+        self._file.write(doc_id + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.add(doc_id)
+
+    def close(self):
+        self._file.close()
+
+
+class ResultWriter:
+    """
+    Thread-safe JSONL writer that checkpoints each successful document after its line is written.
+
+    Successful records are also appended to an optional Parquet results store;
+    the JSONL file stays the source of truth (see `results_store ingest`).
+    """
+
+    def __init__(self, output_path: str, checkpoint: Checkpoint, store: ResultsStore = None):
+        self._file = open(output_path, "a", encoding="utf-8")
+        self._checkpoint = checkpoint
+        self._store = store
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if record["status"] == "ok":
+                self._checkpoint.mark_done(record["id"])
+        if record["status"] == "ok" and self._store is not None:
+            try:
+                self._store.append(record["id"], record)
+            except Exception as e:
+                logger.error(f"Failed to store results of {record['id']}: {e}")
+
+    def close(self):
+        self._file.close()
+        if self._store is not None:
+            self._store.close()
+
+
+def _make_record(entry: dict, result: dict = None, error: Exception = None) -> dict:
+    """Wrap a pipeline outcome into an output record."""
+    if error is not None:
+        return {"id": entry["id"], "path": entry["path"], "status": "error",
+                "error_type": type(error).__name__, "error": str(error)}
+    return {"id": entry["id"], "path": entry["path"], "status": "ok",
+            "processed_at": datetime.now(timezone.utc).isoformat(), **result}
+
+
+def _process_entry(entry: dict, openai_client, ocr_limiter, llm_limiter, extraction_mode: str) -> dict:
+    """Process one document and wrap the outcome into an output record."""
+    monitoring.add_gauge("documents_queued", -1)
+    with trace_document(document_id=entry["id"]):
+        try:
+            with open(entry["path"], "rb") as f:
+                document_bytes = f.read()
+            with monitoring.track_in_flight("documents_in_flight"):
+                result = process_document(
+                    document_bytes, openai_client,
+                    ocr_limiter=ocr_limiter, llm_limiter=llm_limiter, extraction_mode=extraction_mode
+                )
+            return _make_record(entry, result)
+        except Exception as e:
+            monitoring.log_error(error_type=type(e).__name__, error_message=str(e))
+            logger.error(f"Failed to process {entry['path']}: {e}")
+            return _make_record(entry, error=e)
+
+
+def run_batch(documents: list[dict], output_path: str, checkpoint_path: str = None, workers: int = BATCH_WORKERS,
+              ocr_concurrency: int = OCR_CONCURRENCY, openai_concurrency: int = OPENAI_CONCURRENCY,
+              extraction_mode: str = EXTRACTION_MODE, results_dir: str = RESULTS_STORE_DIR) -> dict:
+    """
+    Process documents concurrently, streaming results in completion order.
+
+    Args:
+        documents: Entries returned by `discover_documents`
+        output_path: JSONL file results are appended to
+        checkpoint_path: File of finished ids (defaults to `<output_path>.checkpoint`)
+        workers: Size of the worker thread pool
+        ocr_concurrency: Maximum concurrent Azure OCR calls
+        openai_concurrency: Maximum concurrent OpenAI calls
+        extraction_mode: 'two_step' or 'combined'
+        results_dir: Also append successful results to a Parquet results store here ("" disables)
+
+    Returns:
+        dict: Counts of processed, failed and skipped documents
+    """
+    checkpoint = Checkpoint(checkpoint_path or f"{output_path}.checkpoint")
+    pending = [entry for entry in documents if entry["id"] not in checkpoint.done]
+    skipped = len(documents) - len(pending)
+    logger.info(f"Batch starting: {len(pending)} documents to process, {skipped} already done")
+
+    openai_client = init_openai_client(OPENAI_ENDPOINT, OPENAI_KEY)
+    ocr_limiter = threading.BoundedSemaphore(ocr_concurrency)
+    llm_limiter = threading.BoundedSemaphore(openai_concurrency)
+    writer = ResultWriter(output_path, checkpoint, ResultsStore(results_dir) if results_dir else None)
+
+    summary = {"processed": 0, "failed": 0, "skipped": skipped}
+    monitoring.add_gauge("documents_queued", len(pending))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_process_entry, entry, openai_client, ocr_limiter, llm_limiter, extraction_mode)
+                for entry in pending
+            ]
+            for future in as_completed(futures):
+                record = future.result()
+                writer.write(record)
+                summary["processed" if record["status"] == "ok" else "failed"] += 1
+    finally:
+        writer.close()
+        checkpoint.close()
+
+    logger.info(f"Batch finished: {summary}")
+    return summary
+
+
+async def run_batch_async(documents: list[dict], output_path: str, checkpoint_path: str = None,
+                          max_in_flight: int = ASYNC_MAX_IN_FLIGHT, ocr_concurrency: int = OCR_CONCURRENCY,
+                          openai_concurrency: int = OPENAI_CONCURRENCY, extraction_mode: str = EXTRACTION_MODE,
+                          results_dir: str = RESULTS_STORE_DIR) -> dict:
+    """
+    Asyncio variant of `run_batch`: one event loop keeps up to `max_in_flight` documents in flight.
+
+    Args:
+        documents: Entries returned by `discover_documents`
+        output_path: JSONL file results are appended to
+        checkpoint_path: File of finished ids (defaults to `<output_path>.checkpoint`)
+        max_in_flight: Maximum documents processed concurrently
+        ocr_concurrency: Maximum in-flight Azure OCR requests
+        openai_concurrency: Maximum in-flight OpenAI requests
+        extraction_mode: 'two_step' or 'combined'
+        results_dir: Also append successful results to a Parquet results store here ("" disables)
+
+    Returns:
+        dict: Counts of processed, failed and skipped documents
+    """
+    checkpoint = Checkpoint(checkpoint_path or f"{output_path}.checkpoint")
+    pending = {entry["id"]: entry for entry in documents if entry["id"] not in checkpoint.done}
+    skipped = len(documents) - len(pending)
+    logger.info(f"Async batch starting: {len(pending)} documents to process, {skipped} already done")
+
+    writer = ResultWriter(output_path, checkpoint, ResultsStore(results_dir) if results_dir else None)
+    summary = {"processed": 0, "failed": 0, "skipped": skipped}
+    try:
+        outcomes = process_documents_async(
+            ((doc_id, entry["path"]) for doc_id, entry in pending.items()),
+            max_in_flight=max_in_flight,
+            ocr_concurrency=ocr_concurrency,
+            openai_concurrency=openai_concurrency,
+            extraction_mode=extraction_mode
+        )
+        async for doc_id, result, error in outcomes:
+            writer.write(_make_record(pending[doc_id], result, error))
+            summary["failed" if error is not None else "processed"] += 1
+    finally:
+        writer.close()
+        checkpoint.close()
+
+    logger.info(f"Async batch finished: {summary}")
+    return summary
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-process insurance forms into JSONL results.")
+    parser.add_argument("sources", nargs="+", help="Directories, glob patterns or .jsonl manifests")
+    parser.add_argument("--output", "-o", default="results.jsonl", help="JSONL output file")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Worker threads")
+    parser.add_argument("--ocr-concurrency", type=int, default=OCR_CONCURRENCY, help="Concurrent Azure OCR calls")
+    parser.add_argument("--openai-concurrency", type=int, default=OPENAI_CONCURRENCY, help="Concurrent OpenAI calls")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run on a single asyncio event loop instead of a thread pool")
+    parser.add_argument("--max-in-flight", type=int, default=ASYNC_MAX_IN_FLIGHT,
+                        help="Documents in flight at once in --async mode")
+    parser.add_argument("--extraction-mode", choices=["two_step", "combined"], default=EXTRACTION_MODE,
+                        help="Detect language and extract in two requests or in one combined request")
+    parser.add_argument("--results-dir", default=RESULTS_STORE_DIR,
+                        help="Also append results to a partitioned Parquet store in this directory")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics on this local port (-1 disables)")
+    args = parser.parse_args(argv)
+
+    start_metrics_exporter(args.metrics_port)
+
+    documents = discover_documents(args.sources)
+    if args.use_async:
+        summary = asyncio.run(run_batch_async(
+            documents,
+            output_path=args.output,
+            checkpoint_path=args.checkpoint,
+            max_in_flight=args.max_in_flight,
+            ocr_concurrency=args.ocr_concurrency,
+            openai_concurrency=args.openai_concurrency,
+            extraction_mode=args.extraction_mode,
+            results_dir=args.results_dir
+        ))
+    else:
+        summary = run_batch(
+            documents,
+            output_path=args.output,
+            checkpoint_path=args.checkpoint,
+            workers=args.workers,
+            ocr_concurrency=args.ocr_concurrency,
+            openai_concurrency=args.openai_concurrency,
+            extraction_mode=args.extraction_mode,
+            results_dir=args.results_dir
+        )
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
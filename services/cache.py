@@ -0,0 +1,207 @@
+"""
+Key-value cache backends used to memoize expensive service calls.
+Provides a pluggable backend interface, a bounded in-memory LRU, a SQLite
+on-disk implementation with LRU/TTL eviction and entry/size caps, and a
+tiered cache combining the two.
+"""
+
+from services.logger_config import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CacheMissError(LookupError):
+    """Raised in cache-only mode when a result is not cached."""
+
+
+class CacheBackend(ABC):
+    """Interface for byte-value caches keyed by strings."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value, or None on a miss."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Store a value, evicting older entries as needed."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove one entry if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+
+class MemoryLRUCache(CacheBackend):
+    """Thread-safe in-memory cache holding at most `max_entries` items."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class TieredCache(CacheBackend):
+    """Fast front cache backed by a persistent store; persistent hits are promoted to the front."""
+
+    def __init__(self, front: CacheBackend, back: CacheBackend):
+        self.front = front
+        self.back = back
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.front.get(key)
+        if value is None:
+            value = self.back.get(key)
+            if value is not None:
+                self.front.set(key, value)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self.front.set(key, value)
+        self.back.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self.front.delete(key)
+        self.back.delete(key)
+
+    def clear(self) -> None:
+        self.front.clear()
+        self.back.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """
+    On-disk cache stored in a single SQLite file.
+
+    Entries expire after `ttl_seconds`. When `max_entries` or `max_bytes` is
+    exceeded, the least recently accessed entries are evicted first.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            path: SQLite database file path
+            ttl_seconds: Maximum entry age in seconds (None for no expiry)
+            max_entries: Maximum number of stored entries (None for unbounded)
+            max_bytes: Maximum total size of stored values (None for unbounded)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), now, now)
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> dict:
+        """Return the number of entries and total stored bytes."""
+        with self._lock:
+            entries, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+        return {"entries": entries, "bytes": total_bytes}
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until within caps."""
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        if self.max_entries is not None:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+        if self.max_bytes is not None:
+            (total_bytes,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+            excess = total_bytes - self.max_bytes
+            if excess > 0:
+                evicted = []
+                for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at ASC"):
+                    evicted.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+                logger.info(f"Evicted {len(evicted)} entries from cache {self.path} to respect size cap")
@@ -0,0 +1,234 @@
+"""
+Process-wide registry of Azure service clients.
+Creates Document Intelligence and OpenAI clients lazily from configuration and
+shares keep-alive HTTP connection pools between all callers and threads.
+"""
+
+from __future__ import annotations
+
+from services.logger_config import logging
+from services.lazy_imports import lazy_import
+from services.config import (
+    DOCUMENT_ENDPOINT, DOCUMENT_KEY, OPENAI_ENDPOINT, OPENAI_KEY, OPENAI_API_VERSION,
+    HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_KEEPALIVE_EXPIRY
+)
+from typing import TYPE_CHECKING
+import threading
+import time
+
+if TYPE_CHECKING:
+    from azure.ai.documentintelligence import DocumentIntelligenceClient
+    from openai import AzureOpenAI
+    import httpx
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# SDKs and HTTP stacks are imported when the first client of their kind is created
+azure_credentials = lazy_import("azure.core.credentials")
+azure_transport = lazy_import("azure.core.pipeline.transport")
+documentintelligence = lazy_import("azure.ai.documentintelligence")
+openai = lazy_import("openai")
+httpx_module = lazy_import("httpx")
+requests_module = lazy_import("requests")
+requests_adapters = lazy_import("requests.adapters")
+
+DEFAULT_OPENAI_API_VERSION = OPENAI_API_VERSION
+
+
+class ClientRegistry:
+    """
+    Thread-safe, lazily populated cache of service clients.
+
+    Clients are keyed by their endpoint and credentials, so repeated lookups
+    return the same instance and reuse its open connections instead of paying
+    a new TLS handshake per request.
+    """
+
+    def __init__(self, pool_maxsize: int = HTTP_POOL_MAXSIZE, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT, keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY):
+        """
+        Args:
+            pool_maxsize: Maximum pooled connections per host
+            connect_timeout: Connection timeout in seconds
+            read_timeout: Read timeout in seconds
+            keepalive_expiry: Seconds an idle OpenAI connection is kept open
+        """
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_expiry = keepalive_expiry
+        self._lock = threading.Lock()
+        self._clients: dict = {}
+        self._requests_session: requests.Session = None
+        self._httpx_client: httpx.Client = None
+        self._lookups = {"created": 0, "reused": 0}
+
+    def get_document_client(self, endpoint: str = None, key: str = None) -> DocumentIntelligenceClient:
+        """
+        Return the shared Document Intelligence client for an endpoint.
+
+        Args:
+            endpoint: Azure endpoint URL (defaults to DOCUMENT_ENDPOINT)
+            key: Azure API key (defaults to DOCUMENT_KEY)
+        """
+        endpoint = endpoint or DOCUMENT_ENDPOINT
+        key = key or DOCUMENT_KEY
+        return self._get_or_create(
+            ("document_intelligence", endpoint, key),
+            lambda: documentintelligence.DocumentIntelligenceClient(
+                endpoint=endpoint,
+                credential=azure_credentials.AzureKeyCredential(key),
+                # Retries are scheduled by services.rate_limit, which also adapts concurrency
+                retry_total=0,
+                transport=azure_transport.RequestsTransport(
+                    session=self._get_requests_session(),
+                    session_owner=False,
+                    connection_timeout=self.connect_timeout,
+                    read_timeout=self.read_timeout
+                )
+            )
+        )
+
+    def get_openai_client(self, endpoint: str = None, api_key: str = None,
+                          api_version: str = DEFAULT_OPENAI_API_VERSION) -> AzureOpenAI:
+        """
+        Return the shared Azure OpenAI client for an endpoint.
+
+        Args:
+            endpoint: Azure OpenAI endpoint URL (defaults to OPENAI_ENDPOINT)
+            api_key: Azure OpenAI API key (defaults to OPENAI_KEY)
+            api_version: API version string
+        """
+        endpoint = endpoint or OPENAI_ENDPOINT
+        api_key = api_key or OPENAI_KEY
+        return self._get_or_create(
+            ("openai", endpoint, api_key, api_version),
+            lambda: openai.AzureOpenAI(
+                azure_endpoint=endpoint,
+                api_key=api_key,
+                api_version=api_version,
+                max_retries=0,
+                http_client=self._get_httpx_client()
+            )
+        )
+
+    def open_connections(self) -> dict:
+        """
+        Open one pooled connection to the endpoint of every client created so far.
+
+        The request's status is irrelevant (it is not authenticated); what
+        matters is that the TCP and TLS handshakes are done before the first
+        real request. Failures are logged and reported, never raised.
+
+        Returns:
+            dict: Milliseconds taken per endpoint, or None where it could not be reached
+        """
+        with self._lock:
+            targets = [(cache_key[0], cache_key[1]) for cache_key in self._clients]
+            session, http_client = self._requests_session, self._httpx_client
+        timings = {}
+        for kind, endpoint in targets:
+            start = time.perf_counter()
+            try:
+                if kind == "document_intelligence":
+                    session.head(endpoint, timeout=self.connect_timeout)
+                else:
+                    http_client.head(endpoint, timeout=self.connect_timeout)
+                timings[endpoint] = round((time.perf_counter() - start) * 1000, 1)
+            except Exception as e:
+                logger.warning(f"Could not open a connection to {endpoint}: {e}")
+                timings[endpoint] = None
+        return timings
+
+    def stats(self) -> dict:
+        """
+        Report client and connection pool usage.
+
+        Returns:
+            dict: Registry lookups plus per-host pool counters for both HTTP stacks
+        """
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "lookups": dict(self._lookups),
+                "pool_maxsize": self.pool_maxsize,
+                "azure_pools": self._requests_pool_stats(),
+                "openai_pool": self._httpx_pool_stats()
+            }
+
+    def close(self):
+        """Close all clients and their connection pools."""
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.error(f"Error closing client: {e}")
+            self._clients.clear()
+            if self._requests_session is not None:
+                self._requests_session.close()
+                self._requests_session = None
+            if self._httpx_client is not None:
+                self._httpx_client.close()
+                self._httpx_client = None
+
+    def _get_or_create(self, cache_key: tuple, factory):
+        with self._lock:
+            client = self._clients.get(cache_key)
+            if client is None:
+                logger.info(f"Creating {cache_key[0]} client for {cache_key[1]}")
+                client = self._clients[cache_key] = factory()
+                self._lookups["created"] += 1
+            else:
+                self._lookups["reused"] += 1
+            return client
+
+    def _get_requests_session(self) -> requests.Session:
+        """Shared session backing every Azure SDK client; called with the lock held."""
+        if self._requests_session is None:
+            session = requests_module.Session()
+            adapter = requests_adapters.HTTPAdapter(pool_connections=self.pool_maxsize, pool_maxsize=self.pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._requests_session = session
+        return self._requests_session
+
+    def _get_httpx_client(self) -> httpx.Client:
+        """Shared httpx client backing every OpenAI client; called with the lock held."""
+        if self._httpx_client is None:
+            self._httpx_client = httpx_module.Client(
+                limits=httpx_module.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=httpx_module.Timeout(self.read_timeout, connect=self.connect_timeout)
+            )
+        return self._httpx_client
+
+    def _requests_pool_stats(self) -> dict:
+        if self._requests_session is None:
+            return {}
+        stats = {}
+        adapter = self._requests_session.get_adapter("https://")
+        for pool_key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[pool_key]
+            stats[pool.host] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "free_slots": pool.pool.qsize() if pool.pool is not None else 0
+            }
+        return stats
+
+    def _httpx_pool_stats(self) -> dict:
+        if self._httpx_client is None:
+            return {}
+        # httpx does not expose pool counters publicly; read them from the httpcore pool when present
+        pool = getattr(getattr(self._httpx_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+clients = ClientRegistry()
@@ -0,0 +1,364 @@
+"""
+OCR confidence analysis.
+Converts the words of an AnalyzeResult into NumPy arrays once and derives
+per-line, per-page and per-region confidence statistics from them, then
+flags extracted fields whose source text was read with low confidence.
+"""
+
+from __future__ import annotations
+
+from services.logger_config import logging
+from services.lazy_imports import lazy_import
+from services.config import CONFIDENCE_REVIEW_THRESHOLD, CONFIDENCE_GRID_ROWS, CONFIDENCE_GRID_COLUMNS
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Imported with the first document analyzed (or by services.warmup)
+np = lazy_import("numpy")
+
+HISTOGRAM_BINS = 10
+_NO_POLYGON = (float("nan"),) * 8
+# Short values ("4", "א") occur all over a form; bound the occurrences checked per field
+MAX_OCCURRENCES = 50
+
+
+@dataclass
+class WordArrays:
+    """Word-level OCR data of a document as parallel arrays, sorted by span offset."""
+    offsets: np.ndarray         # int64 span start in `result.content`
+    ends: np.ndarray            # int64 span end
+    confidences: np.ndarray     # float32
+    pages: np.ndarray           # int32 page index
+    lines: np.ndarray           # int32 document-wide line index, -1 outside every line
+    boxes: np.ndarray           # float32 (n, 4) x0, y0, x1, y1; NaN without a polygon
+    line_pages: np.ndarray      # int32 page index of each line
+    line_contents: list
+    page_numbers: list
+    page_sizes: np.ndarray      # float32 (pages, 2) width, height; NaN when unknown
+    content: str                # document text the spans index into
+
+    @classmethod
+    def from_result(cls, result) -> "WordArrays":
+        """
+        Build the arrays in a single pass over the SDK objects.
+
+        Args:
+            result: AnalyzeResult (fresh or restored from the OCR cache)
+
+        Returns:
+            WordArrays: Arrays for every word and line of the document
+        """
+        offsets, lengths, confidences, pages, polygons = [], [], [], [], []
+        span_starts, span_ends, span_lines = [], [], []
+        line_pages, line_contents, page_numbers, page_sizes = [], [], [], []
+
+        for page_index, page in enumerate(result.pages or []):
+            page_numbers.append(getattr(page, "page_number", None) or page_index + 1)
+            page_sizes.append((getattr(page, "width", None) or np.nan, getattr(page, "height", None) or np.nan))
+            page_words = page.words or []
+            spans = [word.span for word in page_words]
+            offsets.extend([span.offset for span in spans])
+            lengths.extend([span.length for span in spans])
+            confidences.extend([word.confidence for word in page_words])
+            pages.extend([page_index] * len(page_words))
+            for word in page_words:
+                # Word polygons are quadrilaterals; anything else is reduced to its bounding box
+                polygon = getattr(word, "polygon", None) or _NO_POLYGON
+                if len(polygon) != 8:
+                    xs, ys = polygon[0::2], polygon[1::2]
+                    polygon = (min(xs), min(ys), max(xs), min(ys), max(xs), max(ys), min(xs), max(ys))
+                polygons.extend(polygon)
+            for line in page.lines or []:
+                line_index = len(line_contents)
+                line_contents.append(line.content)
+                line_pages.append(page_index)
+                for span in line.spans:
+                    span_starts.append(span.offset)
+                    span_ends.append(span.offset + span.length)
+                    span_lines.append(line_index)
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        order = np.argsort(offsets, kind="stable")
+        offsets = offsets[order]
+        ends = offsets + np.asarray(lengths, dtype=np.int64)[order]
+        polygons = np.asarray(polygons, dtype=np.float32).reshape(-1, 8)[order]
+        xs, ys = polygons[:, 0::2], polygons[:, 1::2]
+
+        return cls(
+            offsets=offsets,
+            ends=ends,
+            confidences=np.asarray(confidences, dtype=np.float32)[order],
+            pages=np.asarray(pages, dtype=np.int32)[order],
+            lines=_assign_lines(offsets, ends, span_starts, span_ends, span_lines),
+            boxes=np.stack([xs.min(axis=1), ys.min(axis=1), xs.max(axis=1), ys.max(axis=1)], axis=1),
+            line_pages=np.asarray(line_pages, dtype=np.int32),
+            line_contents=line_contents,
+            page_numbers=page_numbers,
+            page_sizes=np.asarray(page_sizes, dtype=np.float32).reshape(-1, 2),
+            content=result.content or ""
+        )
+
+    def span_confidence(self, start: int, end: int) -> float:
+        """Lowest confidence of the words overlapping [start, end), or None when there are none."""
+        first = np.searchsorted(self.ends, start, side="right")
+        last = np.searchsorted(self.offsets, end, side="left")
+        if last <= first:
+            return None
+        return float(self.confidences[first:last].min())
+
+
+def _assign_lines(offsets: np.ndarray, ends: np.ndarray, span_starts: list, span_ends: list,
+                  span_lines: list) -> np.ndarray:
+    """Map each word to the line whose span fully contains it, like `_assign_words_to_lines`."""
+    if not span_starts or not len(offsets):
+        return np.full(len(offsets), -1, dtype=np.int32)
+    span_starts = np.asarray(span_starts, dtype=np.int64)
+    order = np.argsort(span_starts, kind="stable")
+    span_starts = span_starts[order]
+    span_ends = np.asarray(span_ends, dtype=np.int64)[order]
+    span_lines = np.asarray(span_lines, dtype=np.int32)[order]
+
+    index = np.searchsorted(span_starts, offsets, side="right") - 1
+    clipped = np.clip(index, 0, None)
+    inside = (index >= 0) & (ends <= span_ends[clipped])
+    return np.where(inside, span_lines[clipped], -1).astype(np.int32)
+
+
+def line_statistics(words: WordArrays) -> dict:
+    """
+    Word count, mean and minimum confidence of every line.
+
+    Returns:
+        dict: Arrays `count`, `mean` and `min` indexed by line
+    """
+    line_count = len(words.line_contents)
+    in_line = words.lines >= 0
+    lines = words.lines[in_line]
+    confidences = words.confidences[in_line]
+
+    count = np.bincount(lines, minlength=line_count)
+    total = np.bincount(lines, weights=confidences, minlength=line_count)
+    minimum = np.full(line_count, np.inf, dtype=np.float32)
+    np.minimum.at(minimum, lines, confidences)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+    return {"count": count, "mean": mean, "min": np.where(count > 0, minimum, np.nan)}
+
+
+def page_statistics(words: WordArrays, threshold: float = CONFIDENCE_REVIEW_THRESHOLD) -> list[dict]:
+    """
+    Confidence distribution of every page.
+
+    Returns:
+        list: Per page: words, mean, min, 10th percentile, share of words below
+            `threshold` and a histogram over [0, 1] in HISTOGRAM_BINS bins
+    """
+    page_count = len(words.page_numbers)
+    count = np.bincount(words.pages, minlength=page_count)
+    total = np.bincount(words.pages, weights=words.confidences, minlength=page_count)
+    low = np.bincount(words.pages, weights=(words.confidences < threshold).astype(np.float64), minlength=page_count)
+    bins = np.clip((words.confidences * HISTOGRAM_BINS).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    histogram = np.bincount(words.pages.astype(np.int64) * HISTOGRAM_BINS + bins,
+                            minlength=page_count * HISTOGRAM_BINS).reshape(page_count, HISTOGRAM_BINS)
+
+    # Sorted by (page, confidence), each page is a contiguous ascending run: its first
+    # element is the minimum and the 10th percentile interpolates between two neighbours
+    ordered = words.confidences[np.lexsort((words.confidences, words.pages))]
+    starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+    position = 0.1 * np.maximum(count - 1, 0)
+    lower = np.minimum(starts + np.floor(position).astype(np.int64), max(len(ordered) - 1, 0))
+    upper = np.minimum(starts + np.ceil(position).astype(np.int64), max(len(ordered) - 1, 0))
+    if len(ordered):
+        minimum = ordered[np.minimum(starts, len(ordered) - 1)]
+        p10 = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - np.floor(position))
+    else:
+        minimum = p10 = np.zeros(page_count)
+
+    statistics = []
+    for page_index, page_number in enumerate(words.page_numbers):
+        has_words = count[page_index] > 0
+        statistics.append({
+            "page": page_number,
+            "words": int(count[page_index]),
+            "mean": float(total[page_index] / count[page_index]) if has_words else None,
+            "min": float(minimum[page_index]) if has_words else None,
+            "p10": float(p10[page_index]) if has_words else None,
+            "low_word_share": float(low[page_index] / count[page_index]) if has_words else None,
+            "histogram": histogram[page_index].tolist()
+        })
+    return statistics
+
+
+def region_statistics(words: WordArrays, rows: int = CONFIDENCE_GRID_ROWS,
+                      columns: int = CONFIDENCE_GRID_COLUMNS) -> list[dict]:
+    """
+    Confidence of a rows x columns grid over each page, from word polygons.
+
+    Words without a polygon, or on pages of unknown size, are left out.
+
+    Returns:
+        list: Regions holding words: page, row, column, words, mean and min
+    """
+    size = words.page_sizes[words.pages] if len(words.page_sizes) else np.empty((0, 2), dtype=np.float32)
+    centers_x = (words.boxes[:, 0] + words.boxes[:, 2]) / 2 / size[:, 0]
+    centers_y = (words.boxes[:, 1] + words.boxes[:, 3]) / 2 / size[:, 1]
+    located = np.isfinite(centers_x) & np.isfinite(centers_y)
+    if not located.any():
+        return []
+
+    row = np.clip((centers_y[located] * rows).astype(np.int64), 0, rows - 1)
+    column = np.clip((centers_x[located] * columns).astype(np.int64), 0, columns - 1)
+    region = (words.pages[located].astype(np.int64) * rows + row) * columns + column
+    confidences = words.confidences[located]
+
+    region_count = len(words.page_numbers) * rows * columns
+    count = np.bincount(region, minlength=region_count)
+    total = np.bincount(region, weights=confidences, minlength=region_count)
+    minimum = np.full(region_count, np.inf, dtype=np.float32)
+    np.minimum.at(minimum, region, confidences)
+
+    statistics = []
+    for region_index in np.flatnonzero(count):
+        page_index, cell = divmod(int(region_index), rows * columns)
+        statistics.append({
+            "page": words.page_numbers[page_index],
+            "row": cell // columns,
+            "column": cell % columns,
+            "words": int(count[region_index]),
+            "mean": float(total[region_index] / count[region_index]),
+            "min": float(minimum[region_index])
+        })
+    return statistics
+
+
+def flag_fields(words: WordArrays, form_data: dict, threshold: float = CONFIDENCE_REVIEW_THRESHOLD) -> list[dict]:
+    """
+    Flag extracted values that were read with low confidence or are not in the OCR text.
+
+    A value is located by its occurrences in the OCR content (or, failing that,
+    by each of its tokens). With several occurrences the most confident one is
+    used, so a field is flagged only when every place it could come from is risky.
+
+    Args:
+        words: Word arrays of the document
+        form_data: Extracted form data
+        threshold: Confidence below which a field is flagged
+
+    Returns:
+        list: Flagged fields with their dotted path, value, confidence and reason
+    """
+    flagged = []
+    for path, value in _leaf_values(form_data):
+        entry = flag_field(words, path, value, threshold)
+        if entry is not None:
+            flagged.append(entry)
+    return flagged
+
+
+def flag_field(words: WordArrays, path: str, value, threshold: float = CONFIDENCE_REVIEW_THRESHOLD) -> dict:
+    """
+    Check one extracted value, e.g. as soon as a streamed field arrives.
+
+    Returns:
+        dict: The `flag_fields` entry of the field, or None when it needs no review
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None
+    confidence = _value_confidence(words, value.strip())
+    if confidence is None:
+        return {"field": path, "value": value, "confidence": None, "reason": "not_in_ocr_text"}
+    if confidence < threshold:
+        return {"field": path, "value": value, "confidence": confidence, "reason": "low_confidence"}
+    return None
+
+
+def analyze_confidence(result, form_data: dict = None, threshold: float = CONFIDENCE_REVIEW_THRESHOLD) -> dict:
+    """
+    Build the confidence report of a document from its AnalyzeResult.
+
+    Args:
+        result: AnalyzeResult of the document
+        form_data: Extracted form data whose fields should be checked
+        threshold: Confidence below which lines, regions and fields are reported
+
+    Returns:
+        dict: Report built by `confidence_report`
+    """
+    return confidence_report(WordArrays.from_result(result), form_data, threshold)
+
+
+def confidence_report(words: WordArrays, form_data: dict = None, threshold: float = CONFIDENCE_REVIEW_THRESHOLD) -> dict:
+    """
+    Build the confidence report of a document from its word arrays.
+
+    Args:
+        words: Word arrays of the document
+        form_data: Extracted form data whose fields should be checked
+        threshold: Confidence below which lines, regions and fields are reported
+
+    Returns:
+        dict: JSON-serializable report with page statistics, lines below the
+            threshold (the ones left out of the text), low-confidence regions and flagged fields
+    """
+    try:
+        lines = line_statistics(words)
+        low_lines = np.flatnonzero(lines["min"] < threshold)
+        regions = region_statistics(words)
+        report = {
+            "threshold": threshold,
+            "words": int(len(words.confidences)),
+            "mean": float(words.confidences.mean()) if len(words.confidences) else None,
+            "pages": page_statistics(words, threshold),
+            "low_confidence_lines": [
+                {
+                    "page": words.page_numbers[words.line_pages[index]],
+                    "content": words.line_contents[index],
+                    "mean": float(lines["mean"][index]),
+                    "min": float(lines["min"][index])
+                }
+                for index in low_lines
+            ],
+            "low_confidence_regions": [region for region in regions if region["mean"] < threshold],
+            "flagged_fields": flag_fields(words, form_data, threshold) if form_data else []
+        }
+        if report["flagged_fields"]:
+            logger.info(f"{len(report['flagged_fields'])} extracted fields flagged for review")
+        return report
+    except Exception as e:
+        logger.error(f"Error in confidence_report: {e}")
+        raise
+
+
+def _value_confidence(words: WordArrays, value: str) -> float:
+    best = _best_occurrence(words, value)
+    if best is not None:
+        return best
+    # The model may have normalized spacing or joined tokens from separate lines
+    token_confidences = [_best_occurrence(words, token) for token in value.split()]
+    if len(token_confidences) < 2 or any(confidence is None for confidence in token_confidences):
+        return None
+    return min(token_confidences)
+
+
+def _best_occurrence(words: WordArrays, value: str) -> float:
+    best = None
+    content = words.content
+    start = content.find(value)
+    for _ in range(MAX_OCCURRENCES):
+        if start < 0:
+            break
+        confidence = words.span_confidence(start, start + len(value))
+        if confidence is not None and (best is None or confidence > best):
+            best = confidence
+        start = content.find(value, start + 1)
+    return best
+
+
+def _leaf_values(data: dict, parent_key: str = ""):
+    for key, value in data.items():
+        path = f"{parent_key}.{key}" if parent_key else key
+        if isinstance(value, dict):
+            yield from _leaf_values(value, path)
+        else:
+            yield path, value
@@ -1,16 +1,10 @@
 """
 Configuration module for Azure services and OpenAI settings.
-Loads environment variables from .env file.
+Settings are read from the environment when this module is first imported.
+Entry points load the .env file (or ENV_FILE) before that, with
+`services.environment.configure()`; importing this module has no side effects.
 """
 import os
-from services.logger_config import logging
-from dotenv import load_dotenv
-
-logger = logging.getLogger(__name__)
-
-load_dotenv()  # Loads values from .env into environment variables
-
-logger.info("Loading environment variables...")
 
 # Azure Document Intelligence credentials
 DOCUMENT_ENDPOINT = os.getenv("DOCUMENT_ENDPOINT")
@@ -23,5 +17,119 @@ OPENAI_KEY = os.getenv("OPENAI_KEY")
 # OpenAI Configuration
 OPENAI_MODEL = "gpt-4o-mini"
 OPENAI_TEMPERATURE = 0
+# Azure OpenAI API version; streamed token usage (stream_options) needs 2024-09-01-preview or later
+OPENAI_API_VERSION = os.getenv("OPENAI_API_VERSION", "2024-10-21")
+
+# Local language detection: GPT is only called when the Hebrew/Latin letter share is below the threshold
+LOCAL_LANGUAGE_DETECTION = os.getenv("LOCAL_LANGUAGE_DETECTION", "true").lower() == "true"
+LANGUAGE_DETECTION_THRESHOLD = float(os.getenv("LANGUAGE_DETECTION_THRESHOLD", "0.85"))
+LANGUAGE_DETECTION_MIN_LETTERS = int(os.getenv("LANGUAGE_DETECTION_MIN_LETTERS", "20"))
+
+# Seconds between checks for changed prompt/template files
+TEMPLATE_RELOAD_INTERVAL = float(os.getenv("TEMPLATE_RELOAD_INTERVAL", "2"))
+
+# Extraction mode: "two_step" (detect language, then extract) or "combined" (one JSON-mode request)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "two_step").lower()
+
+# OCR result cache (keyed by document SHA-256, model and confidence threshold)
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", ".cache/ocr_cache.sqlite3")
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "1000"))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# LLM response cache: "off", "read_write" or "cache_only" (never call the API)
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "read_write").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Shared HTTP connection pools for service clients
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# Batch processing concurrency
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "4"))
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+
+# Prompt compaction: dedupe and budget the OCR text sent for extraction (estimated tokens, 0 = no budget)
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "true").lower() == "true"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+
+# Page-aware extraction: skip instruction pages, extract long bundles page by page (0 = never split)
+PAGE_FILTER = os.getenv("PAGE_FILTER", "true").lower() == "true"
+PAGE_MIN_FIELD_LABELS = int(os.getenv("PAGE_MIN_FIELD_LABELS", "2"))
+PAGE_SPLIT_MIN_PAGES = int(os.getenv("PAGE_SPLIT_MIN_PAGES", "3"))
+PAGE_EXTRACTION_WORKERS = int(os.getenv("PAGE_EXTRACTION_WORKERS", "4"))
+
+# OCR confidence review: fields read below the threshold are flagged; regions form a grid over each page
+CONFIDENCE_REVIEW_THRESHOLD = float(os.getenv("CONFIDENCE_REVIEW_THRESHOLD", "0.8"))
+CONFIDENCE_GRID_ROWS = int(os.getenv("CONFIDENCE_GRID_ROWS", "4"))
+CONFIDENCE_GRID_COLUMNS = int(os.getenv("CONFIDENCE_GRID_COLUMNS", "2"))
+
+# Image pre-processing before OCR (opt-in): downscale, grayscale, EXIF rotation, JPEG recompression
+IMAGE_PREPROCESSING = os.getenv("IMAGE_PREPROCESSING", "false").lower() == "true"
+IMAGE_TARGET_DPI = int(os.getenv("IMAGE_TARGET_DPI", "200"))
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "true").lower() == "true"
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", "0"))
+
+# Per-document tracing: traces at least TRACE_SLOW_MS long are written to TRACE_DIR (-1 = never)
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "-1"))
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "false").lower() == "true"
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "false").lower() == "true"
+
+# Columnar results store: Parquet files partitioned by form type, language and date ("" disables)
+RESULTS_STORE_DIR = os.getenv("RESULTS_STORE_DIR", "")
+RESULTS_STORE_FLUSH_ROWS = int(os.getenv("RESULTS_STORE_FLUSH_ROWS", "10000"))
+RESULTS_STORE_FLUSH_SECONDS = float(os.getenv("RESULTS_STORE_FLUSH_SECONDS", "300"))
+
+# Service mode: durable SQLite job queue, HTTP API and worker processes
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", ".cache/jobs.sqlite3")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "10"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "1"))
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8080"))
+API_MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Streamlit submits to this service instead of processing in-process ("" disables)
+PARSER_SERVICE_URL = os.getenv("PARSER_SERVICE_URL", "")
+PARSER_SERVICE_TIMEOUT_SECONDS = float(os.getenv("PARSER_SERVICE_TIMEOUT_SECONDS", "600"))
+
+# Stream the extraction response in the Streamlit app, showing fields as they arrive (two-step mode)
+STREAM_EXTRACTION = os.getenv("STREAM_EXTRACTION", "true").lower() == "true"
+
+# Warm-up before accepting work (python -m services.warmup; workers, API and app when enabled)
+WARMUP = os.getenv("WARMUP", "false").lower() == "true"
+WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "true").lower() == "true"
+
+# Streamlit result memoization (per uploaded file hash)
+APP_CACHE_TTL_SECONDS = int(os.getenv("APP_CACHE_TTL_SECONDS", str(24 * 3600)))
+APP_CACHE_MAX_ENTRIES = int(os.getenv("APP_CACHE_MAX_ENTRIES", "200"))
+
+# Client-side quotas and retries (0 disables a quota bucket)
+OCR_RPM = float(os.getenv("OCR_RPM", "0"))
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "0"))
+OPENAI_COMPLETION_TOKENS_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKENS_ESTIMATE", "500"))
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", "32"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))
+
+# Prometheus exporter: local port for /metrics (-1 disables, 0 picks a free port)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "-1"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
 
-logger.info("Environment variables loaded successfully")
+# Seconds between aggregated metrics summaries in the log
+MONITORING_LOG_INTERVAL_SECONDS = float(os.getenv("MONITORING_LOG_INTERVAL_SECONDS", "60"))
@@ -3,19 +3,59 @@ Azure Document Intelligence OCR module for text extraction from documents.
 Handles PDF and image files, providing text content and confidence scores.
 """
 
+from __future__ import annotations
+
 from services.logger_config import logging
+from services.lazy_imports import lazy_import
 from services.monitoring import monitoring
+from services.cache import CacheBackend, SQLiteCache
+from services.clients import clients
+from services.rate_limit import ocr_scheduler
+from services.tracing import span
+from services.postprocessing import postprocess_ocr  # noqa: F401 (re-exported for existing imports)
+from services.image_preprocessing import preprocess_image, preprocessing_signature, should_preprocess
+from services.config import (
+    OCR_CACHE_ENABLED, OCR_CACHE_PATH, OCR_CACHE_TTL_SECONDS, OCR_CACHE_MAX_ENTRIES, OCR_CACHE_MAX_BYTES
+)
+from dataclasses import dataclass, field
+import asyncio
+import hashlib
+import json
+import threading
 import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from azure.ai.documentintelligence import DocumentIntelligenceClient
+    from azure.ai.documentintelligence.aio import DocumentIntelligenceClient as AsyncDocumentIntelligenceClient
+    from azure.ai.documentintelligence.models import AnalyzeResult
 
 logger = logging.getLogger(__name__)
 
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest, AnalyzeResult
-from azure.core.exceptions import AzureError
+CONFIDENCE_THRESHOLD = 0.8
+
+# The Azure SDK is imported on first use (see services.lazy_imports)
+azure_credentials = lazy_import("azure.core.credentials")
+azure_exceptions = lazy_import("azure.core.exceptions")
+documentintelligence_aio = lazy_import("azure.ai.documentintelligence.aio")
+documentintelligence_models = lazy_import("azure.ai.documentintelligence.models")
+
+
+def async_document_client(endpoint: str, key: str) -> AsyncDocumentIntelligenceClient:
+    """
+    Create an aio Document Intelligence client (use it as an async context manager).
+
+    SDK retries are disabled; services.rate_limit schedules them.
+    """
+    return documentintelligence_aio.DocumentIntelligenceClient(
+        endpoint=endpoint, credential=azure_credentials.AzureKeyCredential(key), retry_total=0
+    )
 
 
-def analyze_layout(file_object=None, url=None, endpoint=None, key=None, confidence_threshold=0.8):
+def analyze_layout(file_object=None, url=None, endpoint=None, key=None, confidence_threshold=CONFIDENCE_THRESHOLD,
+                   model_id="prebuilt-layout", use_cache=True, cache: CacheBackend = None,
+                   client: DocumentIntelligenceClient = None):
     """
     Analyze document layout using Azure Document Intelligence.
     
@@ -25,6 +65,10 @@ def analyze_layout(file_object=None, url=None, endpoint=None, key=None, confiden
         endpoint: Azure endpoint URL
         key: Azure API key
         confidence_threshold: Minimum confidence score (0-1)
+        model_id: Document Intelligence model to run
+        use_cache: Reuse results for identical file content
+        cache: Cache backend (defaults to the configured OCR cache)
+        client: Client to use (defaults to the shared pooled client for the endpoint)
     
     Returns:
         tuple: (AnalyzeResult, extracted_text, average_confidence)
@@ -32,80 +76,347 @@ def analyze_layout(file_object=None, url=None, endpoint=None, key=None, confiden
     start_time = time.time()
     try:
         logger.info(f"Starting document analysis with confidence threshold: {confidence_threshold}")
-        client = DocumentIntelligenceClient(endpoint=endpoint, credential=AzureKeyCredential(key))
 
-        if url:
-            poller = client.begin_analyze_document(
-                model_id="prebuilt-layout",
-                analyze_request=AnalyzeDocumentRequest(url_source=url)
-            )
-        elif file_object:
-            poller = client.begin_analyze_document(
-                model_id="prebuilt-layout",
-                body=file_object
-            )
-        else:
-            raise ValueError("Either 'file_object' or 'url' must be provided.")
+        with span("prepare"):
+            request = _prepare_analysis(file_object, url, model_id, confidence_threshold, use_cache, cache)
+        if request.cached is not None:
+            return request.cached
 
-        result: AnalyzeResult = poller.result()
+        client = client or clients.get_document_client(endpoint, key)
+        ocr_start = time.time()
+        result: AnalyzeResult = ocr_scheduler.call(_run_analysis, client, model_id, request.analyze_kwargs)
+        ocr_duration = (time.time() - ocr_start) * 1000
+
+        with span("text_assembly"):
+            output = _complete_analysis(result, confidence_threshold, request)
+        duration = (time.time() - start_time) * 1000
+        monitoring.log_api_call("azure_ocr", duration, success=True)
+        monitoring.log_ocr_payload(request.payload, ocr_duration, output[2])
+        return output
+
+    except azure_exceptions.AzureError as e:
+        logger.error(f"Azure OCR error: {e}")
+        duration = (time.time() - start_time) * 1000
+        monitoring.log_api_call("azure_ocr", duration, success=False)
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_layout: {e}")
+        duration = (time.time() - start_time) * 1000
+        monitoring.log_api_call("azure_ocr", duration, success=False)
+        raise
+
+
+async def analyze_layout_async(file_object=None, url=None, endpoint=None, key=None,
+                               confidence_threshold=CONFIDENCE_THRESHOLD,
+                               model_id="prebuilt-layout", use_cache=True, cache: CacheBackend = None,
+                               client: AsyncDocumentIntelligenceClient = None):
+    """
+    Asynchronous variant of `analyze_layout` built on the aio Document Intelligence client.
 
-        full_text = ""
-        total_confidence = 0
-        total_words = 0
+    The OCR poll is awaited, so the event loop keeps serving other documents
+    while Azure processes this one.
 
-        for page in result.pages:
-            for line in page.lines:
-                words = [word for word in page.words if word.span.offset >= line.spans[0].offset and
-                         (word.span.offset + word.span.length) <= (line.spans[0].offset + line.spans[0].length)]
+    Args:
+        file_object: File buffer or bytes to analyze
+        url: URL of document to analyze
+        endpoint: Azure endpoint URL
+        key: Azure API key
+        confidence_threshold: Minimum confidence score (0-1)
+        model_id: Document Intelligence model to run
+        use_cache: Reuse results for identical file content
+        cache: Cache backend (defaults to the configured OCR cache)
+        client: Shared async client; a temporary one is created when omitted
 
-                if all(word.confidence >= confidence_threshold for word in words):
-                    full_text += line.content + "\n"
+    Returns:
+        tuple: (AnalyzeResult, extracted_text, average_confidence)
+    """
+    start_time = time.time()
+    try:
+        logger.info(f"Starting async document analysis with confidence threshold: {confidence_threshold}")
 
-                for word in words:
-                    total_confidence += word.confidence
-                    total_words += 1
+        with span("prepare"):
+            request = await asyncio.to_thread(
+                _prepare_analysis, file_object, url, model_id, confidence_threshold, use_cache, cache
+            )
+        if request.cached is not None:
+            return request.cached
 
-        avg_confidence = total_confidence / total_words if total_words > 0 else 0
+        ocr_start = time.time()
+        if client is None:
+            async with async_document_client(endpoint, key) as client:
+                result: AnalyzeResult = await ocr_scheduler.call_async(
+                    _run_analysis_async, client, model_id, request.analyze_kwargs
+                )
+        else:
+            result: AnalyzeResult = await ocr_scheduler.call_async(
+                _run_analysis_async, client, model_id, request.analyze_kwargs
+            )
+        ocr_duration = (time.time() - ocr_start) * 1000
 
-        logger.info(f"Document analysis completed. Average confidence: {avg_confidence:.2f}")
+        with span("text_assembly"):
+            output = await asyncio.to_thread(_complete_analysis, result, confidence_threshold, request)
         duration = (time.time() - start_time) * 1000
         monitoring.log_api_call("azure_ocr", duration, success=True)
-        return result, full_text, avg_confidence
+        monitoring.log_ocr_payload(request.payload, ocr_duration, output[2])
+        return output
 
-    except AzureError as e:
+    except azure_exceptions.AzureError as e:
         logger.error(f"Azure OCR error: {e}")
         duration = (time.time() - start_time) * 1000
         monitoring.log_api_call("azure_ocr", duration, success=False)
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in analyze_layout: {e}")
+        logger.error(f"Unexpected error in analyze_layout_async: {e}")
         duration = (time.time() - start_time) * 1000
         monitoring.log_api_call("azure_ocr", duration, success=False)
         raise
 
 
-def postprocess_ocr(text: str, filepath: str = "services/unecessary_words.txt") -> str:
+def _run_analysis(client: DocumentIntelligenceClient, model_id: str, analyze_kwargs: dict) -> AnalyzeResult:
+    """Submit one analysis and wait for its result (a single scheduler attempt)."""
+    with span("ocr_submit"):
+        poller = client.begin_analyze_document(model_id=model_id, **analyze_kwargs)
+    with span("ocr_poll"):
+        return poller.result()
+
+
+async def _run_analysis_async(client: AsyncDocumentIntelligenceClient, model_id: str,
+                              analyze_kwargs: dict) -> AnalyzeResult:
+    with span("ocr_submit"):
+        poller = await client.begin_analyze_document(model_id=model_id, **analyze_kwargs)
+    with span("ocr_poll"):
+        return await poller.result()
+
+
+@dataclass
+class _AnalysisRequest:
+    analyze_kwargs: dict
+    cache: CacheBackend = None
+    cache_key: str = None
+    cached: tuple = None
+    payload: str = "original"
+
+
+def _prepare_analysis(file_object, url, model_id: str, confidence_threshold: float,
+                      use_cache: bool, cache: CacheBackend) -> _AnalysisRequest:
     """
-    Removes unnecessary words from the input text based on a file containing one word per line.
+    Build the analyze request arguments and resolve a cached result when available.
 
-    Args:
-        text (str): The input text to clean.
-        filepath (str): Path to the file containing unnecessary words (one per line).
+    Images are pre-processed only on a cache miss; the cache key is the original
+    upload plus the pre-processing settings.
+    """
+    if url:
+        return _AnalysisRequest(analyze_kwargs={"analyze_request": documentintelligence_models.AnalyzeDocumentRequest(url_source=url)},
+                                payload="url")
+    if not file_object:
+        raise ValueError("Either 'file_object' or 'url' must be provided.")
+
+    document_bytes = _read_document_bytes(file_object)
+    preprocess = should_preprocess(document_bytes)
+    request = _AnalysisRequest(analyze_kwargs={"body": document_bytes})
+    if use_cache:
+        request.cache = cache or get_ocr_cache()
+        if request.cache is not None:
+            with span("ocr_cache_lookup"):
+                request.cache_key = ocr_cache_key(document_bytes, model_id, confidence_threshold,
+                                                  variant=preprocessing_signature() if preprocess else None)
+                request.cached = _load_cached_result(request.cache, request.cache_key)
+            monitoring.log_cache_event("ocr", hit=request.cached is not None)
+            if request.cached is not None:
+                logger.info("OCR cache hit, skipping Azure analysis")
+                return request
+
+    if preprocess:
+        with span("image_preprocessing"), monitoring.time_stage("image_preprocessing"):
+            image = preprocess_image(document_bytes)
+        monitoring.log_image_preprocessing(image.original_bytes, image.processed_bytes)
+        if image.applied:
+            request.analyze_kwargs["body"] = image.data
+            request.payload = "preprocessed"
+    return request
+
+
+def _complete_analysis(result, confidence_threshold: float, request: _AnalysisRequest) -> tuple:
+    """Assemble text and confidence from an AnalyzeResult and store it in the cache."""
+    full_text, total_confidence, total_words = _assemble_text(result.pages, confidence_threshold)
+
+    avg_confidence = total_confidence / total_words if total_words > 0 else 0
+
+    logger.info(f"Document analysis completed. Average confidence: {avg_confidence:.2f}")
+
+    if request.cache_key is not None:
+        _store_cached_result(request.cache, request.cache_key, result, full_text, avg_confidence)
+    return result, full_text, avg_confidence
+
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> CacheBackend:
+    """
+    Return the process-wide OCR cache built from configuration.
 
     Returns:
-        str: Cleaned text with unnecessary words removed.
+        CacheBackend: Configured cache, or None when caching is disabled
     """
+    global _ocr_cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = SQLiteCache(
+                OCR_CACHE_PATH,
+                ttl_seconds=OCR_CACHE_TTL_SECONDS,
+                max_entries=OCR_CACHE_MAX_ENTRIES,
+                max_bytes=OCR_CACHE_MAX_BYTES
+            )
+        return _ocr_cache
+
+
+def ocr_cache_key(document_bytes: bytes, model_id: str, confidence_threshold: float, variant: str = None) -> str:
+    """Build the content-addressed cache key for an OCR request (`variant` marks a transformed payload)."""
+    digest = hashlib.sha256(document_bytes).hexdigest()
+    key = f"ocr:{digest}:{model_id}:{confidence_threshold}"
+    return f"{key}:{variant}" if variant else key
+
+
+def _read_document_bytes(file_object) -> bytes:
+    """Read the full content of a bytes object or file buffer without consuming it."""
+    if isinstance(file_object, (bytes, bytearray)):
+        return bytes(file_object)
+    if hasattr(file_object, "getvalue"):
+        return file_object.getvalue()
+    position = file_object.tell()
+    data = file_object.read()
+    file_object.seek(position)
+    return data
+
+
+def _load_cached_result(cache: CacheBackend, cache_key: str):
+    """Return a cached (AnalyzeResult, text, confidence) tuple, or None on miss or error."""
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            unnecessary_words = f.read().splitlines()
+        payload = cache.get(cache_key)
+        if payload is None:
+            return None
+        entry = json.loads(payload)
+        return documentintelligence_models.AnalyzeResult(entry["result"]), entry["full_text"], entry["avg_confidence"]
+    except Exception as e:
+        logger.error(f"Failed to read OCR cache entry: {e}")
+        return None
 
-        for word in unnecessary_words:
-            text = text.replace(word, "")
 
-        return text
-    except FileNotFoundError:
-        logger.error(f"Unnecessary words file not found: {filepath}")
-        raise
+def _store_cached_result(cache: CacheBackend, cache_key: str, result, full_text: str, avg_confidence: float):
+    """Serialize an OCR result into the cache; failures are logged and ignored."""
+    try:
+        entry = {"result": result.as_dict(), "full_text": full_text, "avg_confidence": avg_confidence}
+        cache.set(cache_key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
     except Exception as e:
-        logger.error(f"Error in postprocess_ocr: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Failed to write OCR cache entry: {e}")
+
+
+def _assign_words_to_lines(page) -> list[list]:
+    """
+    Assign each word of a page to the lines whose spans contain it.
+
+    Words are indexed once by span offset, so every line span is resolved with
+    a binary search instead of a scan over all words on the page. Lines made of
+    several spans collect the words of each of them.
+
+    Args:
+        page: DocumentPage with `words` and `lines`
+
+    Returns:
+        list: One list of words per line, in line order
+    """
+    words = sorted(page.words or [], key=lambda word: word.span.offset)
+    offsets = [word.span.offset for word in words]
+
+    line_words = []
+    for line in page.lines or []:
+        assigned = []
+        for line_span in line.spans:
+            span_end = line_span.offset + line_span.length
+            i = bisect_left(offsets, line_span.offset)
+            while i < len(words) and offsets[i] < span_end:
+                word = words[i]
+                if word.span.offset + word.span.length <= span_end:
+                    assigned.append(word)
+                i += 1
+        line_words.append(assigned)
+    return line_words
+
+
+@dataclass(frozen=True)
+class PageText:
+    """OCR output of a single page."""
+    page_number: int
+    text: str
+    confidence: float
+    word_count: int
+    layout: object = field(default=None, repr=False, compare=False)
+
+
+def document_pages(result, confidence_threshold: float = CONFIDENCE_THRESHOLD) -> list[PageText]:
+    """
+    Split an AnalyzeResult into per-page text and confidence.
+
+    Args:
+        result: AnalyzeResult (fresh or restored from the OCR cache)
+        confidence_threshold: Minimum confidence score (0-1), as used for `analyze_layout`
+
+    Returns:
+        list: One PageText per page, in page order; `layout` is the page's DocumentPage
+    """
+    pages = []
+    for index, page in enumerate(result.pages or []):
+        text, total_confidence, total_words = _assemble_page(page, confidence_threshold)
+        pages.append(PageText(
+            page_number=getattr(page, "page_number", None) or index + 1,
+            text=text,
+            confidence=total_confidence / total_words if total_words > 0 else 0,
+            word_count=total_words,
+            layout=page
+        ))
+    return pages
+
+
+def _assemble_page(page, confidence_threshold: float) -> tuple[str, float, int]:
+    """Build one page's text from lines whose words all meet the confidence threshold."""
+    parts = []
+    total_confidence = 0
+    total_words = 0
+
+    for line, words in zip(page.lines or [], _assign_words_to_lines(page)):
+        if all(word.confidence >= confidence_threshold for word in words):
+            parts.append(line.content + "\n")
+
+        for word in words:
+            total_confidence += word.confidence
+            total_words += 1
+
+    return "".join(parts), total_confidence, total_words
+
+
+def _assemble_text(pages, confidence_threshold: float) -> tuple[str, float, int]:
+    """
+    Build the document text from lines whose words all meet the confidence threshold.
+
+    Args:
+        pages: Pages of an AnalyzeResult
+        confidence_threshold: Minimum confidence score (0-1)
+
+    Returns:
+        tuple: (extracted_text, total_confidence, total_words)
+    """
+    parts = []
+    total_confidence = 0
+    total_words = 0
+
+    for page in pages or []:
+        text, page_confidence, page_words = _assemble_page(page, confidence_threshold)
+        parts.append(text)
+        total_confidence += page_confidence
+        total_words += page_words
+
+    return "".join(parts), total_confidence, total_words
@@ -0,0 +1,55 @@
+"""
+Environment file loading and process configuration.
+Settings are read from the process environment, optionally filled from a .env
+file. Importing the services never touches the environment file or the log
+handlers; entry points (the app, worker, API, batch and the other CLIs) call
+`configure` first, before importing any other services module.
+"""
+
+from dotenv import load_dotenv
+import os
+import threading
+
+_loaded: set = set()
+_lock = threading.Lock()
+
+
+def load_environment(path: str = None, override: bool = False) -> bool:
+    """
+    Load a .env file into the environment, once per file.
+
+    Args:
+        path: File to load (defaults to ENV_FILE, else the nearest .env found
+            walking up from this package, as before)
+        override: Replace variables that are already set
+
+    Returns:
+        bool: True when this call read the file, False when it had been loaded already
+    """
+    path = path or os.getenv("ENV_FILE") or None
+    key = os.path.abspath(path) if path else None
+    with _lock:
+        if key in _loaded:
+            return False
+        load_dotenv(dotenv_path=path, override=override)
+        _loaded.add(key)
+        return True
+
+
+def configure(env_file: str = None):
+    """
+    Load the .env file, then start logging (idempotent).
+
+    services.config and services.logger_config read their settings when first
+    imported, so call this before importing them.
+
+    Args:
+        env_file: File to load (defaults to ENV_FILE, else the nearest .env)
+    """
+    loaded = load_environment(env_file)
+    # Imported only now, so the LOG_* settings include the file just loaded
+    from services.logger_config import configure_logging, logging
+    configure_logging()
+    if loaded:
+        source = env_file or os.getenv("ENV_FILE") or "the nearest .env file"
+        logging.getLogger(__name__).info(f"Environment variables loaded from {source}; logging configured")
@@ -0,0 +1,111 @@
+"""
+Image pre-processing before OCR.
+Shrinks photographed forms before they are uploaded to Document Intelligence:
+corrects EXIF orientation, converts to grayscale, downscales to a target
+resolution and recompresses as JPEG. PDFs and other inputs pass through.
+"""
+
+from services.logger_config import logging
+from services.lazy_imports import lazy_import
+from services.config import (
+    IMAGE_PREPROCESSING, IMAGE_TARGET_DPI, IMAGE_GRAYSCALE, IMAGE_JPEG_QUALITY, IMAGE_MAX_BYTES
+)
+from dataclasses import dataclass
+from io import BytesIO
+import math
+
+logger = logging.getLogger(__name__)
+
+# Pillow is only needed once an image is actually pre-processed
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# Long side of an A4 page; photos carry no reliable DPI, so the target size assumes a full page
+PAGE_LONG_SIDE_INCHES = 11.7
+MIN_JPEG_QUALITY = 50
+QUALITY_STEP = 10
+_IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"II*\x00", b"MM\x00*", b"BM")
+
+
+@dataclass(frozen=True)
+class PreprocessedImage:
+    data: bytes
+    original_bytes: int
+    processed_bytes: int
+    applied: bool
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+
+def is_image(document_bytes: bytes) -> bool:
+    """Whether the bytes are a JPEG, PNG, TIFF or BMP image (by signature)."""
+    return document_bytes.startswith(_IMAGE_SIGNATURES)
+
+
+def preprocessing_signature() -> str:
+    """Settings that change the uploaded payload; part of OCR cache keys for pre-processed images."""
+    return f"pre:{IMAGE_TARGET_DPI}:{int(IMAGE_GRAYSCALE)}:{IMAGE_JPEG_QUALITY}:{IMAGE_MAX_BYTES}"
+
+
+def should_preprocess(document_bytes: bytes) -> bool:
+    """Whether pre-processing is enabled and applies to this document."""
+    return IMAGE_PREPROCESSING and is_image(document_bytes)
+
+
+def preprocess_image(document_bytes: bytes, target_dpi: int = IMAGE_TARGET_DPI, grayscale: bool = IMAGE_GRAYSCALE,
+                     quality: int = IMAGE_JPEG_QUALITY, max_bytes: int = IMAGE_MAX_BYTES) -> PreprocessedImage:
+    """
+    Shrink an image for OCR.
+
+    Args:
+        document_bytes: Image file content
+        target_dpi: Resolution of a full page after downscaling (never upscales)
+        grayscale: Convert to 8-bit grayscale
+        quality: JPEG quality to encode with
+        max_bytes: Size target; quality is lowered in steps down to MIN_JPEG_QUALITY to reach it (0 disables)
+
+    Returns:
+        PreprocessedImage: The smaller encoding, or the original bytes when it is not smaller
+    """
+    original_bytes = len(document_bytes)
+    try:
+        with Image.open(BytesIO(document_bytes)) as image:
+            if getattr(image, "n_frames", 1) > 1:
+                # Multi-page TIFFs would lose every page but the first
+                return PreprocessedImage(document_bytes, original_bytes, original_bytes, applied=False)
+            mode = "L" if grayscale else "RGB"
+            max_side = int(target_dpi * PAGE_LONG_SIDE_INCHES)
+            scale = max_side / max(image.size)
+            if image.format == "JPEG":
+                # Let the decoder convert and scale by 1/2..1/8 in the DCT domain (never below the target)
+                image.draft(mode, (math.ceil(image.width * min(scale, 1)), math.ceil(image.height * min(scale, 1))))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert(mode)
+
+            if max(image.size) > max_side:
+                scale = max_side / max(image.size)
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.LANCZOS)
+
+            data = _encode_jpeg(image, quality)
+            while max_bytes and len(data) > max_bytes and quality > MIN_JPEG_QUALITY:
+                quality = max(MIN_JPEG_QUALITY, quality - QUALITY_STEP)
+                data = _encode_jpeg(image, quality)
+    except Exception as e:
+        logger.error(f"Image pre-processing failed, sending the original upload: {e}")
+        return PreprocessedImage(document_bytes, original_bytes, original_bytes, applied=False)
+
+    if len(data) >= original_bytes:
+        return PreprocessedImage(document_bytes, original_bytes, original_bytes, applied=False)
+
+    logger.info(f"Pre-processed image {original_bytes} -> {len(data)} bytes ({image.width}x{image.height}, "
+                f"quality {quality})")
+    return PreprocessedImage(data, original_bytes, len(data), applied=True)
+
+
+def _encode_jpeg(image, quality: int) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
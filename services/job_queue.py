@@ -0,0 +1,278 @@
+"""
+Durable job queue for service mode.
+Stores submitted documents and their results in one SQLite file shared by the
+HTTP API and any number of worker processes. Workers claim jobs under a
+time-limited lease; jobs whose worker dies become claimable again when the
+lease expires, failed jobs are retried with exponential backoff, and jobs that
+exhaust their attempts are dead-lettered.
+"""
+
+from services.logger_config import logging
+from services.config import JOB_DB_PATH, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY_SECONDS
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("queued", "running", "done", "dead")
+
+
+@dataclass
+class Job:
+    id: str
+    status: str
+    filename: str
+    options: dict
+    attempts: int
+    max_attempts: int
+    created_at: float
+    updated_at: float
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    document: Optional[bytes] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable view without the document bytes."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "options": self.options,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error
+        }
+
+
+def job_id_for(document: bytes, options: dict) -> str:
+    """Content-derived job id, so resubmitting a document with the same options returns the same job."""
+    digest = hashlib.sha256(document)
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class JobQueue:
+    """
+    SQLite-backed queue safe to share between threads and processes.
+
+    Claims and every other read-then-write transaction run under `BEGIN
+    IMMEDIATE`, so two workers never lease the same job and a transaction never
+    has to upgrade its read lock (which fails with "database is locked" under WAL). Keep the database on a local disk (or a volume shared by
+    containers on one host); SQLite locking is unreliable on network file systems.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, lease_seconds: float = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay_seconds: float = JOB_RETRY_DELAY_SECONDS):
+        """
+        Args:
+            path: SQLite database file path
+            lease_seconds: How long a claimed job stays leased without a heartbeat
+            max_attempts: Attempts before a job is dead-lettered
+            retry_delay_seconds: Delay before the first retry; doubles with every attempt
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode: transactions are opened explicitly in `_transaction`
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, options TEXT NOT NULL, "
+                "document BLOB, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+                "available_at REAL NOT NULL, lease_owner TEXT, lease_expires REAL, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, available_at)")
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def submit(self, document: bytes, filename: str = None, options: dict = None) -> Job:
+        """
+        Enqueue a document, or return the existing job for the same document and options.
+
+        A dead-lettered job is queued again with fresh attempts.
+
+        Args:
+            document: Document bytes
+            filename: Original file name (informational)
+            options: Pipeline options, e.g. {"extraction_mode": "combined"}
+
+        Returns:
+            Job: The new or existing job
+        """
+        options = options or {}
+        job_id = job_id_for(document, options)
+        now = time.time()
+        with self._transaction(immediate=True) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, status, filename, options, document, max_attempts, available_at, "
+                "created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, json.dumps(options), sqlite3.Binary(document), self.max_attempts, now, now, now)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'", (now, now, job_id)
+            )
+        logger.info(f"Job {job_id} submitted ({filename})")
+        return self.get(job_id)
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """
+        Lease the oldest available job.
+
+        Available jobs are queued ones past their retry delay and running ones
+        whose lease expired. Expired jobs without attempts left are dead-lettered.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            Job: The leased job including its document, or None when the queue is empty
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as conn:
+            dead = conn.execute(
+                "UPDATE jobs SET status = 'dead', error = 'Lease expired after the last attempt', "
+                "lease_owner = NULL, updated_at = ? "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now, now)
+            ).rowcount
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                "OR (status = 'running' AND lease_expires < ?) ORDER BY available_at LIMIT 1", (now, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, updated_at = ? WHERE id = ?",
+                    (worker_id, now + self.lease_seconds, now, row[0])
+                )
+        if dead:
+            logger.error(f"Dead-lettered {dead} job(s) whose lease expired after the last attempt")
+        return self.get(row[0], include_document=True) if row is not None else None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend a lease; returns False when the worker no longer holds it."""
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            ).rowcount
+        return bool(updated)
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        """
+        Store a job's result and drop its document.
+
+        Returns:
+            bool: False when the lease was lost (another worker owns the job now)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, document = NULL, error = NULL, lease_owner = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), now, job_id, worker_id)
+            ).rowcount
+        if not updated:
+            logger.warning(f"Job {job_id} finished after its lease was lost; result discarded")
+        return bool(updated)
+
+    def fail(self, job_id: str, worker_id: str, error: str, retryable: bool = True) -> str:
+        """
+        Record a failed attempt: retry with backoff, or dead-letter the job.
+
+        Returns:
+            str: The job's new status ('queued' or 'dead'), or None when the lease was lost
+        """
+        now = time.time()
+        with self._transaction(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'running' AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, max_attempts = row
+            if retryable and attempts < max_attempts:
+                status = "queued"
+                available_at = now + self.retry_delay_seconds * 2 ** (attempts - 1)
+            else:
+                status, available_at = "dead", now
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, error = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ?", (status, available_at, error, now, job_id)
+            )
+        if status == "dead":
+            logger.error(f"Job {job_id} dead-lettered after {attempts} attempt(s): {error}")
+        else:
+            logger.warning(f"Job {job_id} attempt {attempts} failed, retrying in {available_at - now:.0f}s: {error}")
+        return status
+
+    def get(self, job_id: str, include_document: bool = False) -> Optional[Job]:
+        """Return a job (without its document unless requested), or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, filename, options, attempts, max_attempts, created_at, updated_at, result, error"
+                + (", document" if include_document else "") + " FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(
+            id=row[0], status=row[1], filename=row[2], options=json.loads(row[3]), attempts=row[4],
+            max_attempts=row[5], created_at=row[6], updated_at=row[7],
+            result=json.loads(row[8]) if row[8] is not None else None, error=row[9],
+            document=row[10] if include_document else None
+        )
+
+    def requeue_dead(self, job_id: str = None) -> int:
+        """Queue dead-lettered jobs (all of them, or one) again with fresh attempts; returns how many."""
+        now = time.time()
+        query = ("UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, error = NULL, updated_at = ? "
+                 "WHERE status = 'dead'")
+        params = (now, now)
+        if job_id is not None:
+            query += " AND id = ?"
+            params += (job_id,)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    def stats(self) -> dict:
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,170 @@
+"""
+Incremental JSON parsing for streamed model responses.
+Consumes a JSON document in arbitrary chunks and reports every scalar value
+(string, number, boolean or null) as soon as its last character arrives, so
+form fields can be shown before the whole completion has been generated.
+"""
+
+from services.logger_config import logging
+import json
+import re
+
+logger = logging.getLogger(__name__)
+
+# Next character that ends a string token or starts an escape sequence
+_STRING_STOP = re.compile(r'["\\]')
+# Characters that end a number or literal token
+_LITERAL_STOP = re.compile(r"[,}\]\s]")
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Streaming parser emitting (path, value) for each completed scalar value.
+
+    Paths are tuples of object keys and array indices, e.g. ("address", "city").
+    The parser does not build the document; callers that need it parse the
+    full text once the stream ends. Malformed input raises `json.JSONDecodeError`.
+    """
+
+    def __init__(self):
+        # One frame per open container: [is_object, key or index, expecting_key]
+        self._stack: list[list] = []
+        self._token: list[str] = []
+        self._in_string = False
+        self._in_literal = False
+        self._escape = False
+        self._position = 0
+
+    def feed(self, chunk: str) -> list[tuple[tuple, object]]:
+        """
+        Parse the next chunk of the document.
+
+        Args:
+            chunk: Next piece of the JSON text
+
+        Returns:
+            list: (path, value) of the scalar values completed by this chunk
+        """
+        completed = []
+        index, length = 0, len(chunk)
+        while index < length:
+            if self._in_string:
+                index = self._scan_string(chunk, index, completed)
+                continue
+            char = chunk[index]
+            if self._in_literal:
+                if not _LITERAL_STOP.match(char):
+                    stop = _LITERAL_STOP.search(chunk, index)
+                    end = stop.start() if stop else length
+                    self._token.append(chunk[index:end])
+                    index = end
+                    continue
+                self._finish_literal(completed)
+            if char in _WHITESPACE:
+                pass
+            elif char == '"':
+                self._in_string = True
+                self._token = [char]
+            elif char == "{":
+                self._open(is_object=True)
+            elif char == "[":
+                self._open(is_object=False)
+            elif char in "}]":
+                self._close(char)
+            elif char == ":":
+                self._expect(is_object=True, expecting_key=True, char=char)
+                self._stack[-1][2] = False
+            elif char == ",":
+                self._next_item()
+            else:
+                self._in_literal = True
+                self._token = [char]
+            index += 1
+        self._position += length
+        return completed
+
+    def close(self) -> list[tuple[tuple, object]]:
+        """
+        Finish parsing; returns a trailing top-level number or literal, if any.
+
+        Raises:
+            json.JSONDecodeError: If the document is incomplete
+        """
+        completed = []
+        if self._in_literal:
+            self._finish_literal(completed)
+        if self._in_string or self._stack:
+            raise json.JSONDecodeError("Unterminated JSON document", "", self._position)
+        return completed
+
+    def _scan_string(self, chunk: str, index: int, completed: list) -> int:
+        if self._escape:
+            self._token.append(chunk[index])
+            self._escape = False
+            return index + 1
+        stop = _STRING_STOP.search(chunk, index)
+        if stop is None:
+            self._token.append(chunk[index:])
+            return len(chunk)
+        end = stop.start()
+        self._token.append(chunk[index:end + 1])
+        if stop.group() == "\\":
+            self._escape = True
+            return end + 1
+        self._in_string = False
+        self._finish_string(completed)
+        return end + 1
+
+    def _finish_string(self, completed: list):
+        value = self._decode()
+        if self._stack and self._stack[-1][0] and self._stack[-1][2]:
+            if not isinstance(value, str):
+                raise json.JSONDecodeError("Object keys must be strings", "", self._position)
+            self._stack[-1][1] = value
+        else:
+            completed.append((self._path(), value))
+
+    def _finish_literal(self, completed: list):
+        self._in_literal = False
+        if self._stack and self._stack[-1][0] and self._stack[-1][2]:
+            raise json.JSONDecodeError("Object keys must be strings", "", self._position)
+        completed.append((self._path(), self._decode()))
+
+    def _decode(self):
+        raw = "".join(self._token)
+        self._token = []
+        return json.loads(raw)
+
+    def _open(self, is_object: bool):
+        if self._stack and self._stack[-1][0] and self._stack[-1][2]:
+            raise json.JSONDecodeError("Object keys must be strings", "", self._position)
+        self._stack.append([is_object, None if is_object else 0, is_object])
+
+    def _close(self, char: str):
+        self._expect(is_object=char == "}", expecting_key=None, char=char)
+        self._stack.pop()
+
+    def _next_item(self):
+        if not self._stack:
+            raise json.JSONDecodeError("Unexpected ','", "", self._position)
+        frame = self._stack[-1]
+        if frame[0]:
+            frame[2] = True
+        else:
+            frame[1] += 1
+
+    def _expect(self, is_object: bool, expecting_key: bool, char: str):
+        if (not self._stack or self._stack[-1][0] != is_object
+                or (expecting_key is not None and self._stack[-1][2] != expecting_key)):
+            raise json.JSONDecodeError(f"Unexpected '{char}'", "", self._position)
+
+    def _path(self) -> tuple:
+        return tuple(frame[1] for frame in self._stack)
+
+
+def set_path(document: dict, path: tuple, value):
+    """Store `value` at an object key path, creating intermediate objects."""
+    for key in path[:-1]:
+        document = document.setdefault(key, {})
+    document[path[-1]] = value
@@ -0,0 +1,53 @@
+"""
+Deferred imports of heavy dependencies.
+The Azure and OpenAI SDKs (with their pydantic models and HTTP stacks) account
+for most of the process start-up time. Modules reference them through
+`lazy_import` proxies instead, so a process only pays for an SDK once it
+actually calls it, and Streamlit reruns, CLIs and workers start faster.
+"""
+
+import importlib
+import sys
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access."""
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        module = self._module
+        if module is None:
+            # The import lock makes concurrent first accesses safe; they all get the same module
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module has been imported (by this proxy or anyone else)."""
+        return self._module is not None or self._name in sys.modules
+
+    def load(self):
+        """Import the module now, e.g. while warming up; returns the real module."""
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}' ({'loaded' if self.loaded else 'not loaded'})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Reference a module without importing it yet.
+
+    Args:
+        name: Absolute module name, e.g. 'azure.ai.documentintelligence'
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the module
+    """
+    return LazyModule(name)
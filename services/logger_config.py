@@ -1,20 +1,157 @@
 import logging
+import logging.handlers
+import atexit
 import json
+import os
+import queue
+import threading
+from collections import deque
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Dict, Any
+from typing import Deque, Dict, Any
+
+# Read when first imported: entry points load .env first (services.environment.configure).
+# services.config imports this module, so logging settings are read from the environment directly.
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()  # "size", "time" or "none"
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATION_WHEN = os.getenv("LOG_ROTATION_WHEN", "midnight")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_METRICS_BUFFER = int(os.getenv("LOG_METRICS_BUFFER", "1000"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(correlation)s%(message)s'
+
+# Correlation ID of the document being processed in the current thread or task (set by services.tracing)
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default=None)
+
+class CorrelationIdFilter(logging.Filter):
+    """Stamps records with the caller's correlation ID before they cross to the listener thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines; structured metrics payloads are serialized here, on the listener thread"""
 
-class EnhancedLogger:
     def __init__(self):
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('app.log'),
-                logging.StreamHandler()
-            ]
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = getattr(record, "metrics_payload", None)
+        if payload is not None:
+            record.msg, record.args = json.dumps(payload, default=str), None
+        record_id = getattr(record, "correlation_id", None)
+        record.correlation = f"[{record_id}] " if record_id else ""
+        return super().format(record)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.utcfromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        record_id = getattr(record, "correlation_id", None)
+        if record_id:
+            entry["correlation_id"] = record_id
+        payload = getattr(record, "metrics_payload", None)
+        if payload is not None:
+            entry["metrics"] = payload.get("metrics")
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that keeps formatting and log I/O off the calling thread.
+
+    Records are only merged with their arguments here. When the queue is full, records below WARNING are
+    dropped and counted; warnings and errors wait for space instead of being lost.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _build_handlers() -> list:
+    if LOG_ROTATION == "time":
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATION_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
         )
+    elif LOG_ROTATION == "size":
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+    handlers = [file_handler, logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+_listener: logging.handlers.QueueListener = None
+_queue_handler: DroppingQueueHandler = None
+_configure_lock = threading.Lock()
+
+def configure_logging() -> DroppingQueueHandler:
+    """
+    Route all logging through a bounded queue drained by a background listener (idempotent).
+
+    Importing this module installs no handlers and opens no log file; entry points call this
+    through `services.environment.configure`. Until then records follow Python's defaults.
+    """
+    global _listener, _queue_handler
+    with _configure_lock:
+        if _queue_handler is None:
+            _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+            _queue_handler.addFilter(CorrelationIdFilter())
+            _listener = logging.handlers.QueueListener(
+                _queue_handler.queue, *_build_handlers(), respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(shutdown_logging)
+
+            root = logging.getLogger()
+            root.setLevel(LOG_LEVEL)
+            root.addHandler(_queue_handler)
+        return _queue_handler
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class EnhancedLogger:
+    def __init__(self, metrics_buffer_size: int = LOG_METRICS_BUFFER):
         self.logger = logging.getLogger(__name__)
-        self.metrics: Dict[str, Any] = {}
+        # Most recent metrics payloads, bounded so long-running workers do not grow without limit
+        self.metrics: Deque[Dict[str, Any]] = deque(maxlen=metrics_buffer_size)
 
     def info(self, message: str, **metrics):
         """Regular info logging with optional metrics"""
@@ -31,16 +168,24 @@ class EnhancedLogger:
             self.logger.error(message)
 
     def log_with_metrics(self, message: str, level: str, **metrics):
-        """Log message with associated metrics"""
+        """Log message with associated metrics; serialization is deferred to the listener thread"""
         log_data = {
             "message": message,
             "timestamp": datetime.utcnow().isoformat(),
             "metrics": metrics
         }
-        self.metrics.update(metrics)
-        if level == "error":
-            self.logger.error(json.dumps(log_data))
-        else:
-            self.logger.info(json.dumps(log_data))
+        self.metrics.append(log_data)
+        self.logger.log(logging.ERROR if level == "error" else logging.INFO, message,
+                        extra={"metrics_payload": log_data})
+
+    @property
+    def queue_handler(self) -> DroppingQueueHandler:
+        """Handler of the log queue, or None until logging is configured"""
+        return _queue_handler
+
+    @property
+    def dropped_records(self) -> int:
+        """Records dropped because the log queue was full"""
+        return _queue_handler.dropped if _queue_handler is not None else 0
 
-logger = EnhancedLogger()
\ No newline at end of file
+logger = EnhancedLogger()
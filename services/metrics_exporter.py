@@ -0,0 +1,240 @@
+"""
+Prometheus metrics exporter.
+Serves the current `monitoring` snapshot in the Prometheus text exposition
+format on a local port from a background thread, so the Streamlit app and the
+batch runner can be scraped without any additional dependency.
+"""
+
+from services.logger_config import logging
+from services.config import METRICS_HOST, METRICS_PORT
+from services.monitoring import monitoring, ApplicationMonitoring
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "form_parser"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class _Writer:
+    """Accumulates metric families, emitting HELP/TYPE once per family."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self._declared: set[str] = set()
+
+    def sample(self, name: str, metric_type: str, help_text: str, value: float, labels: dict = None):
+        name = f"{METRIC_PREFIX}_{name}"
+        self._declare(name, metric_type, help_text)
+        self.lines.append(f"{name}{_labels(labels)} {float(value)!r}")
+
+    def histogram(self, name: str, help_text: str, histogram: dict, labels: dict = None):
+        """Write a monitoring histogram snapshot (milliseconds) as a Prometheus histogram in seconds."""
+        name = f"{METRIC_PREFIX}_{name}"
+        self._declare(name, "histogram", help_text)
+        labels = labels or {}
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            le = bound if bound == "+Inf" else repr(float(bound) / 1000)
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+        self.lines.append(f"{name}_sum{_labels(labels)} {histogram['sum_ms'] / 1000!r}")
+        self.lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+    def _declare(self, name: str, metric_type: str, help_text: str):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """
+    Render a monitoring snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot: Result of `ApplicationMonitoring.snapshot()`
+
+    Returns:
+        str: Exposition text
+    """
+    out = _Writer()
+
+    for api_name, counters in snapshot["api_calls"].items():
+        for status in ("success", "failed"):
+            out.sample("api_calls_total", "counter", "External API calls by outcome.",
+                       counters[status], {"api": api_name, "status": status})
+    for api_name, counters in snapshot["api_calls"].items():
+        out.histogram("api_call_duration_seconds", "External API call latency.",
+                      counters["latency_ms"], {"api": api_name})
+
+    for stage, histogram in snapshot["stages"].items():
+        out.histogram("stage_duration_seconds", "Pipeline stage latency.", histogram, {"stage": stage})
+    out.histogram("document_duration_seconds", "End-to-end document processing latency.",
+                  snapshot["performance"]["document_latency_ms"])
+
+    processing = snapshot["processing"]
+    out.sample("documents_processed_total", "counter", "Documents processed.", processing["documents_processed"])
+    out.sample("ocr_confidence_average", "gauge", "Average OCR word confidence.", processing["average_ocr_confidence"])
+    out.sample("form_completeness_average", "gauge", "Average form completeness score.",
+               processing["average_form_completeness"])
+    out.sample("errors_total", "counter", "Application errors.", processing["errors"])
+    for error_type, count in processing["errors_by_type"].items():
+        out.sample("errors_by_type_total", "counter", "Application errors by exception type.", count,
+                   {"type": error_type})
+
+    for cache_name, counters in snapshot["cache"].items():
+        for result, key in (("hit", "hits"), ("miss", "misses")):
+            out.sample("cache_requests_total", "counter", "Cache lookups by result.", counters[key],
+                       {"cache": cache_name, "result": result})
+    for cache_name, counters in snapshot["cache"].items():
+        out.sample("cache_hit_ratio", "gauge", "Cache hit ratio since start or reset.", counters["hit_rate"],
+                   {"cache": cache_name})
+
+    for method in ("local", "fallback"):
+        out.sample("language_detection_total", "counter", "Language detections by method.",
+                   snapshot["language_detection"][method], {"method": method})
+
+    for api_name, counters in snapshot["retries"].items():
+        for reason in ("throttled", "errors"):
+            out.sample("api_retries_total", "counter", "Failed API attempts by reason (429 or transient error).",
+                       counters[reason], {"api": api_name, "reason": reason})
+    for api_name, counters in snapshot["retries"].items():
+        out.sample("api_retries_exhausted_total", "counter", "API calls abandoned after the last retry.",
+                   counters["exhausted"], {"api": api_name})
+
+    for status in ("relevant", "skipped"):
+        out.sample("pages_total", "counter", "OCR pages by relevance to the form.", snapshot["pages"][status],
+                   {"status": status})
+    out.sample("page_split_documents_total", "counter", "Documents extracted page by page.",
+               snapshot["pages"]["split_documents"])
+    for outcome in ("merged", "discarded"):
+        out.sample("page_language_mismatch_total", "counter",
+                   "Pages of split documents read in another language than the document.",
+                   snapshot["pages"][f"other_language_{outcome}"], {"outcome": outcome})
+
+    out.sample("review_documents_flagged_total", "counter", "Documents with fields flagged for review.",
+               snapshot["review"]["documents_flagged"])
+    out.sample("review_fields_flagged_total", "counter", "Extracted fields flagged for review.",
+               snapshot["review"]["fields_flagged"])
+
+    preprocessing = snapshot["image_preprocessing"]
+    out.sample("image_preprocessing_images_total", "counter", "Images pre-processed before OCR.",
+               preprocessing["images"])
+    out.sample("image_preprocessing_bytes_saved_total", "counter", "Upload bytes saved by image pre-processing.",
+               preprocessing["bytes_saved"])
+    for payload, counters in snapshot["ocr_payloads"].items():
+        out.histogram("ocr_payload_duration_seconds", "Azure OCR latency by payload kind.", counters["latency_ms"],
+                      {"payload": payload})
+    for payload, counters in snapshot["ocr_payloads"].items():
+        out.sample("ocr_payload_confidence_average", "gauge", "Average OCR word confidence by payload kind.",
+                   counters["average_ocr_confidence"], {"payload": payload})
+
+    compaction = snapshot["prompt_compaction"]
+    out.sample("prompt_compaction_requests_total", "counter", "Extraction prompts compacted.", compaction["requests"])
+    out.sample("prompt_compaction_truncated_total", "counter", "Extraction prompts cut to the token budget.",
+               compaction["truncated"])
+    out.sample("prompt_tokens_saved_total", "counter", "Estimated prompt tokens removed by compaction.",
+               compaction["tokens_saved"])
+
+    for mode_name, mode in snapshot["extraction_modes"].items():
+        out.sample("extraction_mode_documents_total", "counter", "Documents processed by extraction mode.",
+                   mode["documents_processed"], {"mode": mode_name})
+
+    for gauge_name, value in snapshot["gauges"].items():
+        out.sample(gauge_name, "gauge", f"Current {gauge_name.replace('_', ' ')}.", value)
+
+    return out.render()
+
+
+class MetricsExporter:
+    """HTTP server exposing `/metrics` from a daemon thread."""
+
+    def __init__(self, port: int = METRICS_PORT, host: str = METRICS_HOST,
+                 source: ApplicationMonitoring = monitoring):
+        """
+        Args:
+            port: Port to listen on (0 picks a free port)
+            host: Interface to bind; defaults to localhost only
+            source: Monitoring instance whose snapshot is served
+        """
+        self.host = host
+        self.port = port
+        self.source = source
+        self._server: ThreadingHTTPServer = None
+        self._thread: threading.Thread = None
+
+    def start(self) -> "MetricsExporter":
+        source = self.source
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = render_prometheus(source.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes every few seconds would otherwise flood stderr
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logger.error(f"Could not start metrics exporter on {self.host}:{self.port}: {e}")
+            raise
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving Prometheus metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_exporter: MetricsExporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_metrics_exporter(port: int = METRICS_PORT, host: str = METRICS_HOST) -> MetricsExporter:
+    """
+    Start the process-wide exporter once; later calls return the running instance.
+
+    Args:
+        port: Port to listen on; None or a negative value disables the exporter
+        host: Interface to bind
+
+    Returns:
+        MetricsExporter: The running exporter, or None when disabled
+    """
+    global _exporter
+    if port is None or port < 0:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = MetricsExporter(port, host).start()
+        return _exporter
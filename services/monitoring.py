@@ -1,8 +1,20 @@
 from dataclasses import dataclass
 from datetime import datetime
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
 import time
 from typing import Dict, Any
 from services.logger_config import logger
+from services.config import MONITORING_LOG_INTERVAL_SECONDS
+from services.tracing import span
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+# Pipeline stages with dedicated latency histograms
+STAGES = ("image_preprocessing", "ocr", "postprocess", "language_detection", "extraction", "extraction_first_field",
+          "combined_extraction", "validation", "confidence_analysis")
 
 @dataclass
 class ProcessMetrics:
@@ -12,67 +24,357 @@ class ProcessMetrics:
     status: str
     details: Dict[str, Any]
 
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; not synchronized, callers hold the monitoring lock."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value_ms: float):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.sum += value_ms
+        self.min = value_ms if self.min is None else min(self.min, value_ms)
+        self.max = value_ms if self.max is None else max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimate a percentile (0-1) by linear interpolation inside the matching bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum_ms": self.sum,
+            "mean_ms": self.sum / self.count if self.count else 0.0,
+            "min_ms": self.min or 0.0,
+            "max_ms": self.max or 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+        }
+
 class ApplicationMonitoring:
-    def __init__(self):
-        self.metrics: Dict[str, Any] = {
-            "api_calls": {
+    """
+    Thread-safe application metrics.
+
+    Counters and histograms are updated under one lock, so recording an event
+    costs a few dictionary operations. Instead of logging on every event, an
+    aggregated summary is logged at most every `log_interval_seconds`.
+    """
+
+    def __init__(self, log_interval_seconds: float = MONITORING_LOG_INTERVAL_SECONDS):
+        self.log_interval_seconds = log_interval_seconds
+        self._lock = threading.Lock()
+        # Gauges describe current state (queue depth, in-flight requests), so reset() keeps them
+        self._gauges: Dict[str, float] = {}
+        self.reset()
+
+    def reset(self):
+        """Clear all counters and histograms"""
+        with self._lock:
+            self._api_calls: Dict[str, Dict[str, float]] = {
                 "azure_ocr": {"success": 0, "failed": 0, "total_time_ms": 0},
                 "openai": {"success": 0, "failed": 0, "total_time_ms": 0}
-            },
-            "processing": {
+            }
+            self._api_latency: Dict[str, LatencyHistogram] = {
+                api_name: LatencyHistogram() for api_name in self._api_calls
+            }
+            self._processing = {
                 "documents_processed": 0,
-                "average_ocr_confidence": 0,
-                "average_form_completeness": 0,
+                "ocr_confidence_sum": 0.0,
+                "form_completeness_sum": 0.0,
                 "errors": 0
-            },
-            "performance": {
-                "average_processing_time_ms": 0
             }
-        }
+            self._document_latency = LatencyHistogram()
+            self._stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+            self._cache = {
+                "ocr": {"hits": 0, "misses": 0},
+                "llm": {"hits": 0, "misses": 0}
+            }
+            self._language_detection = {"local": 0, "fallback": 0}
+            self._retries: Dict[str, Dict[str, int]] = {}
+            self._pages = {"relevant": 0, "skipped": 0, "split_documents": 0,
+                           "other_language_merged": 0, "other_language_discarded": 0}
+            self._review = {"documents_flagged": 0, "fields_flagged": 0}
+            self._image_preprocessing = {"images": 0, "bytes_before": 0, "bytes_after": 0}
+            self._ocr_payloads: Dict[str, Dict[str, Any]] = {}
+            self._prompt_compaction = {"requests": 0, "truncated": 0, "tokens_before": 0, "tokens_after": 0}
+            self._extraction_modes: Dict[str, Dict[str, float]] = {}
+            self._errors_by_type: Dict[str, int] = {}
+            self._last_log = time.monotonic()
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """Current metrics as a nested dictionary (alias of `snapshot()`)"""
+        return self.snapshot()
 
     def log_api_call(self, api_name: str, duration_ms: float, success: bool):
         """Log API call metrics"""
         status = "success" if success else "failed"
-        self.metrics["api_calls"][api_name][status] += 1
-        self.metrics["api_calls"][api_name]["total_time_ms"] += duration_ms
-        
-        logger.info("API Call Metrics", extra={
-            "api_name": api_name,
-            "duration_ms": duration_ms,
-            "status": status,
-            "metrics": self.metrics["api_calls"][api_name]
-        })
+        with self._lock:
+            counters = self._api_calls.setdefault(api_name, {"success": 0, "failed": 0, "total_time_ms": 0})
+            counters[status] += 1
+            counters["total_time_ms"] += duration_ms
+            self._api_latency.setdefault(api_name, LatencyHistogram()).observe(duration_ms)
+        self._maybe_log()
+
+    def observe_stage(self, stage: str, duration_ms: float):
+        """Record the latency of one pipeline stage"""
+        with self._lock:
+            self._stages.setdefault(stage, LatencyHistogram()).observe(duration_ms)
+        self._maybe_log()
+
+    @contextmanager
+    def time_stage(self, stage: str):
+        """Context manager recording the wall-clock duration of a pipeline stage (also a trace span)"""
+        start = time.perf_counter()
+        try:
+            with span(stage):
+                yield
+        finally:
+            self.observe_stage(stage, (time.perf_counter() - start) * 1000)
 
-    def log_document_processing(self, ocr_confidence: float, form_completeness: float, duration_ms: float):
+    def set_gauge(self, name: str, value: float):
+        """Set a gauge such as a queue depth to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name: str, delta: float):
+        """Increment (or decrement, with a negative delta) a gauge"""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    @contextmanager
+    def track_in_flight(self, name: str):
+        """Context manager counting the work currently inside the block in gauge `name`"""
+        self.add_gauge(name, 1)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1)
+
+    def log_retry(self, api_name: str, throttled: bool, exhausted: bool = False):
+        """Log a retried (or finally abandoned) API attempt"""
+        with self._lock:
+            counters = self._retries.setdefault(api_name, {"throttled": 0, "errors": 0, "exhausted": 0})
+            counters["throttled" if throttled else "errors"] += 1
+            if exhausted:
+                counters["exhausted"] += 1
+        self._maybe_log()
+
+    def log_pages(self, relevant: int, skipped: int):
+        """Log the page classification of one document"""
+        with self._lock:
+            self._pages["relevant"] += relevant
+            self._pages["skipped"] += skipped
+        self._maybe_log()
+
+    def log_page_split(self):
+        """Log a document extracted page by page"""
+        with self._lock:
+            self._pages["split_documents"] += 1
+
+    def log_page_language_mismatch(self, merged: bool):
+        """Log a page of a split document read in another language than the document"""
+        with self._lock:
+            self._pages["other_language_merged" if merged else "other_language_discarded"] += 1
+
+    def log_image_preprocessing(self, bytes_before: int, bytes_after: int):
+        """Log the upload size of an image before and after pre-processing"""
+        with self._lock:
+            counters = self._image_preprocessing
+            counters["images"] += 1
+            counters["bytes_before"] += bytes_before
+            counters["bytes_after"] += bytes_after
+        self._maybe_log()
+
+    def log_ocr_payload(self, payload: str, duration_ms: float, ocr_confidence: float):
+        """Log OCR latency and confidence by payload kind ('original', 'preprocessed' or 'url')"""
+        with self._lock:
+            counters = self._ocr_payloads.get(payload)
+            if counters is None:
+                counters = self._ocr_payloads[payload] = {
+                    "documents": 0, "ocr_confidence_sum": 0.0, "latency": LatencyHistogram()
+                }
+            counters["documents"] += 1
+            counters["ocr_confidence_sum"] += ocr_confidence
+            counters["latency"].observe(duration_ms)
+
+    def log_confidence_review(self, flagged_fields: int):
+        """Log how many extracted fields of a document were flagged for review"""
+        with self._lock:
+            self._review["documents_flagged"] += int(flagged_fields > 0)
+            self._review["fields_flagged"] += flagged_fields
+        self._maybe_log()
+
+    def log_prompt_compaction(self, tokens_before: int, tokens_after: int, truncated: bool):
+        """Log the estimated prompt tokens saved by compacting one request's text"""
+        with self._lock:
+            counters = self._prompt_compaction
+            counters["requests"] += 1
+            counters["truncated"] += int(truncated)
+            counters["tokens_before"] += tokens_before
+            counters["tokens_after"] += tokens_after
+        self._maybe_log()
+
+    def log_cache_event(self, cache_name: str, hit: bool):
+        """Log cache lookup metrics"""
+        with self._lock:
+            counters = self._cache.setdefault(cache_name, {"hits": 0, "misses": 0})
+            counters["hits" if hit else "misses"] += 1
+        self._maybe_log()
+
+    def log_language_detection(self, fallback: bool):
+        """Log whether language detection was decided locally or fell back to GPT"""
+        with self._lock:
+            self._language_detection["fallback" if fallback else "local"] += 1
+        self._maybe_log()
+
+    def log_document_processing(self, ocr_confidence: float, form_completeness: float, duration_ms: float,
+                                extraction_mode: str = None):
         """Log document processing metrics"""
-        self.metrics["processing"]["documents_processed"] += 1
-        self.metrics["processing"]["average_ocr_confidence"] = (
-            (self.metrics["processing"]["average_ocr_confidence"] * 
-             (self.metrics["processing"]["documents_processed"] - 1) + ocr_confidence) /
-            self.metrics["processing"]["documents_processed"]
-        )
-        self.metrics["processing"]["average_form_completeness"] = (
-            (self.metrics["processing"]["average_form_completeness"] * 
-             (self.metrics["processing"]["documents_processed"] - 1) + form_completeness) /
-            self.metrics["processing"]["documents_processed"]
-        )
-        self.metrics["performance"]["average_processing_time_ms"] = (
-            (self.metrics["performance"]["average_processing_time_ms"] * 
-             (self.metrics["processing"]["documents_processed"] - 1) + duration_ms) /
-            self.metrics["processing"]["documents_processed"]
-        )
-        
-        logger.info("Document Processing Metrics", extra={
-            "metrics": self.metrics
-        })
+        with self._lock:
+            self._processing["documents_processed"] += 1
+            self._processing["ocr_confidence_sum"] += ocr_confidence
+            self._processing["form_completeness_sum"] += form_completeness
+            self._document_latency.observe(duration_ms)
+            if extraction_mode:
+                mode = self._extraction_modes.setdefault(extraction_mode, {
+                    "documents_processed": 0, "form_completeness_sum": 0.0, "processing_time_ms_sum": 0.0
+                })
+                mode["documents_processed"] += 1
+                mode["form_completeness_sum"] += form_completeness
+                mode["processing_time_ms_sum"] += duration_ms
+        self._maybe_log()
 
     def log_error(self, error_type: str, error_message: str):
         """Log error metrics"""
-        self.metrics["processing"]["errors"] += 1
+        with self._lock:
+            self._processing["errors"] += 1
+            self._errors_by_type[error_type] = self._errors_by_type.get(error_type, 0) + 1
+            total_errors = self._processing["errors"]
         logger.error(f"Application Error", extra={
             "error_type": error_type,
             "error_message": error_message,
-            "total_errors": self.metrics["processing"]["errors"]
+            "total_errors": total_errors
         })
 
-monitoring = ApplicationMonitoring()
\ No newline at end of file
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a consistent copy of all metrics, including latency percentiles"""
+        with self._lock:
+            processed = self._processing["documents_processed"]
+            detections = self._language_detection["local"] + self._language_detection["fallback"]
+            return {
+                "api_calls": {
+                    api_name: {**counters, "latency_ms": self._api_latency[api_name].snapshot()}
+                    for api_name, counters in self._api_calls.items()
+                },
+                "processing": {
+                    "documents_processed": processed,
+                    "average_ocr_confidence": self._processing["ocr_confidence_sum"] / processed if processed else 0,
+                    "average_form_completeness": self._processing["form_completeness_sum"] / processed if processed else 0,
+                    "errors": self._processing["errors"],
+                    "errors_by_type": dict(self._errors_by_type)
+                },
+                "performance": {
+                    "average_processing_time_ms": self._document_latency.sum / processed if processed else 0,
+                    "document_latency_ms": self._document_latency.snapshot()
+                },
+                "stages": {stage: histogram.snapshot() for stage, histogram in self._stages.items()},
+                "cache": {
+                    cache_name: {
+                        **counters,
+                        "hit_rate": counters["hits"] / (counters["hits"] + counters["misses"])
+                        if counters["hits"] + counters["misses"] else 0
+                    }
+                    for cache_name, counters in self._cache.items()
+                },
+                "language_detection": {
+                    **self._language_detection,
+                    "fallback_rate": self._language_detection["fallback"] / detections if detections else 0
+                },
+                "extraction_modes": {
+                    mode_name: {
+                        "documents_processed": mode["documents_processed"],
+                        "average_form_completeness": mode["form_completeness_sum"] / mode["documents_processed"],
+                        "average_processing_time_ms": mode["processing_time_ms_sum"] / mode["documents_processed"]
+                    }
+                    for mode_name, mode in self._extraction_modes.items()
+                },
+                "pages": dict(self._pages),
+                "review": dict(self._review),
+                "image_preprocessing": {
+                    **self._image_preprocessing,
+                    "bytes_saved": self._image_preprocessing["bytes_before"] - self._image_preprocessing["bytes_after"]
+                },
+                "ocr_payloads": {
+                    payload: {
+                        "documents": counters["documents"],
+                        "average_ocr_confidence": counters["ocr_confidence_sum"] / counters["documents"],
+                        "latency_ms": counters["latency"].snapshot()
+                    }
+                    for payload, counters in self._ocr_payloads.items()
+                },
+                "prompt_compaction": {
+                    **self._prompt_compaction,
+                    "tokens_saved": self._prompt_compaction["tokens_before"] - self._prompt_compaction["tokens_after"]
+                },
+                "retries": {api_name: dict(counters) for api_name, counters in self._retries.items()},
+                "gauges": dict(self._gauges)
+            }
+
+    def log_summary(self):
+        """Log an aggregated metrics summary with stage percentiles"""
+        snapshot = self.snapshot()
+        logger.info("Metrics Summary", extra={
+            "processing": snapshot["processing"],
+            "api_calls": {
+                api_name: {key: value for key, value in counters.items() if key != "latency_ms"}
+                for api_name, counters in snapshot["api_calls"].items()
+            },
+            "stages": {
+                stage: {key: histogram[key] for key in ("count", "p50_ms", "p95_ms", "p99_ms")}
+                for stage, histogram in snapshot["stages"].items() if histogram["count"]
+            },
+            "cache": snapshot["cache"],
+            "language_detection": snapshot["language_detection"],
+            "retries": snapshot["retries"],
+            "pages": snapshot["pages"],
+            "review": snapshot["review"],
+            "image_preprocessing": snapshot["image_preprocessing"],
+            "prompt_compaction": snapshot["prompt_compaction"],
+            "gauges": snapshot["gauges"]
+        })
+
+    def _maybe_log(self):
+        """Log a summary if the logging interval has elapsed"""
+        if self.log_interval_seconds is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_log < self.log_interval_seconds:
+                return
+            self._last_log = now
+        self.log_summary()
+
+monitoring = ApplicationMonitoring()
@@ -3,108 +3,264 @@ Azure OpenAI helper functions for language detection and form data extraction.
 Handles template loading and GPT-based text processing.
 """
 
+from __future__ import annotations
+
 from services.logger_config import logging
-from openai import AzureOpenAI
-from openai import OpenAIError
-from services.config import OPENAI_MODEL, OPENAI_TEMPERATURE
+from services.lazy_imports import lazy_import
+from services.config import (
+    OPENAI_MODEL, OPENAI_TEMPERATURE, OPENAI_API_VERSION,
+    LOCAL_LANGUAGE_DETECTION, LANGUAGE_DETECTION_THRESHOLD, LANGUAGE_DETECTION_MIN_LETTERS,
+    LLM_CACHE_MODE, LLM_CACHE_PATH, LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES
+)
+from services.cache import CacheBackend, CacheMissError, MemoryLRUCache, SQLiteCache, TieredCache
+from services.monitoring import monitoring
+from services.clients import clients
+from services.rate_limit import openai_scheduler, estimate_request_tokens, estimate_tokens
+from services.postprocessing import postprocess_ocr
+from services.prompt_compaction import compact_for_prompt, template_field_names
+from services.template_registry import registry
+from services.tracing import span
+from services.json_stream import IncrementalJSONParser
+from contextlib import closing
+from functools import lru_cache
+import asyncio
+import copy
+import hashlib
 import json
 import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from openai import AzureOpenAI, AsyncAzureOpenAI
 
 logger = logging.getLogger(__name__)
 
-def init_openai_client(endpoint: str, api_key: str, api_version: str = "2023-07-01-preview") -> AzureOpenAI:
+openai = lazy_import("openai")
+
+_HEBREW_LETTERS = re.compile("[\u05d0-\u05ea]")
+_LATIN_LETTERS = re.compile("[A-Za-z]")
+_WORDS = re.compile("[\u05d0-\u05eaA-Za-z]+")
+# One-letter Hebrew prefixes (and, the, in, to, from, that, as) attached to printed labels
+_HEBREW_PREFIXES = "ובהלמשכ"
+
+CACHE_MODES = ("off", "read_write", "cache_only")
+# First Azure OpenAI API version accepting stream_options; older versions reject it with a 400
+STREAM_USAGE_MIN_API_VERSION = "2024-09-01"
+
+FORM_LABELS_PATH = os.path.join(os.path.dirname(__file__), "form_labels.txt")
+
+def init_openai_client(endpoint: str, api_key: str, api_version: str = OPENAI_API_VERSION) -> AzureOpenAI:
+    """
+    Get the shared Azure OpenAI client for an endpoint.
+    
+    The client is created once per process and reuses pooled keep-alive connections.
+    
+    Args:
+        endpoint: Azure OpenAI endpoint URL
+        api_key: Azure OpenAI API key
+        api_version: API version string
+    """
+    return clients.get_openai_client(endpoint, api_key, api_version)
+
+def init_async_openai_client(endpoint: str, api_key: str, api_version: str = OPENAI_API_VERSION) -> AsyncAzureOpenAI:
     """
-    Initialize Azure OpenAI client.
+    Initialize asynchronous Azure OpenAI client.
     
     Args:
         endpoint: Azure OpenAI endpoint URL
         api_key: Azure OpenAI API key
         api_version: API version string
     """
-    return AzureOpenAI(azure_endpoint=endpoint, api_key=api_key, api_version=api_version)
+    return openai.AsyncAzureOpenAI(azure_endpoint=endpoint, api_key=api_key, api_version=api_version, max_retries=0)
 
-def detect_language(text: str, openai_client: AzureOpenAI) -> str:
+def detect_language(text: str, openai_client: AzureOpenAI, cache_mode: str = None,
+                    use_local: bool = LOCAL_LANGUAGE_DETECTION) -> str:
     """
-    Detect if text is Hebrew or English using GPT.
+    Detect if text is Hebrew or English, locally when the script mix is clear and with GPT otherwise.
     
     Args:
         text: Input text to analyze
         openai_client: Initialized OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        use_local: Try the local script-ratio classifier before calling GPT
     
     Returns:
         str: 'Hebrew' or 'English'
     """
     logger.info("Starting language detection")
     try:
-        # Load system prompt from file
-        templates_dir = os.path.join(os.path.dirname(__file__), "templates")
-        prompt_path = os.path.join(templates_dir, "language_detection_prompt.txt")
-
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            system_prompt = f.read().strip()
+        if use_local:
+            language = detect_language_local(text)
+            monitoring.log_language_detection(fallback=language is None)
+            if language is not None:
+                return language
 
         # Query OpenAI
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"{text[:1000]}"}
-            ],
-            temperature=OPENAI_TEMPERATURE
+        content = _create_completion(
+            openai_client,
+            messages=_language_detection_messages(text),
+            cache_mode=cache_mode,
+            is_valid=_is_language
         )
-        language = response.choices[0].message.content.strip()
-
-        if language not in ["Hebrew", "English"]:
-            raise ValueError("Language must be either 'Hebrew' or 'English")
-        
-        logger.info(f"Language detected: {language}")
-        return language
+        return _parse_language(content)
     
-    except OpenAIError as e:
+    except openai.OpenAIError as e:
         logger.error(f"OpenAI API error: {e}")
         raise
     except Exception as e:
         logger.error(f"Unexpected error in detect_language: {e}")
         raise
 
-def load_template_and_prompt(language: str) -> tuple[str, dict]:
+async def detect_language_async(text: str, openai_client: AsyncAzureOpenAI, cache_mode: str = None,
+                                use_local: bool = LOCAL_LANGUAGE_DETECTION) -> str:
     """
-    Load language-specific template and system prompt.
+    Asynchronous variant of `detect_language`.
     
     Args:
-        language: 'Hebrew' or 'English'
+        text: Input text to analyze
+        openai_client: Initialized async OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        use_local: Try the local script-ratio classifier before calling GPT
     
     Returns:
-        tuple: (system_prompt, template_dict)
+        str: 'Hebrew' or 'English'
     """
+    logger.info("Starting async language detection")
     try:
-        templates_dir = os.path.join(os.path.dirname(__file__), "templates")
-        system_prompt_path = os.path.join(templates_dir, "prompt.txt")
+        if use_local:
+            language = detect_language_local(text)
+            monitoring.log_language_detection(fallback=language is None)
+            if language is not None:
+                return language
+
+        content = await _create_completion_async(
+            openai_client,
+            messages=_language_detection_messages(text),
+            cache_mode=cache_mode,
+            is_valid=_is_language
+        )
+        return _parse_language(content)
+    
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI API error: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in detect_language_async: {e}")
+        raise
+
+def detect_language_local(text: str, threshold: float = LANGUAGE_DETECTION_THRESHOLD,
+                          min_letters: int = LANGUAGE_DETECTION_MIN_LETTERS) -> str:
+    """
+    Classify text as Hebrew or English by the ratio of Hebrew to Latin letters.
+    
+    Only the filled-in values are counted: printed form boilerplate from
+    `unecessary_words.txt` is removed first, then every word of the printed
+    labels, headers, checkbox options and declaration (`form_labels.txt` and
+    the template field names). Otherwise the Hebrew form itself outweighs
+    short English answers.
+    
+    Args:
+        text: Input text to analyze
+        threshold: Minimum share (0-1) of letters the dominant script must reach
+        min_letters: Minimum number of Hebrew and Latin letters needed to decide
+    
+    Returns:
+        str: 'Hebrew' or 'English', or None when the result is ambiguous
+    """
+    labels = form_label_words()
+    content = " ".join(word for word in _WORDS.findall(postprocess_ocr(text)) if not _is_label_word(word, labels))
+    hebrew = len(_HEBREW_LETTERS.findall(content))
+    latin = len(_LATIN_LETTERS.findall(content))
+    letters = hebrew + latin
+
+    if letters < min_letters:
+        logger.info(f"Local language detection inconclusive: only {letters} letters")
+        return None
+
+    hebrew_share = hebrew / letters
+    if hebrew_share >= threshold:
+        language = "Hebrew"
+    elif 1 - hebrew_share >= threshold:
+        language = "English"
+    else:
+        logger.info(f"Local language detection ambiguous: Hebrew share {hebrew_share:.2f}")
+        return None
+
+    logger.info(f"Language detected locally: {language} (Hebrew share {hebrew_share:.2f})")
+    return language
+
+def form_label_words() -> frozenset:
+    """
+    Casefolded words printed on the registered forms, as read by `detect_language_local`.
+
+    Returns:
+        frozenset: Words of `form_labels.txt` and of every template's field names
+    """
+    templates = tuple(registry.combined_templates_json(form_type) for form_type in registry.form_types())
+    return _form_label_words(templates, FORM_LABELS_PATH, os.stat(FORM_LABELS_PATH).st_mtime_ns)
+
+@lru_cache(maxsize=4)
+def _form_label_words(templates: tuple[str, ...], path: str, mtime_ns: int) -> frozenset:
+    """Label vocabulary; the file's mtime is part of the key so edits are picked up."""
+    with open(path, "r", encoding="utf-8") as f:
+        phrases = f.read().splitlines()
+    for templates_json in templates:
+        phrases.extend(template_field_names(templates_json))
+    return frozenset(word.casefold() for phrase in phrases for word in _WORDS.findall(phrase))
 
-        if language == "Hebrew":
-            template_path = os.path.join(templates_dir, "hebrew_template.json")
-        else:
-            template_path = os.path.join(templates_dir, "english_template.json")
+def _is_label_word(word: str, labels: frozenset) -> bool:
+    word = word.casefold()
+    return word in labels or (len(word) > 2 and word[0] in _HEBREW_PREFIXES and word[1:] in labels)
 
-        with open(system_prompt_path, "r", encoding="utf-8") as prompt_file:
-            system_prompt = prompt_file.read().strip()
+def _language_detection_messages(text: str) -> list[dict]:
+    """Build the chat messages for language detection."""
+    return [
+        registry.system_message("language_detection"),
+        {"role": "user", "content": f"{text[:1000]}"}
+    ]
 
-        with open(template_path, "r", encoding="utf-8") as template_file:
-            template = json.load(template_file)
+def _is_language(content: str) -> bool:
+    """Check whether a response is a supported language name."""
+    return content.strip() in registry.languages()
 
-        return system_prompt, template
+def _parse_language(content: str) -> str:
+    """Validate and normalize a language detection response."""
+    language = content.strip()
+    languages = registry.languages()
+
+    if language not in languages:
+        raise ValueError(f"Language must be one of: {', '.join(languages)}")
     
-    except FileNotFoundError as e:
-        logger.error(f"Template or prompt file not found: {e}")
-        raise
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding JSON template: {e}")
+    logger.info(f"Language detected: {language}")
+    return language
+
+def load_template_and_prompt(language: str, form_type: str = None) -> tuple[str, dict]:
+    """
+    Get the language-specific template and system prompt from the template registry.
+    
+    Args:
+        language: 'Hebrew' or 'English'
+        form_type: Registered form type (defaults to the registry's default form)
+    
+    Returns:
+        tuple: (system_prompt, template_dict)
+    """
+    try:
+        entry = registry.get_template(language, form_type)
+        return registry.get_prompt("extraction"), copy.deepcopy(entry.template)
+    except KeyError as e:
+        logger.error(f"Template not registered: {e}")
         raise
     except Exception as e:
         logger.error(f"Unexpected error in load_template_and_prompt: {e}")
         raise
 
-def extract_form_data(text: str, language: str, openai_client: AzureOpenAI) -> dict:
+def extract_form_data(text: str, language: str, openai_client: AzureOpenAI, cache_mode: str = None,
+                      form_type: str = None) -> dict:
     """
     Extract structured form data using GPT.
     
@@ -112,25 +268,22 @@ def extract_form_data(text: str, language: str, openai_client: AzureOpenAI) -> d
         text: Input text to process
         language: 'Hebrew' or 'English'
         openai_client: Initialized OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        form_type: Registered form type (defaults to the registry's default form)
     
     Returns:
         dict: Extracted form fields and values
     """
     try:
-        
-        system_prompt, template = load_template_and_prompt(language)
-        
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Text:\n{text}\n\nJSON template:\n{json.dumps(template, ensure_ascii=False)}"}
-            ],
-            temperature=OPENAI_TEMPERATURE,
+        content = _create_completion(
+            openai_client,
+            messages=_extraction_messages(text, language, form_type),
+            cache_mode=cache_mode,
+            is_valid=_is_json,
             response_format={"type": "json_object"}
         )
-        return json.loads(response.choices[0].message.content)
-    except OpenAIError as e:
+        return json.loads(content)
+    except openai.OpenAIError as e:
         logger.error(f"OpenAI API error in extract_form_data: {e}")
         raise
     except json.JSONDecodeError as e:
@@ -140,29 +293,422 @@ def extract_form_data(text: str, language: str, openai_client: AzureOpenAI) -> d
         logger.error(f"Unexpected error in extract_form_data: {e}")
         raise
 
-def postprocess_ocr(text: str, filepath: str = "services/unecessary_words.txt") -> str:
+async def extract_form_data_async(text: str, language: str, openai_client: AsyncAzureOpenAI,
+                                  cache_mode: str = None, form_type: str = None) -> dict:
     """
-    Remove unnecessary words from OCR text.
+    Asynchronous variant of `extract_form_data`.
     
     Args:
-        text: Input OCR text
-        filepath: Path to file containing unnecessary words
+        text: Input text to process
+        language: 'Hebrew' or 'English'
+        openai_client: Initialized async OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        form_type: Registered form type (defaults to the registry's default form)
     
     Returns:
-        str: Processed text
+        dict: Extracted form fields and values
     """
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            unnecessary_words = f.read().splitlines()
+        content = await _create_completion_async(
+            openai_client,
+            messages=_extraction_messages(text, language, form_type),
+            cache_mode=cache_mode,
+            is_valid=_is_json,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(content)
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI API error in extract_form_data_async: {e}")
+        raise
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding GPT response: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in extract_form_data_async: {e}")
+        raise
+
+def stream_form_data(text: str, language: str, openai_client: AzureOpenAI, cache_mode: str = None,
+                     form_type: str = None) -> FieldStream:
+    """
+    Streaming variant of `extract_form_data`.
+
+    Sends the same JSON-mode request with `stream=True` and yields each form
+    field as soon as the model has written its value. The request shares the
+    LLM response cache with `extract_form_data` (a cached response is replayed
+    at once), and the finished stream's `result` equals its return value.
+
+    Args:
+        text: Input text to process
+        language: 'Hebrew' or 'English'
+        openai_client: Initialized OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        form_type: Registered form type (defaults to the registry's default form)
+
+    Returns:
+        FieldStream: Iterator of (field path, value) pairs; nothing is sent until iteration starts
+    """
+    return FieldStream(_stream_completion(
+        openai_client,
+        messages=_extraction_messages(text, language, form_type),
+        cache_mode=cache_mode,
+        is_valid=_is_json,
+        response_format={"type": "json_object"}
+    ))
+
+class FieldStream:
+    """
+    Fields of a streamed JSON response, yielded as (path, value) pairs as soon as each value is complete.
+
+    Paths are tuples of keys, e.g. ("address", "city"). Once the iteration
+    ends, `result` holds the whole parsed response. The delay until the first
+    field is recorded in the 'extraction_first_field' stage histogram.
+    """
+
+    def __init__(self, chunks: Iterable[str], observe_first_field: bool = True):
+        """
+        Args:
+            chunks: Pieces of the response text, in order
+            observe_first_field: Record the first-field delay in the stage histogram; off for
+                results that are replayed rather than streamed from a single model request
+        """
+        self._chunks = chunks
+        self.observe_first_field = observe_first_field
+        self.result = None
+        self.first_field_ms = None
 
-        for word in unnecessary_words:
-            text = text.replace(word, "")
+    def __iter__(self) -> Iterator[tuple[tuple, object]]:
+        start_time = time.perf_counter()
+        parser = IncrementalJSONParser()
+        content = []
+        try:
+            for chunk in self._chunks:
+                content.append(chunk)
+                for field in parser.feed(chunk):
+                    if self.first_field_ms is None:
+                        self.first_field_ms = (time.perf_counter() - start_time) * 1000
+                        if self.observe_first_field:
+                            monitoring.observe_stage("extraction_first_field", self.first_field_ms)
+                    yield field
+            yield from parser.close()
+            self.result = json.loads("".join(content))
+        except openai.OpenAIError as e:
+            logger.error(f"OpenAI API error in stream_form_data: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding streamed GPT response: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error in stream_form_data: {e}")
+            raise
+        finally:
+            # A consumer stopping early closes the request now rather than at garbage collection
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
 
-        return text
-    except FileNotFoundError:
-        logger.error(f"Unnecessary words file not found: {filepath}")
+def _extraction_messages(text: str, language: str, form_type: str = None) -> list[dict]:
+    """Build the chat messages for form data extraction from the pre-serialized template."""
+    entry = registry.get_template(language, form_type)
+    text = compact_for_prompt(text, entry.template_json)
+
+    return [
+        registry.system_message("extraction"),
+        {"role": "user", "content": f"Text:\n{text}\n\nJSON template:\n{entry.template_json}"}
+    ]
+
+def detect_and_extract(text: str, openai_client: AzureOpenAI, cache_mode: str = None,
+                       form_type: str = None) -> tuple[str, dict]:
+    """
+    Detect the language and extract form data with a single JSON-mode request.
+    
+    The model receives both language templates and returns the detected
+    language together with the matching filled template.
+    
+    Args:
+        text: Input text to process
+        openai_client: Initialized OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        form_type: Registered form type (defaults to the registry's default form)
+    
+    Returns:
+        tuple: (language, form_data_dict)
+    """
+    logger.info("Starting combined language detection and extraction")
+    try:
+        content = _create_completion(
+            openai_client,
+            messages=_combined_messages(text, form_type),
+            cache_mode=cache_mode,
+            is_valid=_is_combined_response,
+            response_format={"type": "json_object"}
+        )
+        return _parse_combined_response(content)
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI API error in detect_and_extract: {e}")
+        raise
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding GPT response: {e}")
         raise
     except Exception as e:
-        logger.error(f"Error in postprocess_ocr: {e}")
+        logger.error(f"Unexpected error in detect_and_extract: {e}")
+        raise
+
+async def detect_and_extract_async(text: str, openai_client: AsyncAzureOpenAI,
+                                   cache_mode: str = None, form_type: str = None) -> tuple[str, dict]:
+    """
+    Asynchronous variant of `detect_and_extract`.
+    
+    Args:
+        text: Input text to process
+        openai_client: Initialized async OpenAI client
+        cache_mode: LLM cache mode override ('off', 'read_write' or 'cache_only')
+        form_type: Registered form type (defaults to the registry's default form)
+    
+    Returns:
+        tuple: (language, form_data_dict)
+    """
+    logger.info("Starting async combined language detection and extraction")
+    try:
+        content = await _create_completion_async(
+            openai_client,
+            messages=_combined_messages(text, form_type),
+            cache_mode=cache_mode,
+            is_valid=_is_combined_response,
+            response_format={"type": "json_object"}
+        )
+        return _parse_combined_response(content)
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI API error in detect_and_extract_async: {e}")
+        raise
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding GPT response: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in detect_and_extract_async: {e}")
+        raise
+
+def _combined_messages(text: str, form_type: str = None) -> list[dict]:
+    """Build the chat messages for combined detection and extraction."""
+    templates_json = registry.combined_templates_json(form_type)
+    text = compact_for_prompt(text, templates_json)
+
+    return [
+        registry.system_message("combined"),
+        {"role": "user", "content": f"Text:\n{text}\n\nJSON templates by language:\n{templates_json}"}
+    ]
+
+def _is_combined_response(content: str) -> bool:
+    """Check whether a combined response has a supported language and a form object."""
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(data, dict) and data.get("language") in registry.languages() and isinstance(data.get("form"), dict)
+
+def _parse_combined_response(content: str) -> tuple[str, dict]:
+    """Split a combined response into language and form data."""
+    data = json.loads(content)
+    if not isinstance(data, dict) or not isinstance(data.get("form"), dict):
+        raise ValueError("Combined response must contain a 'form' object")
+
+    language = _parse_language(str(data.get("language", "")))
+    return language, data["form"]
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> CacheBackend:
+    """
+    Return the process-wide LLM response cache built from configuration.
+
+    Returns:
+        CacheBackend: In-memory LRU in front of the on-disk store
+    """
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = TieredCache(
+                MemoryLRUCache(LLM_CACHE_MEMORY_ENTRIES),
+                SQLiteCache(
+                    LLM_CACHE_PATH,
+                    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                    max_entries=LLM_CACHE_MAX_ENTRIES,
+                    max_bytes=LLM_CACHE_MAX_BYTES
+                )
+            )
+        return _llm_cache
+
+def llm_cache_key(request: dict) -> str:
+    """
+    Build the cache key for a chat completion request.
+
+    The key hashes the model, temperature, full message list (system prompt,
+    template and input text) and response format, so editing a prompt or
+    template file invalidates the affected entries.
+    """
+    payload = json.dumps(request, ensure_ascii=False, sort_keys=True)
+    return "llm:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _is_json(content: str) -> bool:
+    """Check whether a response parses as JSON."""
+    try:
+        json.loads(content)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def _create_completion(openai_client: AzureOpenAI, messages: list[dict], cache_mode: str = None,
+                       is_valid: Callable[[str], bool] = None, **params) -> str:
+    """
+    Run a deterministic chat completion, memoized in the LLM response cache.
+
+    Args:
+        openai_client: Initialized OpenAI client
+        messages: Chat messages to send
+        cache_mode: 'off', 'read_write' or 'cache_only' (defaults to LLM_CACHE_MODE)
+        is_valid: Optional check a response must pass before it is cached
+        **params: Extra chat completion parameters
+
+    Returns:
+        str: Message content of the first choice
+
+    Raises:
+        CacheMissError: In 'cache_only' mode when the response is not cached
+    """
+    request = {"model": OPENAI_MODEL, "temperature": OPENAI_TEMPERATURE, "messages": messages, **params}
+    cache, key, cached = _lookup_completion(request, cache_mode)
+    if cached is not None:
+        return cached
+
+    tokens = estimate_request_tokens(request)
+    start_time = time.time()
+    try:
+        with span("openai_request", estimated_tokens=tokens):
+            response = openai_scheduler.call(
+                openai_client.chat.completions.create, tokens=tokens, usage=_completion_usage, **request
+            )
+    except Exception:
+        monitoring.log_api_call("openai", (time.time() - start_time) * 1000, success=False)
         raise
+    monitoring.log_api_call("openai", (time.time() - start_time) * 1000, success=True)
+    content = response.choices[0].message.content
+
+    _store_completion(cache, key, content, is_valid)
+    return content
+
+async def _create_completion_async(openai_client: AsyncAzureOpenAI, messages: list[dict], cache_mode: str = None,
+                                   is_valid: Callable[[str], bool] = None, **params) -> str:
+    """Asynchronous variant of `_create_completion` sharing the same cache."""
+    request = {"model": OPENAI_MODEL, "temperature": OPENAI_TEMPERATURE, "messages": messages, **params}
+    cache, key, cached = await asyncio.to_thread(_lookup_completion, request, cache_mode)
+    if cached is not None:
+        return cached
+
+    tokens = estimate_request_tokens(request)
+    start_time = time.time()
+    try:
+        with span("openai_request", estimated_tokens=tokens):
+            response = await openai_scheduler.call_async(
+                openai_client.chat.completions.create, tokens=tokens, usage=_completion_usage, **request
+            )
+    except Exception:
+        monitoring.log_api_call("openai", (time.time() - start_time) * 1000, success=False)
+        raise
+    monitoring.log_api_call("openai", (time.time() - start_time) * 1000, success=True)
+    content = response.choices[0].message.content
+
+    await asyncio.to_thread(_store_completion, cache, key, content, is_valid)
+    return content
+
+def _stream_completion(openai_client: AzureOpenAI, messages: list[dict], cache_mode: str = None,
+                       is_valid: Callable[[str], bool] = None, **params) -> Iterator[str]:
+    """
+    Streaming variant of `_create_completion`, yielding the content as it is generated.
+
+    The cache key ignores the streaming parameters, so streamed and regular
+    requests share entries; a cached response is yielded as a single chunk.
+    The scheduler admits (and retries) the request until the stream opens, and
+    the token bucket is settled with the usage reported in the final chunk.
+    Usage is only requested from API versions that accept `stream_options`;
+    otherwise the bucket keeps the estimate.
+    """
+    request = {"model": OPENAI_MODEL, "temperature": OPENAI_TEMPERATURE, "messages": messages, **params}
+    cache, key, cached = _lookup_completion(request, cache_mode)
+    if cached is not None:
+        yield cached
+        return
+
+    tokens = estimate_request_tokens(request)
+    start_time = time.time()
+    content = []
+    usage = None
+    stream = None
+    completed = False
+    try:
+        with span("openai_request", estimated_tokens=tokens, stream=True):
+            stream = openai_scheduler.call(
+                openai_client.chat.completions.create, tokens=tokens,
+                stream=True, **_stream_usage_options(openai_client), **request
+            )
+        with closing(stream):
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage.total_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content.append(chunk.choices[0].delta.content)
+                    yield content[-1]
+        completed = True
+    finally:
+        # Also runs when the consumer stops early (GeneratorExit): the call is recorded as
+        # unsuccessful and the bucket is charged for the prompt and the tokens received so far
+        monitoring.log_api_call("openai", (time.time() - start_time) * 1000, success=completed)
+        if stream is not None:
+            if not completed and usage is None:
+                usage = estimate_request_tokens(request, completion_tokens=estimate_tokens("".join(content)))
+                logger.info(f"Streamed completion ended early after {len(content)} chunks")
+            openai_scheduler.settle(tokens, usage)
+
+    _store_completion(cache, key, "".join(content), is_valid)
+
+def _stream_usage_options(openai_client) -> dict:
+    """`stream_options` asking for token usage, when the client's API version accepts them."""
+    api_version = getattr(openai_client, "_api_version", None) or OPENAI_API_VERSION
+    if api_version[:10] >= STREAM_USAGE_MIN_API_VERSION:
+        return {"stream_options": {"include_usage": True}}
+    return {}
+
+def _completion_usage(response) -> int:
+    """Actual token usage of a completion, used to settle the token bucket estimate."""
+    return getattr(getattr(response, "usage", None), "total_tokens", None)
+
+def _lookup_completion(request: dict, cache_mode: str = None) -> tuple:
+    """
+    Look a chat completion request up in the LLM response cache.
+
+    Returns:
+        tuple: (cache, key, cached_content); cache and key are None when caching is off
+
+    Raises:
+        ValueError: If the cache mode is not one of CACHE_MODES
+        CacheMissError: In 'cache_only' mode when the response is not cached
+    """
+    cache_mode = (cache_mode or LLM_CACHE_MODE).lower()
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"Unknown LLM cache mode '{cache_mode}'; expected one of {', '.join(CACHE_MODES)}")
+    if cache_mode == "off":
+        return None, None, None
+
+    cache = get_llm_cache()
+    key = llm_cache_key(request)
+    cached = cache.get(key)
+    monitoring.log_cache_event("llm", hit=cached is not None)
+    if cached is not None:
+        return cache, key, cached.decode("utf-8")
+    if cache_mode == "cache_only":
+        raise CacheMissError("LLM response not cached and cache_only mode is enabled")
+    return cache, key, None
 
+def _store_completion(cache: CacheBackend, key: str, content: str, is_valid: Callable[[str], bool] = None):
+    """Store a completion in the LLM response cache when it passes validation."""
+    if cache is not None and (is_valid is None or is_valid(content)):
+        cache.set(key, content.encode("utf-8"))
@@ -0,0 +1,336 @@
+"""
+Page-aware extraction for multi-page documents.
+Classifies OCR pages so instruction and boilerplate pages never reach the
+model, and extracts long bundles page by page in parallel, merging the
+per-page results in page order.
+"""
+
+from services.logger_config import logging
+from services.config import PAGE_FILTER, PAGE_MIN_FIELD_LABELS, PAGE_SPLIT_MIN_PAGES, PAGE_EXTRACTION_WORKERS
+from services.document_ocr import PageText
+from services.monitoring import monitoring
+from services.openai_helpers import (
+    extract_form_data, extract_form_data_async, detect_and_extract, detect_and_extract_async,
+    stream_form_data, FieldStream
+)
+from services.postprocessing import postprocess_ocr, compile_phrases
+from services.prompt_compaction import template_field_names
+from services.template_registry import registry
+from services.tracing import bind_context
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from functools import lru_cache
+import asyncio
+import json
+import re
+
+logger = logging.getLogger(__name__)
+
+# "Page 2 of 2" footers carry digits but no field values
+_PAGE_MARKER = re.compile(r"עמוד\s*\d+\s*מתוך\s*\d+|page\s*\d+\s*of\s*\d+", re.IGNORECASE)
+_DIGIT = re.compile(r"\d")
+
+
+@dataclass(frozen=True)
+class PageClassification:
+    page_number: int
+    relevant: bool
+    field_labels: int
+    value_lines: int
+    reason: str
+
+
+def classify_page(page: PageText, templates_json: str, min_field_labels: int = PAGE_MIN_FIELD_LABELS) -> PageClassification:
+    """
+    Decide whether a page carries form data.
+
+    Form pages print several field labels next to filled-in values (dates, ids,
+    phone numbers); instruction pages are prose with few labels and no values.
+
+    Args:
+        page: Post-processed page text
+        templates_json: Serialized template(s) whose field names are the labels
+        min_field_labels: Lines mentioning a field label needed for a form page
+
+    Returns:
+        PageClassification: Verdict with the counts it was based on
+    """
+    lines = [line for line in _PAGE_MARKER.sub("", page.text).splitlines() if line.strip()]
+    if not lines:
+        return PageClassification(page.page_number, False, 0, 0, "empty")
+
+    pattern = _label_pattern(templates_json)
+    field_labels = sum(1 for line in lines if pattern is not None and pattern.search(line.casefold()))
+    value_lines = sum(1 for line in lines if _DIGIT.search(line))
+
+    if field_labels < min_field_labels:
+        return PageClassification(page.page_number, False, field_labels, value_lines, "no field labels")
+    if not value_lines:
+        return PageClassification(page.page_number, False, field_labels, value_lines, "no values")
+    return PageClassification(page.page_number, True, field_labels, value_lines, "form")
+
+
+def prepare_pages(pages: list[PageText], form_type: str = None) -> list[PageText]:
+    """
+    Post-process page texts and drop pages that carry no form data.
+
+    Args:
+        pages: Pages from `document_pages`
+        form_type: Registered form type (defaults to the registry's default form)
+
+    Returns:
+        list: Relevant pages in page order; every page when none qualifies or filtering is off
+    """
+    pages = [replace(page, text=postprocess_ocr(page.text)) for page in pages]
+    if not PAGE_FILTER or len(pages) <= 1:
+        monitoring.log_pages(relevant=len(pages), skipped=0)
+        return pages
+
+    templates_json = registry.combined_templates_json(form_type)
+    verdicts = [classify_page(page, templates_json) for page in pages]
+    relevant = [page for page, verdict in zip(pages, verdicts) if verdict.relevant]
+    if not relevant:
+        logger.warning(f"No page of {len(pages)} looks like a form page, keeping all of them")
+        monitoring.log_pages(relevant=len(pages), skipped=0)
+        return pages
+
+    skipped = [verdict for verdict in verdicts if not verdict.relevant]
+    if skipped:
+        logger.info("Skipping pages " + ", ".join(f"{verdict.page_number} ({verdict.reason})" for verdict in skipped))
+    monitoring.log_pages(relevant=len(relevant), skipped=len(skipped))
+    return relevant
+
+
+def join_pages(pages: list[PageText]) -> str:
+    """Concatenate page texts into one document text."""
+    return "".join(page.text for page in pages)
+
+
+def extract_pages(pages: list[PageText], language: str, openai_client, form_type: str = None,
+                  llm_limiter=None) -> dict:
+    """
+    Extract form data from the relevant pages.
+
+    Bundles of at least PAGE_SPLIT_MIN_PAGES pages are extracted page by page
+    on a thread pool and merged; shorter documents use a single request.
+
+    Args:
+        pages: Relevant pages from `prepare_pages`
+        language: Detected language of the document
+        openai_client: Initialized OpenAI client
+        form_type: Registered form type (defaults to the registry's default form)
+        llm_limiter: Optional context manager bounding concurrent OpenAI calls
+
+    Returns:
+        dict: Extracted form data
+    """
+    def run(text: str) -> dict:
+        with llm_limiter or nullcontext(), monitoring.track_in_flight("openai_requests_in_flight"):
+            return extract_form_data(text, language, openai_client, form_type=form_type)
+
+    if not _should_split(pages):
+        return run(join_pages(pages))
+
+    monitoring.log_page_split()
+    with ThreadPoolExecutor(max_workers=min(PAGE_EXTRACTION_WORKERS, len(pages))) as executor:
+        return merge_form_data(list(executor.map(bind_context(run), [page.text for page in pages])))
+
+
+def stream_extract_pages(pages: list[PageText], language: str, openai_client, form_type: str = None) -> FieldStream:
+    """
+    Streaming variant of `extract_pages`.
+
+    A single-request document streams its fields as the model writes them;
+    split bundles are extracted as usual and their merged fields replayed.
+
+    Returns:
+        FieldStream: Iterator of (field path, value) pairs with the form data in `result` once exhausted
+    """
+    if not _should_split(pages):
+        return stream_form_data(join_pages(pages), language, openai_client, form_type=form_type)
+
+    def merged():
+        yield json.dumps(extract_pages(pages, language, openai_client, form_type=form_type), ensure_ascii=False)
+
+    # The delay here is the whole multi-request extraction, not a time to first field
+    return FieldStream(merged(), observe_first_field=False)
+
+
+async def extract_pages_async(pages: list[PageText], language: str, openai_client, form_type: str = None,
+                              llm_limiter: asyncio.Semaphore = None) -> dict:
+    """Asynchronous variant of `extract_pages`; pages are extracted concurrently on the event loop."""
+    async def run(text: str) -> dict:
+        async with llm_limiter or nullcontext():
+            with monitoring.track_in_flight("openai_requests_in_flight"):
+                return await extract_form_data_async(text, language, openai_client, form_type=form_type)
+
+    if not _should_split(pages):
+        return await run(join_pages(pages))
+
+    monitoring.log_page_split()
+    return merge_form_data(await _gather_bounded([run(page.text) for page in pages]))
+
+
+def detect_and_extract_pages(pages: list[PageText], openai_client, form_type: str = None,
+                             llm_limiter=None) -> tuple[str, dict]:
+    """
+    Combined-mode variant of `extract_pages`.
+
+    When split, the document language is the one most pages report (ties go to
+    the earliest page). Pages read in another language are translated to that
+    language's template keys and merged like the others; a page whose template
+    cannot be aligned is left out, with a warning.
+
+    Returns:
+        tuple: (language, form_data)
+    """
+    def run(text: str) -> tuple[str, dict]:
+        with llm_limiter or nullcontext(), monitoring.track_in_flight("openai_requests_in_flight"):
+            return detect_and_extract(text, openai_client, form_type=form_type)
+
+    if not _should_split(pages):
+        return run(join_pages(pages))
+
+    monitoring.log_page_split()
+    with ThreadPoolExecutor(max_workers=min(PAGE_EXTRACTION_WORKERS, len(pages))) as executor:
+        return _merge_combined(list(executor.map(bind_context(run), [page.text for page in pages])), form_type)
+
+
+async def detect_and_extract_pages_async(pages: list[PageText], openai_client, form_type: str = None,
+                                         llm_limiter: asyncio.Semaphore = None) -> tuple[str, dict]:
+    """Asynchronous variant of `detect_and_extract_pages`."""
+    async def run(text: str) -> tuple[str, dict]:
+        async with llm_limiter or nullcontext():
+            with monitoring.track_in_flight("openai_requests_in_flight"):
+                return await detect_and_extract_async(text, openai_client, form_type=form_type)
+
+    if not _should_split(pages):
+        return await run(join_pages(pages))
+
+    monitoring.log_page_split()
+    return _merge_combined(await _gather_bounded([run(page.text) for page in pages]), form_type)
+
+
+def merge_form_data(results: list[dict]) -> dict:
+    """
+    Merge per-page extraction results field by field.
+
+    The first non-empty value in page order wins, so the merge does not depend
+    on which page's request finished first.
+
+    Args:
+        results: Form data per page, in page order
+
+    Returns:
+        dict: Merged form data
+    """
+    merged = {}
+    for data in results:
+        _merge_into(merged, data)
+    return merged
+
+
+def _merge_into(target: dict, source: dict):
+    for key, value in source.items():
+        current = target.get(key)
+        if isinstance(value, dict):
+            if not isinstance(current, dict):
+                if current not in (None, ""):
+                    continue
+                current = target[key] = {}
+            _merge_into(current, value)
+        elif current in (None, ""):
+            target[key] = value
+
+
+def translate_form_data(form_data: dict, source_language: str, target_language: str,
+                        form_type: str = None) -> dict:
+    """
+    Rename the keys of form data extracted with one language's template to another's.
+
+    The language templates of a form list the same fields in the same order,
+    so keys are matched by position.
+
+    Args:
+        form_data: Form data keyed by the source language's template
+        source_language: Language the form data was extracted in
+        target_language: Language whose template keys to use
+        form_type: Registered form type (defaults to the registry's default form)
+
+    Returns:
+        dict: Translated form data, or None when the two templates differ in structure
+    """
+    mapping = _key_mapping(registry.get_template(source_language, form_type).template_json,
+                           registry.get_template(target_language, form_type).template_json)
+    return None if mapping is None else _translate(form_data, mapping)
+
+
+def _translate(form_data: dict, mapping: dict) -> dict:
+    translated = {}
+    for key, value in form_data.items():
+        if key not in mapping:
+            continue
+        target_key, children = mapping[key]
+        translated[target_key] = _translate(value, children) if children and isinstance(value, dict) else value
+    return translated
+
+
+@lru_cache(maxsize=16)
+def _key_mapping(source_json: str, target_json: str) -> dict:
+    """Positional {source key: (target key, child mapping)} of two templates, or None when they differ."""
+    def align(source: dict, target: dict):
+        if len(source) != len(target):
+            return None
+        mapping = {}
+        for (source_key, source_value), (target_key, target_value) in zip(source.items(), target.items()):
+            if isinstance(source_value, dict) != isinstance(target_value, dict):
+                return None
+            children = None
+            if isinstance(source_value, dict):
+                children = align(source_value, target_value)
+                if children is None:
+                    return None
+            mapping[source_key] = (target_key, children)
+        return mapping
+
+    return align(json.loads(source_json), json.loads(target_json))
+
+
+def _merge_combined(results: list[tuple[str, dict]], form_type: str = None) -> tuple[str, dict]:
+    languages = [language for language, _ in results]
+    language = max(dict.fromkeys(languages), key=languages.count)
+    forms = []
+    for page_number, (page_language, form_data) in enumerate(results, start=1):
+        if page_language != language:
+            translated = translate_form_data(form_data, page_language, language, form_type)
+            monitoring.log_page_language_mismatch(merged=translated is not None)
+            if translated is None:
+                logger.warning(f"Page {page_number} was read as {page_language} but the document as {language}; "
+                               f"the templates do not align, so its fields are not merged")
+                continue
+            logger.info(f"Page {page_number} was read as {page_language}; merging it as {language}")
+            form_data = translated
+        forms.append(form_data)
+    return language, merge_form_data(forms)
+
+
+def _should_split(pages: list[PageText]) -> bool:
+    return PAGE_SPLIT_MIN_PAGES > 0 and len(pages) >= PAGE_SPLIT_MIN_PAGES
+
+
+async def _gather_bounded(coroutines: list) -> list:
+    """Await coroutines with at most PAGE_EXTRACTION_WORKERS running, keeping their order."""
+    semaphore = asyncio.Semaphore(PAGE_EXTRACTION_WORKERS)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(bounded(coroutine) for coroutine in coroutines))
+
+
+@lru_cache(maxsize=16)
+def _label_pattern(templates_json: str):
+    """Matcher for whole field names; single words like 'date' also occur in instruction prose."""
+    return compile_phrases(list(template_field_names(templates_json)))
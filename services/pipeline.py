@@ -0,0 +1,226 @@
+"""
+End-to-end document processing pipeline.
+Runs OCR, post-processing, language detection, extraction and validation
+for a single document, with a synchronous and an asyncio variant.
+"""
+
+from services.logger_config import logging
+from services.document_ocr import (
+    analyze_layout, analyze_layout_async, document_pages, async_document_client
+)
+from services.openai_helpers import detect_language, detect_language_async, init_async_openai_client
+from services.pages import (
+    prepare_pages, join_pages, extract_pages, extract_pages_async,
+    detect_and_extract_pages, detect_and_extract_pages_async
+)
+from services.config import (
+    DOCUMENT_ENDPOINT, DOCUMENT_KEY, OPENAI_ENDPOINT, OPENAI_KEY,
+    OCR_CONCURRENCY, OPENAI_CONCURRENCY, ASYNC_MAX_IN_FLIGHT, EXTRACTION_MODE
+)
+from services.validation import validate_completeness
+from services.confidence import analyze_confidence
+from services.monitoring import monitoring
+from services.tracing import trace_document
+from contextlib import nullcontext
+from typing import AsyncIterator, Iterable, Union
+import asyncio
+import time
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_MODES = ("two_step", "combined")
+
+
+def process_document(file_object, openai_client, ocr_limiter=None, llm_limiter=None,
+                     extraction_mode: str = EXTRACTION_MODE, form_type: str = None, document_client=None,
+                     document_id: str = None) -> dict:
+    """
+    Run the full parsing pipeline on one document.
+
+    Args:
+        file_object: File buffer or bytes of the document
+        openai_client: Initialized OpenAI client
+        ocr_limiter: Optional context manager bounding concurrent OCR calls
+        llm_limiter: Optional context manager bounding concurrent OpenAI calls
+        extraction_mode: 'two_step' (detect, then extract) or 'combined' (one request)
+        form_type: Registered form type (defaults to the registry's default form)
+        document_client: Document Intelligence client (defaults to the shared pooled client)
+        document_id: Correlation ID for the document's trace and log records (generated when omitted)
+
+    Returns:
+        dict: Language, OCR confidence, extracted form data, validation result and confidence report
+    """
+    _check_extraction_mode(extraction_mode)
+    start_time = time.time()
+
+    with trace_document(name="pipeline", document_id=document_id):
+        with ocr_limiter or nullcontext(), monitoring.track_in_flight("ocr_requests_in_flight"), \
+                monitoring.time_stage("ocr"):
+            result, _, avg_confidence = analyze_layout(
+                file_object=file_object,
+                endpoint=DOCUMENT_ENDPOINT,
+                key=DOCUMENT_KEY,
+                client=document_client
+            )
+
+        with monitoring.time_stage("postprocess"):
+            pages = prepare_pages(document_pages(result), form_type=form_type)
+
+        if extraction_mode == "combined":
+            with monitoring.time_stage("combined_extraction"):
+                language, form_data = detect_and_extract_pages(pages, openai_client, form_type=form_type,
+                                                               llm_limiter=llm_limiter)
+        else:
+            with llm_limiter or nullcontext(), monitoring.track_in_flight("openai_requests_in_flight"), \
+                    monitoring.time_stage("language_detection"):
+                language = detect_language(join_pages(pages), openai_client)
+
+            with monitoring.time_stage("extraction"):
+                form_data = extract_pages(pages, language, openai_client, form_type=form_type, llm_limiter=llm_limiter)
+
+        with monitoring.time_stage("confidence_analysis"):
+            confidence = analyze_confidence(result, form_data)
+
+        return _finalize(language, avg_confidence, form_data, confidence, start_time, extraction_mode)
+
+
+async def process_document_async(file_object, openai_client, document_client=None,
+                                 ocr_limiter: asyncio.Semaphore = None, llm_limiter: asyncio.Semaphore = None,
+                                 extraction_mode: str = EXTRACTION_MODE, form_type: str = None,
+                                 document_id: str = None) -> dict:
+    """
+    Asynchronous variant of `process_document`.
+
+    Args:
+        file_object: File buffer or bytes of the document
+        openai_client: Initialized async OpenAI client
+        document_client: Shared async Document Intelligence client
+        ocr_limiter: Optional semaphore bounding in-flight OCR calls
+        llm_limiter: Optional semaphore bounding in-flight OpenAI calls
+        extraction_mode: 'two_step' (detect, then extract) or 'combined' (one request)
+        form_type: Registered form type (defaults to the registry's default form)
+        document_id: Correlation ID for the document's trace and log records (generated when omitted)
+
+    Returns:
+        dict: Language, OCR confidence, extracted form data, validation result and confidence report
+    """
+    _check_extraction_mode(extraction_mode)
+    start_time = time.time()
+
+    with trace_document(name="pipeline", document_id=document_id):
+        async with ocr_limiter or nullcontext():
+            with monitoring.track_in_flight("ocr_requests_in_flight"), monitoring.time_stage("ocr"):
+                result, _, avg_confidence = await analyze_layout_async(
+                    file_object=file_object,
+                    endpoint=DOCUMENT_ENDPOINT,
+                    key=DOCUMENT_KEY,
+                    client=document_client
+                )
+
+        with monitoring.time_stage("postprocess"):
+            pages = prepare_pages(document_pages(result), form_type=form_type)
+
+        if extraction_mode == "combined":
+            with monitoring.time_stage("combined_extraction"):
+                language, form_data = await detect_and_extract_pages_async(pages, openai_client, form_type=form_type,
+                                                                           llm_limiter=llm_limiter)
+        else:
+            async with llm_limiter or nullcontext():
+                with monitoring.track_in_flight("openai_requests_in_flight"), \
+                        monitoring.time_stage("language_detection"):
+                    language = await detect_language_async(join_pages(pages), openai_client)
+
+            with monitoring.time_stage("extraction"):
+                form_data = await extract_pages_async(pages, language, openai_client, form_type=form_type,
+                                                      llm_limiter=llm_limiter)
+
+        with monitoring.time_stage("confidence_analysis"):
+            confidence = await asyncio.to_thread(analyze_confidence, result, form_data)
+
+        return _finalize(language, avg_confidence, form_data, confidence, start_time, extraction_mode)
+
+
+async def process_documents_async(documents: Iterable[tuple[str, Union[bytes, str]]], max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+                                  ocr_concurrency: int = OCR_CONCURRENCY,
+                                  openai_concurrency: int = OPENAI_CONCURRENCY,
+                                  extraction_mode: str = EXTRACTION_MODE) -> AsyncIterator[tuple]:
+    """
+    Process many documents on one event loop, yielding outcomes as they complete.
+
+    Args:
+        documents: Iterable of (document_id, document bytes or file path); files are
+            read only once the document is admitted, so memory stays bounded
+        max_in_flight: Maximum documents processed concurrently
+        ocr_concurrency: Maximum in-flight Azure OCR requests
+        openai_concurrency: Maximum in-flight OpenAI requests
+        extraction_mode: 'two_step' (detect, then extract) or 'combined' (one request)
+
+    Yields:
+        tuple: (document_id, result_dict, exception); exactly one of result and exception is set
+    """
+    in_flight = asyncio.Semaphore(max_in_flight)
+    ocr_limiter = asyncio.Semaphore(ocr_concurrency)
+    llm_limiter = asyncio.Semaphore(openai_concurrency)
+
+    async with async_document_client(DOCUMENT_ENDPOINT, DOCUMENT_KEY) as document_client, \
+            init_async_openai_client(OPENAI_ENDPOINT, OPENAI_KEY) as openai_client:
+
+        async def run(doc_id, document):
+            async with in_flight:
+                monitoring.add_gauge("documents_queued", -1)
+                with trace_document(document_id=str(doc_id)):
+                    try:
+                        document_bytes = document if isinstance(document, bytes) else await asyncio.to_thread(
+                            _read_file, document
+                        )
+                        with monitoring.track_in_flight("documents_in_flight"):
+                            result = await process_document_async(
+                                document_bytes, openai_client, document_client,
+                                ocr_limiter=ocr_limiter, llm_limiter=llm_limiter, extraction_mode=extraction_mode
+                            )
+                        return doc_id, result, None
+                    except Exception as e:
+                        monitoring.log_error(error_type=type(e).__name__, error_message=str(e))
+                        logger.error(f"Failed to process {doc_id}: {e}")
+                        return doc_id, None, e
+
+        tasks = [asyncio.create_task(run(doc_id, document)) for doc_id, document in documents]
+        monitoring.add_gauge("documents_queued", len(tasks))
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+
+def _check_extraction_mode(extraction_mode: str):
+    if extraction_mode not in EXTRACTION_MODES:
+        raise ValueError(f"extraction_mode must be one of {EXTRACTION_MODES}, got '{extraction_mode}'")
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _finalize(language: str, avg_confidence: float, form_data: dict, confidence: dict, start_time: float,
+              extraction_mode: str) -> dict:
+    """Validate extracted data, record processing metrics and build the result."""
+    with monitoring.time_stage("validation"):
+        validation_result = validate_completeness(form_data)
+    monitoring.log_confidence_review(len(confidence["flagged_fields"]))
+
+    total_duration = (time.time() - start_time) * 1000
+    monitoring.log_document_processing(
+        ocr_confidence=avg_confidence,
+        form_completeness=validation_result["completeness_score"],
+        duration_ms=total_duration,
+        extraction_mode=extraction_mode
+    )
+
+    return {
+        "extraction_mode": extraction_mode,
+        "language": language,
+        "ocr_confidence": avg_confidence,
+        "form_data": form_data,
+        "validation": validation_result,
+        "confidence": confidence,
+        "duration_ms": total_duration
+    }
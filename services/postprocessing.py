@@ -0,0 +1,129 @@
+"""
+OCR text post-processing.
+Strips printed form boilerplate listed in `unecessary_words.txt` with a single
+compiled matcher that is reloaded only when the phrase file changes.
+"""
+
+from services.logger_config import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+UNNECESSARY_WORDS_PATH = os.path.join(os.path.dirname(__file__), "unecessary_words.txt")
+
+
+def compile_phrases(phrases: list[str]) -> re.Pattern:
+    """
+    Compile literal phrases into one regex shaped like a prefix trie.
+
+    Phrases sharing a prefix share a branch, so the engine tests each text
+    position against the few phrases that can still match instead of against
+    every phrase. Longer phrases win over their own prefixes.
+
+    Substituting with the pattern is one left-to-right pass, unlike a
+    `str.replace` per phrase: of two overlapping occurrences the leftmost is
+    removed, removals never join text into a new match, and the phrase order
+    does not matter.
+
+    Args:
+        phrases: Literal phrases to match
+
+    Returns:
+        re.Pattern: Pattern matching any of the phrases, or None when there are none
+    """
+    trie: dict = {}
+    for phrase in phrases:
+        if not phrase:
+            continue
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    if not trie:
+        return None
+    return re.compile(_trie_to_regex(trie))
+
+
+def _trie_to_regex(node: dict) -> str:
+    children = [(char, child) for char, child in node.items() if char]
+    if not children:
+        return ""
+
+    # Leaf characters collapse into a class, everything else into an alternation
+    if len(children) > 1 and all(list(child) == [""] for _, child in children):
+        body = "[" + "".join(re.escape(char) for char, _ in children) + "]"
+    elif len(children) == 1:
+        char, child = children[0]
+        body = re.escape(char) + _trie_to_regex(child)
+    else:
+        body = "(?:" + "|".join(re.escape(char) + _trie_to_regex(child) for char, child in children) + ")"
+
+    # A phrase ending here makes the rest optional; greedy matching prefers the longer phrase
+    return "(?:" + body + ")?" if "" in node else body
+
+
+class BoilerplateStripper:
+    """Removes boilerplate phrases from text, recompiling when the phrase file's mtime changes."""
+
+    def __init__(self, filepath: str = UNNECESSARY_WORDS_PATH):
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._mtime_ns = None
+        self._pattern = None
+
+    def strip(self, text: str) -> str:
+        """Remove every phrase occurrence from `text`."""
+        pattern = self._current_pattern()
+        if pattern is None:
+            return text
+        return pattern.sub("", text)
+
+    def _current_pattern(self) -> re.Pattern:
+        mtime_ns = os.stat(self.filepath).st_mtime_ns
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                if mtime_ns != self._mtime_ns:
+                    with open(self.filepath, "r", encoding="utf-8") as f:
+                        phrases = f.read().splitlines()
+                    self._pattern = compile_phrases(phrases)
+                    self._mtime_ns = mtime_ns
+                    logger.info(f"Loaded {len([p for p in phrases if p])} boilerplate phrases from {self.filepath}")
+        return self._pattern
+
+
+_strippers: dict = {}
+_strippers_lock = threading.Lock()
+
+
+def get_stripper(filepath: str = UNNECESSARY_WORDS_PATH) -> BoilerplateStripper:
+    """Return the shared stripper for a phrase file."""
+    key = os.path.abspath(filepath)
+    with _strippers_lock:
+        stripper = _strippers.get(key)
+        if stripper is None:
+            stripper = _strippers[key] = BoilerplateStripper(key)
+        return stripper
+
+
+def postprocess_ocr(text: str, filepath: str = UNNECESSARY_WORDS_PATH) -> str:
+    """
+    Removes unnecessary words from the input text based on a file containing one word per line.
+
+    Args:
+        text (str): The input text to clean.
+        filepath (str): Path to the file containing unnecessary words (one per line).
+
+    Returns:
+        str: Cleaned text with unnecessary words removed.
+    """
+    try:
+        return get_stripper(filepath).strip(text)
+    except FileNotFoundError:
+        logger.error(f"Unnecessary words file not found: {filepath}")
+        raise
+    except Exception as e:
+        logger.error(f"Error in postprocess_ocr: {e}")
+        raise
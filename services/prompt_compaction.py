@@ -0,0 +1,169 @@
+"""
+Prompt compaction for form extraction requests.
+Shrinks post-processed OCR text before it is sent to the model: collapses
+whitespace, drops repeated page headers and footers (long lines without digits) and,
+when the text is still over the token budget, keeps the lines most relevant
+to the template fields.
+"""
+
+from services.logger_config import logging
+from services.config import PROMPT_COMPACTION, PROMPT_TOKEN_BUDGET
+from services.monitoring import monitoring
+from services.postprocessing import compile_phrases
+from services.rate_limit import estimate_tokens
+from dataclasses import dataclass
+from functools import lru_cache
+import json
+import re
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_CAMEL_CASE = re.compile(r"(?<=[a-z])(?=[A-Z])")
+_DIGIT = re.compile(r"\d")
+
+MIN_KEYWORD_LENGTH = 3
+# Repeated lines are only dropped from this length on; shorter lines are usually values or labels
+MIN_DEDUP_LINE_LENGTH = 25
+
+
+@dataclass(frozen=True)
+class CompactionResult:
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    dropped_lines: int
+    truncated: bool
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+def compact_text(text: str, templates_json: str = None, token_budget: int = PROMPT_TOKEN_BUDGET) -> CompactionResult:
+    """
+    Compact OCR text for an extraction prompt.
+
+    Args:
+        text: Post-processed OCR text
+        templates_json: Serialized template(s) whose field names define relevance
+        token_budget: Maximum estimated tokens of the returned text (0 disables the budget)
+
+    Returns:
+        CompactionResult: Compacted text and token accounting
+    """
+    original_tokens = estimate_tokens(text)
+
+    lines, seen = [], set()
+    for raw_line in text.splitlines():
+        line = _WHITESPACE.sub(" ", raw_line).strip()
+        if not line:
+            continue
+        # Repeated page headers and footers carry no new information. Short lines and lines
+        # with digits are field values (two fields may share one) and are always kept.
+        if _is_header_like(line):
+            key = line.casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+
+    kept = lines
+    truncated = False
+    if token_budget and sum(estimate_tokens(line) for line in lines) > token_budget:
+        kept = _select_relevant_lines(lines, templates_json, token_budget)
+        truncated = True
+
+    compacted = "\n".join(kept)
+    return CompactionResult(
+        text=compacted,
+        original_tokens=original_tokens,
+        compacted_tokens=estimate_tokens(compacted),
+        dropped_lines=len(text.splitlines()) - len(kept),
+        truncated=truncated
+    )
+
+
+def _is_header_like(line: str) -> bool:
+    """Whether a repeat of the line can be dropped: long enough to be a header or footer, with no digits."""
+    return len(line) >= MIN_DEDUP_LINE_LENGTH and not _DIGIT.search(line)
+
+
+def compact_for_prompt(text: str, templates_json: str = None) -> str:
+    """
+    Compact text for a prompt when compaction is enabled and report the savings.
+
+    Args:
+        text: Post-processed OCR text
+        templates_json: Serialized template(s) of the request
+
+    Returns:
+        str: Text to send to the model
+    """
+    if not PROMPT_COMPACTION:
+        return text
+    result = compact_text(text, templates_json)
+    monitoring.log_prompt_compaction(result.original_tokens, result.compacted_tokens, result.truncated)
+    if result.truncated:
+        logger.info(f"Prompt text truncated to the token budget: {result.original_tokens} -> "
+                    f"{result.compacted_tokens} estimated tokens ({result.dropped_lines} lines dropped)")
+    return result.text
+
+
+def _select_relevant_lines(lines: list[str], templates_json: str, token_budget: int) -> list[str]:
+    """
+    Keep the highest-scoring lines within the budget, in their original order.
+
+    A line scores for every template field name it mentions and for containing
+    digits (dates, ids, phone numbers); the line after a field label also
+    scores, since scanned forms often print the value below the label.
+    """
+    pattern = _keyword_pattern(templates_json) if templates_json else None
+    label_hits = [len(pattern.findall(line.casefold())) if pattern else 0 for line in lines]
+    scores = []
+    for index, line in enumerate(lines):
+        score = 2 * label_hits[index] + (1 if _DIGIT.search(line) else 0)
+        if index > 0 and label_hits[index - 1]:
+            score += 1
+        scores.append(score)
+
+    selected, used = set(), 0
+    for index in sorted(range(len(lines)), key=lambda i: (-scores[i], i)):
+        cost = estimate_tokens(lines[index])
+        if used + cost <= token_budget:
+            selected.add(index)
+            used += cost
+    return [line for index, line in enumerate(lines) if index in selected]
+
+
+@lru_cache(maxsize=16)
+def template_field_names(templates_json: str) -> tuple[str, ...]:
+    """
+    Field names of serialized template(s) as casefolded phrases ('dateOfBirth' -> 'date of birth').
+
+    Args:
+        templates_json: Serialized template, or templates keyed by language
+
+    Returns:
+        tuple: Sorted unique field names
+    """
+    names = set()
+
+    def collect(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                names.add(_CAMEL_CASE.sub(" ", key).casefold())
+                collect(value)
+
+    collect(json.loads(templates_json))
+    return tuple(sorted(names))
+
+
+@lru_cache(maxsize=16)
+def _keyword_pattern(templates_json: str):
+    """Matcher for the field names (and their words) of the serialized templates."""
+    keywords = set()
+    for phrase in template_field_names(templates_json):
+        keywords.add(phrase)
+        keywords.update(word for word in phrase.split() if len(word) >= MIN_KEYWORD_LENGTH)
+    return compile_phrases(sorted(keywords))
@@ -0,0 +1,393 @@
+"""
+Client-side rate limiting and retry scheduling for Azure OCR and OpenAI calls.
+Token buckets keep request and token rates under the configured quotas, an
+AIMD limiter shrinks concurrency when the service throttles and grows it back
+while calls succeed, and transient failures are retried with jittered
+exponential backoff that honours `Retry-After`.
+"""
+
+from services.logger_config import logging
+from services.monitoring import monitoring
+from services.config import (
+    OCR_RPM, OPENAI_RPM, OPENAI_TPM, OCR_MAX_CONCURRENCY, OPENAI_MAX_CONCURRENCY, OPENAI_COMPLETION_TOKENS_ESTIMATE,
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+)
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable
+import asyncio
+import random
+import re
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+# Connection errors per SDK module; they are resolved from sys.modules, so checking an
+# error never imports an SDK (one that was not imported cannot have raised it)
+TRANSIENT_ERRORS = {
+    "azure.core.exceptions": ("ServiceRequestError", "ServiceResponseError"),
+    "openai": ("APIConnectionError",)
+}
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    Callers reserve tokens and are told how long to wait, so the same bucket
+    serves threads (`acquire`) and coroutines (`acquire_async`). Reservations
+    may drive the balance negative, which queues later callers behind earlier ones.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        """
+        Args:
+            rate_per_minute: Sustained refill rate
+            capacity: Maximum burst (defaults to one minute of quota)
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take `amount` tokens and return the seconds to wait before using them."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def adjust(self, delta: float):
+        """Return (positive) or charge (negative) tokens after the actual cost is known."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + delta)
+
+    def acquire(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class _Waiter:
+    __slots__ = ("event", "future", "loop", "granted")
+
+    def __init__(self, event: threading.Event = None, future: asyncio.Future = None,
+                 loop: asyncio.AbstractEventLoop = None):
+        self.event = event
+        self.future = future
+        self.loop = loop
+        self.granted = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit adapted with AIMD (additive increase, multiplicative decrease).
+
+    Each success raises the limit by `increase / limit` (about one slot per
+    window of successful calls). A throttling response sets it to `decrease`
+    times the calls actually in flight, at most once per `cooldown` seconds,
+    so a burst of 429s from the same window only backs off once. Waiters are
+    served in FIFO order, whether they are threads or coroutines.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: int = None, increase: float = 1.0,
+                 decrease: float = 0.5, cooldown: float = 1.0):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(initial if initial is not None else self.maximum)
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._has_slot():
+                self.in_flight += 1
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        waiter.event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._has_slot():
+                self.in_flight += 1
+                return
+            waiter = _Waiter(future=loop.create_future(), loop=loop)
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over while we were being cancelled
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self):
+        with self._lock:
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._wake()
+
+    def on_throttle(self) -> bool:
+        """Back off after a throttling response; returns whether the limit was lowered."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return False
+            self._last_decrease = now
+            self.limit = max(self.minimum, min(self.limit, self.in_flight) * self.decrease)
+            return True
+
+    def _has_slot(self) -> bool:
+        return not self._waiters and self.in_flight < int(self.limit)
+
+    def _wake(self):
+        """Hand free slots to queued waiters; called with the lock held."""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class RetryPolicy:
+    """Jittered exponential backoff settings."""
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY
+    max_delay: float = RETRY_MAX_DELAY
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Delay before retry number `attempt` (1-based).
+
+        Uses "full jitter" (uniform between 0 and the exponential cap) so
+        concurrent callers spread out; a server `Retry-After` is a lower bound.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.base_delay))
+        return min(delay, max(self.max_delay, retry_after or 0))
+
+
+def status_code_of(error: Exception) -> int:
+    """HTTP status of an SDK error (Azure or OpenAI), or None."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_throttle(error: Exception) -> bool:
+    return status_code_of(error) == 429
+
+
+def is_retryable(error: Exception) -> bool:
+    return isinstance(error, _transient_errors()) or status_code_of(error) in RETRYABLE_STATUS_CODES
+
+
+def _transient_errors() -> tuple:
+    return tuple(getattr(sys.modules[module], name) for module, names in TRANSIENT_ERRORS.items()
+                 if module in sys.modules for name in names)
+
+
+def retry_after_seconds(error: Exception) -> float:
+    """
+    Read the server's requested delay from `retry-after-ms`, `x-ms-retry-after-ms` or `Retry-After`.
+
+    Returns:
+        float: Seconds to wait, or None when the response carries no hint
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    values = {str(name).lower(): value for name, value in headers.items()}
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        if name in values:
+            try:
+                return float(values[name]) / 1000
+            except ValueError:
+                pass
+    value = values.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for quota accounting.
+
+    ASCII text averages about four characters per token; Hebrew and other
+    non-ASCII scripts tokenize far less densely, so they count two per token.
+    """
+    non_ascii = len(_NON_ASCII.findall(text))
+    return (len(text) - non_ascii) // 4 + non_ascii // 2 + 1
+
+
+def estimate_request_tokens(request: dict, completion_tokens: int = OPENAI_COMPLETION_TOKENS_ESTIMATE) -> int:
+    """Estimate the quota cost (prompt plus completion tokens) of a chat completion request."""
+    prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) + 4 for message in request["messages"])
+    return prompt_tokens + (request.get("max_tokens") or completion_tokens)
+
+
+class ServiceScheduler:
+    """
+    Admission control and retries for one downstream service.
+
+    Every attempt waits for the request bucket (and the token bucket, when a
+    token cost is given), then for an AIMD concurrency slot. Throttled and
+    transient failures are retried until `policy.max_attempts` is reached.
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, concurrency: int = 4,
+                 policy: RetryPolicy = None):
+        """
+        Args:
+            name: Service name used in metrics (e.g. 'azure_ocr', 'openai')
+            rpm: Requests per minute quota (0 disables the request bucket)
+            tpm: Tokens per minute quota (0 disables the token bucket)
+            concurrency: Process-wide ceiling on concurrent calls; AIMD adapts below it
+            policy: Retry policy
+        """
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.limiter = AdaptiveConcurrencyLimiter(concurrency)
+        self.policy = policy or RetryPolicy()
+
+    def call(self, func: Callable, *args, tokens: int = 0, usage: Callable = None, **kwargs):
+        """
+        Run `func(*args, **kwargs)` under the scheduler.
+
+        Args:
+            func: Callable performing one service request
+            tokens: Estimated token cost charged to the token bucket
+            usage: Optional callable returning the actual token cost from the result
+
+        Returns:
+            Result of `func`
+        """
+        attempt = 1
+        while True:
+            if self.requests is not None:
+                self.requests.acquire()
+            if self.tokens is not None and tokens:
+                self.tokens.acquire(tokens)
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success(result, tokens, usage)
+                return result
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, func: Callable[..., Awaitable], *args, tokens: int = 0, usage: Callable = None,
+                         **kwargs):
+        """Asynchronous variant of `call` for coroutine functions."""
+        attempt = 1
+        while True:
+            if self.requests is not None:
+                await self.requests.acquire_async()
+            if self.tokens is not None and tokens:
+                await self.tokens.acquire_async(tokens)
+            await self.limiter.acquire_async()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            else:
+                self._on_success(result, tokens, usage)
+                return result
+            finally:
+                self.limiter.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _on_success(self, result, tokens: int, usage: Callable):
+        self.limiter.on_success()
+        monitoring.set_gauge(f"{self.name}_concurrency_limit", int(self.limiter.limit))
+        if usage is not None:
+            self.settle(tokens, usage(result))
+
+    def settle(self, tokens: int, actual: int):
+        """
+        Correct the token bucket once a request's actual token usage is known.
+
+        Called automatically when `call` is given a `usage` callable; streamed
+        responses report their usage in the last chunk and settle explicitly.
+        """
+        if self.tokens is not None and tokens and actual:
+            self.tokens.adjust(tokens - actual)
+
+    def _on_error(self, error: Exception, attempt: int) -> float:
+        """Record a failed attempt; returns the delay before retrying, or None to give up."""
+        if not is_retryable(error):
+            return None
+        throttled = is_throttle(error)
+        if throttled and self.limiter.on_throttle():
+            logger.info(f"{self.name} throttled, concurrency limit lowered to {int(self.limiter.limit)}")
+        monitoring.set_gauge(f"{self.name}_concurrency_limit", int(self.limiter.limit))
+        if attempt >= self.policy.max_attempts:
+            monitoring.log_retry(self.name, throttled=throttled, exhausted=True)
+            logger.error(f"{self.name} request failed after {attempt} attempts: {error}")
+            return None
+        delay = self.policy.backoff(attempt, retry_after_seconds(error))
+        monitoring.log_retry(self.name, throttled=throttled)
+        logger.info(f"Retrying {self.name} request in {delay:.2f}s (attempt {attempt}): {error}")
+        return delay
+
+
+ocr_scheduler = ServiceScheduler("azure_ocr", rpm=OCR_RPM, concurrency=OCR_MAX_CONCURRENCY)
+openai_scheduler = ServiceScheduler("openai", rpm=OPENAI_RPM, tpm=OPENAI_TPM, concurrency=OPENAI_MAX_CONCURRENCY)
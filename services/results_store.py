@@ -0,0 +1,412 @@
+"""
+Columnar store of extraction results.
+Appends processed documents as template-aligned rows (one string column per
+template field) to Parquet files partitioned by form type, language and
+processing date, and computes per-field missing rates and completeness
+distributions over the stored forms in bulk.
+
+Usage:
+    python -m services.results_store ingest results.jsonl --root results/
+    python -m services.results_store analyze results/ --since 2024-01-01
+"""
+
+from __future__ import annotations
+
+from services.environment import configure
+
+if __name__ == "__main__":
+    configure()  # Before services.config reads the environment
+
+from services.logger_config import logging
+from services.lazy_imports import lazy_import
+from services.config import RESULTS_STORE_DIR, RESULTS_STORE_FLUSH_ROWS, RESULTS_STORE_FLUSH_SECONDS
+from services.template_registry import registry
+from services.validation import _flatten_keys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Only processes that store or analyze results pay for importing pyarrow
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+ds = lazy_import("pyarrow.dataset")
+pq = lazy_import("pyarrow.parquet")
+
+# Field columns are namespaced so template keys never collide with the metadata columns
+FIELD_PREFIX = "form."
+
+
+@lru_cache(maxsize=1)
+def metadata_schema() -> pa.Schema:
+    """Schema of the metadata columns that precede the field columns."""
+    return pa.schema([
+        ("document_id", pa.string()),
+        ("processed_at", pa.timestamp("ms", tz="UTC")),
+        ("extraction_mode", pa.string()),
+        ("ocr_confidence", pa.float64()),
+        ("completeness_score", pa.float64()),
+        ("duration_ms", pa.float64())
+    ])
+
+
+@lru_cache(maxsize=1)
+def _date_partitioning() -> ds.Partitioning:
+    return ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+@dataclass(frozen=True)
+class FieldLayout:
+    """Column layout of one template: field paths in template order and the Parquet schema."""
+    form_type: str
+    language: str
+    paths: tuple[str, ...]
+    keys: tuple[tuple[str, ...], ...] = field(repr=False)
+    schema: pa.Schema = field(repr=False, compare=False)
+
+    def row_values(self, form_data: dict) -> list[str]:
+        """Field values in column order; absent and non-string values are stored as ""."""
+        values = []
+        for keys in self.keys:
+            value = form_data
+            for key in keys:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value if isinstance(value, str) else "")
+        return values
+
+
+def field_layout(language: str, form_type: str = None) -> FieldLayout:
+    """
+    Return the column layout of a registered template.
+
+    Args:
+        language: Template language (e.g. 'Hebrew')
+        form_type: Registered form type (defaults to the registry's default form)
+
+    Raises:
+        KeyError: If the form type or language is not registered
+    """
+    entry = registry.get_template(language, form_type)
+    return _layout(entry.form_type, entry.language, entry.template_json)
+
+
+@lru_cache(maxsize=64)
+def _layout(form_type: str, language: str, template_json: str) -> FieldLayout:
+    # Keyed by the serialized template so hot-reloaded templates get a fresh layout
+    paths = tuple(_flatten_keys(json.loads(template_json)))
+    schema = metadata_schema()
+    for path in paths:
+        schema = schema.append(pa.field(FIELD_PREFIX + path, pa.string()))
+    return FieldLayout(form_type, language, paths, tuple(tuple(path.split(".")) for path in paths), schema)
+
+
+class ResultsStore:
+    """
+    Thread-safe buffered Parquet sink.
+
+    Rows are buffered per partition and written as one file per partition when
+    `flush_rows` rows or `flush_seconds` have accumulated, and on `close`. A
+    background thread enforces `flush_seconds`, so rows of a process that
+    appends rarely (the app) are written even when no further append comes.
+    Files are written under a temporary name and renamed, so readers never see
+    partial files.
+    """
+
+    def __init__(self, root_dir: str, flush_rows: int = RESULTS_STORE_FLUSH_ROWS,
+                 flush_seconds: float = RESULTS_STORE_FLUSH_SECONDS):
+        """
+        Args:
+            root_dir: Directory holding the partitioned dataset
+            flush_rows: Buffered rows that trigger a write
+            flush_seconds: Age of the oldest buffered row that triggers a write (0 disables)
+        """
+        self.root_dir = root_dir
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._buffers: dict[tuple, tuple[FieldLayout, list]] = {}
+        self._rows = 0
+        self._oldest = None
+        self._closed = threading.Event()
+        self._flusher: threading.Thread = None
+
+    def append(self, document_id: str, result: dict, form_type: str = None, processed_at: datetime = None):
+        """
+        Buffer one processed document.
+
+        Args:
+            document_id: Identifier stored with the row
+            result: Pipeline result (language, form_data, validation, ...)
+            form_type: Registered form type (defaults to the registry's default form)
+            processed_at: When the document was processed (defaults to now); also selects the date partition
+        """
+        layout = field_layout(result["language"], form_type)
+        processed_at = (processed_at or datetime.now(timezone.utc)).astimezone(timezone.utc)
+        row = [
+            str(document_id),
+            processed_at,
+            result.get("extraction_mode"),
+            result.get("ocr_confidence"),
+            result.get("validation", {}).get("completeness_score"),
+            result.get("duration_ms"),
+            *layout.row_values(result["form_data"])
+        ]
+        key = (layout.form_type, layout.language, processed_at.date().isoformat(), layout.paths)
+
+        with self._lock:
+            self._buffers.setdefault(key, (layout, []))[1].append(row)
+            self._rows += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = self._rows >= self.flush_rows or self._is_stale()
+            if self.flush_seconds > 0 and self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="results-store-flush",
+                                                 daemon=True)
+                self._flusher.start()
+        if due:
+            self.flush()
+
+    def _is_stale(self) -> bool:
+        """Whether the oldest buffered row has waited `flush_seconds` (call with the lock held)."""
+        return self.flush_seconds > 0 and self._oldest is not None and \
+            time.monotonic() - self._oldest >= self.flush_seconds
+
+    def _flush_periodically(self):
+        # Checking twice per period writes a row at most 1.5 x flush_seconds after it was appended
+        while not self._closed.wait(self.flush_seconds / 2):
+            with self._lock:
+                due = self._is_stale()
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Periodic flush of the results store failed: {e}")
+
+    def flush(self) -> int:
+        """
+        Write all buffered rows.
+
+        A partition that fails to write keeps its rows buffered for the next
+        flush; the other partitions are still written.
+
+        Returns:
+            int: Number of rows written
+
+        Raises:
+            Exception: The first write error, after every partition was attempted
+        """
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            oldest = self._oldest
+            self._rows, self._oldest = 0, None
+
+        written, failure = 0, None
+        for key, (layout, rows) in buffers.items():
+            try:
+                self._write(layout, key[2], rows)
+                written += len(rows)
+            except Exception as e:
+                self._restore(key, layout, rows, oldest)
+                failure = failure or e
+        if failure is not None:
+            raise failure
+        return written
+
+    def _restore(self, key: tuple, layout: FieldLayout, rows: list, oldest: float):
+        """Put the rows of a failed write back in front of any rows appended since."""
+        with self._lock:
+            buffered = self._buffers.get(key, (layout, []))[1]
+            self._buffers[key] = (layout, rows + buffered)
+            self._rows += len(rows)
+            self._oldest = oldest if self._oldest is None else min(self._oldest, oldest)
+
+    def close(self):
+        """Stop the periodic flush and write any buffered rows."""
+        self._closed.set()
+        self.flush()
+
+    def _write(self, layout: FieldLayout, date: str, rows: list):
+        directory = os.path.join(self.root_dir, f"form_type={layout.form_type}", f"language={layout.language}",
+                                 f"date={date}")
+        name = f"part-{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=column.type) for values, column in zip(columns, layout.schema)],
+                schema=layout.schema
+            )
+            # Dot-prefixed names are ignored by dataset discovery until the rename
+            temp_path = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, temp_path, compression="zstd")
+            os.replace(temp_path, os.path.join(directory, name))
+            logger.info(f"Wrote {len(rows)} results to {os.path.join(directory, name)}")
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} results to {directory}: {e}")
+            raise
+
+
+def completeness_analytics(root_dir: str, form_type: str = None, since: str = None,
+                           batch_size: int = 65536) -> dict:
+    """
+    Compute per-field missing rates and the completeness distribution of stored forms.
+
+    Every (form type, language) partition is scanned in record batches; each
+    batch becomes a fields x rows boolean matrix of missing values that is
+    reduced per field and per row, so memory stays bounded by `batch_size`.
+    Registered templates define the fields (rows written before a field was
+    added count it as missing); other partitions use the stored columns.
+
+    Args:
+        root_dir: Dataset directory written by `ResultsStore`
+        form_type: Only analyze this form type
+        since: Only analyze rows processed on or after this ISO date (e.g. '2024-01-01')
+        batch_size: Rows per scanned record batch
+
+    Returns:
+        dict: {form_type: {language: report}} with documents, missing_rate per field and completeness statistics
+    """
+    reports = {}
+    for form_dir, partition_form in _partitions(root_dir, "form_type"):
+        if form_type is not None and partition_form != form_type:
+            continue
+        for language_dir, language in _partitions(form_dir, "language"):
+            report = _analyze_partition(language_dir, partition_form, language, since, batch_size)
+            if report is not None:
+                reports.setdefault(partition_form, {})[language] = report
+    return reports
+
+
+def _partitions(directory: str, name: str) -> list[tuple[str, str]]:
+    prefix = f"{name}="
+    if not os.path.isdir(directory):
+        return []
+    return sorted((entry.path, entry.name[len(prefix):]) for entry in os.scandir(directory)
+                  if entry.is_dir() and entry.name.startswith(prefix))
+
+
+def _analyze_partition(directory: str, form_type: str, language: str, since: str, batch_size: int) -> dict:
+    try:
+        schema = field_layout(language, form_type).schema.append(pa.field("date", pa.string()))
+    except KeyError:
+        schema = None
+    dataset = ds.dataset(directory, format="parquet", partitioning=_date_partitioning(), schema=schema)
+    columns = [name for name in dataset.schema.names if name.startswith(FIELD_PREFIX)]
+    if not columns:
+        return None
+
+    missing_counts = np.zeros(len(columns), dtype=np.int64)
+    histogram = np.zeros(len(columns) + 1, dtype=np.int64)
+    scanner = dataset.scanner(columns=columns, batch_size=batch_size,
+                              filter=ds.field("date") >= since if since else None)
+    for batch in scanner.to_batches():
+        if not batch.num_rows:
+            continue
+        missing = np.empty((len(columns), batch.num_rows), dtype=bool)
+        for index, column in enumerate(batch.columns):
+            missing[index] = pc.fill_null(pc.equal(pc.binary_length(column), 0), True).to_numpy(zero_copy_only=False)
+        missing_counts += missing.sum(axis=1)
+        histogram += np.bincount(missing.sum(axis=0), minlength=len(columns) + 1)
+
+    documents = int(histogram.sum())
+    if not documents:
+        return None
+    paths = [name[len(FIELD_PREFIX):] for name in columns]
+    return {
+        "documents": documents,
+        "fields": len(columns),
+        "missing_rate": {path: round(float(count) / documents, 4) for path, count in zip(paths, missing_counts)},
+        "completeness": _distribution(histogram)
+    }
+
+
+def _distribution(histogram: np.ndarray) -> dict:
+    """Completeness statistics from counts of documents by number of missing fields."""
+    fields = len(histogram) - 1
+    # Ascending scores: index k of the reversed histogram is fields - k missing fields
+    scores = np.arange(fields + 1) / fields
+    counts = histogram[::-1]
+    cumulative = np.cumsum(counts)
+    documents = cumulative[-1]
+
+    def percentile(q: float) -> float:
+        return round(float(scores[np.searchsorted(cumulative, q * documents)]), 4)
+
+    return {
+        "mean": round(float(np.dot(scores, counts) / documents), 4),
+        "p10": percentile(0.1),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "histogram": {f"{score:.2f}": int(count) for score, count in zip(scores, counts) if count}
+    }
+
+
+def ingest_jsonl(path: str, store: ResultsStore) -> int:
+    """
+    Append the successful records of a batch JSONL results file to a store.
+
+    Rows keep the record's own `processed_at` timestamp (and date partition).
+    Records written before the batch CLI stamped them have none; they are
+    dated by the file's modification time, the closest upper bound available.
+
+    Returns:
+        int: Number of records appended
+    """
+    appended = 0
+    file_time = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("status") == "ok":
+                processed_at = record.get("processed_at")
+                store.append(record["id"], record,
+                             processed_at=datetime.fromisoformat(processed_at) if processed_at else file_time)
+                appended += 1
+    store.flush()
+    return appended
+
+
+# Shared sink of the app and batch CLI, when RESULTS_STORE_DIR is set
+results_store = ResultsStore(RESULTS_STORE_DIR) if RESULTS_STORE_DIR else None
+if results_store is not None:
+    atexit.register(results_store.close)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Store extraction results as Parquet and analyze completeness.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Append the ok records of a batch JSONL file")
+    ingest.add_argument("results", help="JSONL file written by services.batch")
+    ingest.add_argument("--root", default=RESULTS_STORE_DIR or None, required=not RESULTS_STORE_DIR,
+                        help="Dataset directory (default: RESULTS_STORE_DIR)")
+    analyze = commands.add_parser("analyze", help="Per-field missing rates and completeness distribution")
+    analyze.add_argument("root", nargs="?", default=RESULTS_STORE_DIR, help="Dataset directory")
+    analyze.add_argument("--form-type", help="Only analyze this form type")
+    analyze.add_argument("--since", help="Only analyze rows processed on or after this ISO date")
+    analyze.add_argument("--batch-size", type=int, default=65536, help="Rows per scanned record batch")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        appended = ingest_jsonl(args.results, ResultsStore(args.root))
+        print(json.dumps({"appended": appended}))
+    else:
+        report = completeness_analytics(args.root, form_type=args.form_type, since=args.since,
+                                        batch_size=args.batch_size)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
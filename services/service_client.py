@@ -0,0 +1,109 @@
+"""
+Client of the document submission API.
+Lets the Streamlit app (or any other caller) hand documents to the service and
+wait for their results instead of processing them in-process.
+"""
+
+from __future__ import annotations
+
+from services.logger_config import logging
+from services.lazy_imports import lazy_import
+from services.config import PARSER_SERVICE_URL, PARSER_SERVICE_TIMEOUT_SECONDS
+from typing import Callable
+import time
+
+logger = logging.getLogger(__name__)
+
+# Only imported when the app runs in service mode
+requests = lazy_import("requests")
+
+LONG_POLL_SECONDS = 30
+
+
+class ParserServiceError(RuntimeError):
+    """Raised when the service rejects a document or its job is dead-lettered."""
+
+
+class ParserServiceClient:
+    """Submits documents and long-polls their results over one pooled HTTP session."""
+
+    def __init__(self, base_url: str = PARSER_SERVICE_URL, timeout_seconds: float = PARSER_SERVICE_TIMEOUT_SECONDS):
+        """
+        Args:
+            base_url: Service root URL, e.g. http://localhost:8080
+            timeout_seconds: Longest wait for a result in `parse`
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout_seconds = timeout_seconds
+        self._session = requests.Session()
+
+    def submit(self, document: bytes, filename: str = None, extraction_mode: str = None,
+               form_type: str = None) -> dict:
+        """
+        Queue a document; resubmitting the same document and options returns the existing job.
+
+        Returns:
+            dict: Job status (id, status, attempts, ...)
+        """
+        params = {key: value for key, value in
+                  (("filename", filename), ("extraction_mode", extraction_mode), ("form_type", form_type)) if value}
+        response = self._session.post(f"{self.base_url}/jobs", params=params, data=document,
+                                      headers={"Content-Type": "application/octet-stream"}, timeout=60)
+        if response.status_code not in (200, 202):
+            raise ParserServiceError(f"Submission rejected ({response.status_code}): {_error_of(response)}")
+        return response.json()
+
+    def result(self, job_id: str, wait: float = 0) -> dict:
+        """
+        Fetch a job, waiting up to `wait` seconds for it to finish.
+
+        Returns:
+            dict: Job status, with the pipeline result under "result" once done
+
+        Raises:
+            ParserServiceError: If the job was dead-lettered
+        """
+        response = self._session.get(f"{self.base_url}/jobs/{job_id}/result", params={"wait": wait},
+                                     timeout=wait + 30)
+        if response.status_code == 409:
+            raise ParserServiceError(f"Job {job_id} failed: {_error_of(response)}")
+        if response.status_code not in (200, 202):
+            raise ParserServiceError(f"Result request failed ({response.status_code}): {_error_of(response)}")
+        return response.json()
+
+    def parse(self, document: bytes, filename: str = None, extraction_mode: str = None, form_type: str = None,
+              on_status: Callable[[dict], None] = None) -> dict:
+        """
+        Submit a document and wait for its pipeline result.
+
+        Args:
+            document: Document bytes
+            filename: Original file name
+            extraction_mode: 'two_step' or 'combined' (service default when omitted)
+            form_type: Registered form type (service default when omitted)
+            on_status: Called with the job status after submission and every poll
+
+        Returns:
+            dict: Pipeline result (language, form_data, validation, confidence, ...)
+
+        Raises:
+            ParserServiceError: If the job fails or does not finish within `timeout_seconds`
+        """
+        job = self.submit(document, filename=filename, extraction_mode=extraction_mode, form_type=form_type)
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            if on_status is not None:
+                on_status(job)
+            if job["status"] == "done" and "result" in job:
+                return job["result"]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ParserServiceError(f"Job {job['id']} did not finish within {self.timeout_seconds:.0f}s")
+            job = self.result(job["id"], wait=min(LONG_POLL_SECONDS, remaining))
+
+
+def _error_of(response: requests.Response) -> str:
+    try:
+        return response.json().get("error") or response.text
+    except ValueError:
+        return response.text
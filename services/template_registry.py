@@ -0,0 +1,204 @@
+"""
+Registry of extraction templates and system prompts.
+Loads every prompt and form template listed in `templates/registry.json` once,
+keeps the serialized template strings and system messages ready for requests,
+and hot-reloads when any of the files change.
+"""
+
+from services.logger_config import logging
+from services.config import TEMPLATE_RELOAD_INTERVAL
+from dataclasses import dataclass, field
+import json
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+MANIFEST_NAME = "registry.json"
+
+
+@dataclass(frozen=True)
+class TemplateEntry:
+    """A form template for one language, with its request-ready serialization."""
+    form_type: str
+    language: str
+    template: dict
+    template_json: str
+
+
+@dataclass
+class _Snapshot:
+    default_form: str
+    prompts: dict
+    system_messages: dict
+    forms: dict
+    combined_json: dict
+    mtimes: dict = field(default_factory=dict)
+
+
+class TemplateRegistry:
+    """
+    Thread-safe cache of prompts and templates.
+
+    Forms and languages are declared in the manifest, so new form types or
+    languages only need new files and a manifest entry. Additional templates
+    can also be registered at runtime with `register_form`.
+    """
+
+    def __init__(self, templates_dir: str = TEMPLATES_DIR, reload_interval: float = TEMPLATE_RELOAD_INTERVAL):
+        """
+        Args:
+            templates_dir: Directory containing the manifest, prompts and templates
+            reload_interval: Minimum seconds between file change checks (0 checks on every access)
+        """
+        self.templates_dir = templates_dir
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._extra_forms: dict = {}
+        self._snapshot: _Snapshot = None
+        self._last_check = 0.0
+
+    def get_template(self, language: str, form_type: str = None) -> TemplateEntry:
+        """
+        Return the template entry for a language.
+
+        Args:
+            language: Language name as declared in the manifest (e.g. 'Hebrew')
+            form_type: Form type (defaults to the manifest's default form)
+
+        Raises:
+            KeyError: If the form type or language is not registered
+        """
+        snapshot = self._current()
+        form_type = form_type or snapshot.default_form
+        try:
+            return snapshot.forms[form_type][language]
+        except KeyError:
+            raise KeyError(f"No template registered for form '{form_type}' in language '{language}'")
+
+    def get_prompt(self, name: str) -> str:
+        """Return a system prompt by its manifest name (e.g. 'extraction')."""
+        return self._current().prompts[name]
+
+    def system_message(self, name: str) -> dict:
+        """Return the prebuilt system chat message for a prompt."""
+        return self._current().system_messages[name]
+
+    def combined_templates_json(self, form_type: str = None) -> str:
+        """Return all language templates of a form serialized as one JSON object keyed by language."""
+        snapshot = self._current()
+        return snapshot.combined_json[form_type or snapshot.default_form]
+
+    def languages(self, form_type: str = None) -> list[str]:
+        """Return the languages registered for a form."""
+        snapshot = self._current()
+        return list(snapshot.forms.get(form_type or snapshot.default_form, {}))
+
+    def form_types(self) -> list[str]:
+        """Return all registered form types."""
+        return list(self._current().forms)
+
+    def register_form(self, form_type: str, language: str, template_path: str):
+        """
+        Register an additional template file at runtime.
+
+        Args:
+            form_type: Form type name
+            language: Language of the template
+            template_path: Path to the JSON template (relative paths resolve against templates_dir)
+        """
+        with self._lock:
+            self._extra_forms.setdefault(form_type, {})[language] = template_path
+            self._snapshot = None
+        logger.info(f"Registered template for form '{form_type}' in {language}: {template_path}")
+
+    def reload(self):
+        """Force all files to be read again."""
+        with self._lock:
+            self._snapshot = None
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check < self.reload_interval:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._has_changed(self._snapshot):
+                self._snapshot = self._load()
+            self._last_check = now
+            return self._snapshot
+
+    def _path(self, name: str) -> str:
+        return name if os.path.isabs(name) else os.path.join(self.templates_dir, name)
+
+    def _has_changed(self, snapshot: _Snapshot) -> bool:
+        for path, mtime in snapshot.mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    def _load(self) -> _Snapshot:
+        """Read the manifest and every file it references into a new immutable snapshot."""
+        try:
+            manifest_path = self._path(MANIFEST_NAME)
+            mtimes = {manifest_path: os.stat(manifest_path).st_mtime_ns}
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+
+            prompts = {}
+            for name, filename in manifest.get("prompts", {}).items():
+                path = self._path(filename)
+                mtimes[path] = os.stat(path).st_mtime_ns
+                with open(path, "r", encoding="utf-8") as f:
+                    prompts[name] = f.read().strip()
+
+            form_files = {form_type: dict(languages) for form_type, languages in manifest.get("forms", {}).items()}
+            for form_type, languages in self._extra_forms.items():
+                form_files.setdefault(form_type, {}).update(languages)
+
+            forms = {}
+            combined_json = {}
+            for form_type, languages in form_files.items():
+                forms[form_type] = {}
+                for language, filename in languages.items():
+                    path = self._path(filename)
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                    with open(path, "r", encoding="utf-8") as f:
+                        template = json.load(f)
+                    forms[form_type][language] = TemplateEntry(
+                        form_type=form_type,
+                        language=language,
+                        template=template,
+                        template_json=json.dumps(template, ensure_ascii=False, separators=(",", ":"))
+                    )
+                combined_json[form_type] = json.dumps(
+                    {language: entry.template for language, entry in forms[form_type].items()},
+                    ensure_ascii=False,
+                    separators=(",", ":")
+                )
+
+            default_form = manifest.get("default_form") or next(iter(forms), None)
+            logger.info(f"Loaded {len(prompts)} prompts and {sum(len(f) for f in forms.values())} templates")
+            return _Snapshot(
+                default_form=default_form,
+                prompts=prompts,
+                system_messages={name: {"role": "system", "content": prompt} for name, prompt in prompts.items()},
+                forms=forms,
+                combined_json=combined_json,
+                mtimes=mtimes
+            )
+        except FileNotFoundError as e:
+            logger.error(f"Template or prompt file not found: {e}")
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Error decoding JSON template: {e}")
+            raise
+
+
+registry = TemplateRegistry()
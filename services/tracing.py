@@ -0,0 +1,249 @@
+"""
+Per-document tracing.
+Records nested, timed spans for each document (request preparation, OCR submit and poll,
+text assembly, model requests, pipeline stages), tags the document's log
+records with a correlation ID and, when enabled, captures a cProfile profile
+and a tracemalloc allocation report. Traces of slow documents are written to
+TRACE_DIR for offline inspection.
+"""
+
+from services.logger_config import logging, correlation_id
+from services.config import TRACE_DIR, TRACE_SLOW_MS, TRACE_PROFILE, TRACE_MEMORY
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from datetime import datetime, timezone
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TOP_LINES = 25
+_UNSAFE_FILENAME = re.compile(r"[^\w.-]")
+
+
+class Span:
+    """A timed operation with optional attributes and child spans."""
+    __slots__ = ("name", "attributes", "start", "end", "children")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: float) -> dict:
+        entry = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3)
+        }
+        if self.attributes:
+            entry["attributes"] = self.attributes
+        if self.children:
+            entry["children"] = [child.to_dict(origin) for child in self.children]
+        return entry
+
+
+class Trace:
+    """Span tree of one document; spans may be added from worker threads."""
+
+    def __init__(self, trace_id: str, name: str, attributes: dict):
+        self.correlation_id = trace_id
+        self.root = Span(name, attributes)
+        self.started_at = datetime.now(timezone.utc)
+        self.lock = threading.Lock()
+        self.memory_peak_bytes = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "correlation_id": self.correlation_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "memory_peak_bytes": self.memory_peak_bytes,
+            "spans": [self.root.to_dict(self.root.start)]
+        }
+
+
+_current_trace: ContextVar[Trace] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Trace:
+    """Trace of the document processed by the current thread or task, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a child of the current span.
+
+    Outside of `trace_document` this is a no-op, so library code can be
+    instrumented unconditionally.
+
+    Args:
+        name: Span name
+        **attributes: JSON-serializable details recorded with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    current = Span(name, attributes)
+    with trace.lock:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace_document(name: str = "document", document_id: str = None, **attributes):
+    """
+    Trace the processing of one document.
+
+    Sets the correlation ID for the block's log records. Traces at least
+    TRACE_SLOW_MS long are written to TRACE_DIR, together with a cProfile dump
+    (TRACE_PROFILE) and the top allocation sites (TRACE_MEMORY). Profiles cover
+    the calling thread only, and memory figures are process-wide, so both also
+    include concurrently processed documents.
+
+    Args:
+        name: Root span name
+        document_id: Correlation ID (a random one is generated when omitted)
+        **attributes: Details recorded on the root span
+
+    Yields:
+        Trace: The document's trace (the enclosing one when already tracing)
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        # A traced helper called from an already traced flow joins the outer trace
+        with span(name, **attributes):
+            yield outer
+        return
+
+    trace = Trace(document_id or uuid.uuid4().hex[:12], name, attributes)
+    trace_token = _current_trace.set(trace)
+    id_token = correlation_id.set(trace.correlation_id)
+    profiler = _start_profiler() if TRACE_PROFILE else None
+    memory_baseline = _start_memory() if TRACE_MEMORY else None
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        if profiler is not None:
+            profiler.disable()
+        memory_report = _stop_memory(memory_baseline, trace) if memory_baseline is not None else None
+        _current_trace.reset(trace_token)
+        correlation_id.reset(id_token)
+        if TRACE_SLOW_MS >= 0 and trace.duration_ms >= TRACE_SLOW_MS:
+            _dump(trace, profiler, memory_report)
+
+
+def bind_context(func):
+    """
+    Wrap `func` for a thread pool so each call runs with the caller's trace, span and correlation ID.
+
+    Args:
+        func: Callable submitted to an executor
+
+    Returns:
+        Callable: Wrapper running every call in its own copy of the current context
+    """
+    context = copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def _start_profiler() -> cProfile.Profile:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Python 3.12+ allows a single active profiler per process
+        logger.warning(f"Profiling skipped for this document: {e}")
+        return None
+    return profiler
+
+
+_memory_lock = threading.Lock()
+_memory_users = 0
+_memory_started = False
+
+
+def _start_memory():
+    """Start tracemalloc (shared by concurrent documents) and return (baseline snapshot, current bytes)."""
+    global _memory_users, _memory_started
+    with _memory_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_started = True
+        _memory_users += 1
+        if _memory_users == 1:
+            tracemalloc.reset_peak()
+    return tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[0]
+
+
+def _stop_memory(baseline, trace: Trace) -> str:
+    """Record the peak growth on the trace and return the top allocation sites since the baseline."""
+    global _memory_users, _memory_started
+    snapshot_before, current_before = baseline
+    snapshot_after = tracemalloc.take_snapshot()
+    trace.memory_peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - current_before)
+    with _memory_lock:
+        _memory_users -= 1
+        if _memory_users == 0 and _memory_started:
+            tracemalloc.stop()
+            _memory_started = False
+
+    top = snapshot_after.compare_to(snapshot_before, "lineno")[:MEMORY_TOP_LINES]
+    return "\n".join(str(stat) for stat in top) + "\n"
+
+
+def _dump(trace: Trace, profiler: cProfile.Profile, memory_report: str):
+    """Write a trace and its captures to TRACE_DIR; failures are logged, never raised."""
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = trace.started_at.strftime("%Y%m%dT%H%M%S")
+        base = os.path.join(TRACE_DIR, f"{stamp}-{_UNSAFE_FILENAME.sub('_', trace.correlation_id)}")
+        with open(f"{base}.trace.json", "w", encoding="utf-8") as f:
+            json.dump(trace.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+        if profiler is not None:
+            profiler.dump_stats(f"{base}.prof")
+        if memory_report is not None:
+            with open(f"{base}.memory.txt", "w", encoding="utf-8") as f:
+                f.write(memory_report)
+        logger.info(f"Trace of {trace.duration_ms:.0f} ms written to {base}.trace.json")
+    except Exception as e:
+        logger.error(f"Failed to write trace {trace.correlation_id}: {e}")
@@ -4,6 +4,7 @@ Checks completeness of form fields and calculates validation scores.
 """
 
 from services.logger_config import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -24,15 +25,12 @@ def validate_completeness(form_data: dict, required_fields: list[str] = None) ->
             raise ValueError("form_data must be a dictionary.")
 
         if required_fields is None:
-            # If not passed, auto-detect all keys (recursively)
-            required_fields = _flatten_keys(form_data)
-
-        missing = []
-
-        for key_path in required_fields:
-            value = _get_nested_value(form_data, key_path)
-            if value == "":
-                missing.append(key_path)
+            # If not passed, auto-detect all keys (recursively), reading the values in the same pass
+            items = _flatten_items(form_data)
+            required_fields = [key_path for key_path, _ in items]
+            missing = [key_path for key_path, value in items if not isinstance(value, str) or value == ""]
+        else:
+            missing = [key_path for key_path in required_fields if _get_nested_value(form_data, key_path) == ""]
 
         completeness_score = round(1 - len(missing) / len(required_fields), 2)
         logger.info(f"Validation complete. Score: {completeness_score}")
@@ -53,17 +51,25 @@ def _flatten_keys(d: dict, parent_key: str = "") -> list[str]:
     Convert nested dictionary keys to dot notation paths.
     Example: {'a': {'b': 1}} -> ['a.b']
     """
+    return [key_path for key_path, _ in _flatten_items(d, parent_key)]
+
+
+def _flatten_items(d: dict, parent_key: str = "") -> list[tuple[str, object]]:
+    """
+    Convert a nested dictionary to (dot notation path, leaf value) pairs.
+    Example: {'a': {'b': 1}} -> [('a.b', 1)]
+    """
     try:
-        keys = []
+        items = []
         for k, v in d.items():
             full_key = f"{parent_key}.{k}" if parent_key else k
             if isinstance(v, dict):
-                keys += _flatten_keys(v, full_key)
+                items += _flatten_items(v, full_key)
             else:
-                keys.append(full_key)
-        return keys
+                items.append((full_key, v))
+        return items
     except Exception as e:
-        logger.error(f"Error in _flatten_keys: {e}")
+        logger.error(f"Error in _flatten_items: {e}")
         raise
 
 
@@ -0,0 +1,123 @@
+"""
+Process warm-up.
+Heavy SDKs are imported lazily (see services.lazy_imports), so the first
+document a process handles would otherwise pay for the imports, template
+loading, client creation and TLS handshakes. `warm_up` does that work up
+front, before a worker claims jobs or the API accepts uploads.
+
+Usage:
+    python -m services.warmup
+    python -m services.warmup --no-connect
+"""
+
+from services.environment import configure
+
+if __name__ == "__main__":
+    configure()  # Before services.config reads the environment
+
+from services.logger_config import logging
+from services.config import (
+    DOCUMENT_ENDPOINT, DOCUMENT_KEY, OPENAI_ENDPOINT, OPENAI_KEY,
+    IMAGE_PREPROCESSING, RESULTS_STORE_DIR, WARMUP_CONNECT
+)
+from services.clients import clients
+from services.document_ocr import get_ocr_cache
+from services.openai_helpers import form_label_words, get_llm_cache
+from services.postprocessing import get_stripper
+from services.prompt_compaction import template_field_names
+from services.template_registry import registry
+import argparse
+import importlib
+import json
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Modules every processing pipeline imports on its first document
+PIPELINE_MODULES = (
+    "numpy", "httpx", "requests", "openai", "azure.core.pipeline.transport",
+    "azure.ai.documentintelligence", "azure.ai.documentintelligence.aio", "azure.ai.documentintelligence.models"
+)
+
+
+def warm_up(create_clients: bool = True, connect: bool = WARMUP_CONNECT) -> dict:
+    """
+    Prepare the process for its first document.
+
+    Steps run in order and are timed; a failing step is logged and skipped,
+    so warm-up never prevents a process from starting.
+
+    Args:
+        create_clients: Import the SDKs and create the pooled service clients
+        connect: Also open a connection to each service endpoint
+
+    Returns:
+        dict: Milliseconds per step, or None for a step that failed
+    """
+    steps = [("templates", _load_templates), ("caches", _open_caches)]
+    if create_clients:
+        steps += [("imports", _import_modules), ("clients", _create_clients)]
+        if connect:
+            steps.append(("connections", clients.open_connections))
+
+    timings = {}
+    start = time.perf_counter()
+    for name, step in steps:
+        step_start = time.perf_counter()
+        try:
+            step()
+            timings[name] = round((time.perf_counter() - step_start) * 1000, 1)
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+            timings[name] = None
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Warm-up finished in {timings['total']:.0f} ms: {timings}")
+    return timings
+
+
+def _load_templates():
+    """Load every prompt and template and build the regexes derived from them."""
+    get_stripper()
+    form_label_words()
+    for form_type in registry.form_types():
+        for language in registry.languages(form_type):
+            template_field_names(registry.get_template(language, form_type).template_json)
+        template_field_names(registry.combined_templates_json(form_type))
+
+
+def _open_caches():
+    get_llm_cache()
+    get_ocr_cache()
+
+
+def _import_modules():
+    modules = list(PIPELINE_MODULES)
+    if IMAGE_PREPROCESSING:
+        modules += ["PIL.Image", "PIL.ImageOps"]
+    if RESULTS_STORE_DIR:
+        modules += ["pyarrow", "pyarrow.compute", "pyarrow.dataset", "pyarrow.parquet"]
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _create_clients():
+    if DOCUMENT_ENDPOINT and DOCUMENT_KEY:
+        clients.get_document_client(DOCUMENT_ENDPOINT, DOCUMENT_KEY)
+    if OPENAI_ENDPOINT and OPENAI_KEY:
+        clients.get_openai_client(OPENAI_ENDPOINT, OPENAI_KEY)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm up imports, templates, caches, clients and connections.")
+    parser.add_argument("--no-clients", action="store_true", help="Skip SDK imports and client creation")
+    parser.add_argument("--no-connect", action="store_true", help="Do not open connections to the services")
+    args = parser.parse_args(argv)
+
+    timings = warm_up(create_clients=not args.no_clients, connect=WARMUP_CONNECT and not args.no_connect)
+    print(json.dumps(timings))
+    return 0 if all(value is not None for value in timings.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
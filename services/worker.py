@@ -0,0 +1,212 @@
+"""
+Queue worker for service mode.
+Claims jobs from the durable job queue and runs the document pipeline on them
+with a pool of threads, renewing each job's lease while it is processed.
+Throughput scales by running more worker processes against the same queue.
+
+Usage:
+    python -m services.worker --concurrency 8 --warmup
+    python -m services.worker --requeue-dead
+"""
+
+from services.environment import configure
+
+if __name__ == "__main__":
+    configure()  # Before services.config reads the environment
+
+from services.logger_config import logging
+from services.config import (
+    OPENAI_ENDPOINT, OPENAI_KEY, OCR_CONCURRENCY, OPENAI_CONCURRENCY, EXTRACTION_MODE, METRICS_PORT,
+    JOB_DB_PATH, WORKER_CONCURRENCY, WORKER_POLL_SECONDS, WARMUP
+)
+from services.job_queue import Job, JobQueue
+from services.openai_helpers import init_openai_client
+from services.pipeline import process_document
+from services.monitoring import monitoring
+from services.rate_limit import is_retryable
+from services.results_store import results_store
+from services.metrics_exporter import start_metrics_exporter
+from services.warmup import warm_up
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether another attempt at a failed job may succeed.
+
+    Throttling, 408/5xx responses and connection errors are transient; deterministic
+    errors (Azure 4xx, invalid documents, unparseable model output) would fail again.
+    """
+    return is_retryable(error) or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class Worker:
+    """Pool of threads processing queued jobs until stopped."""
+
+    def __init__(self, queue: JobQueue, openai_client, concurrency: int = WORKER_CONCURRENCY,
+                 poll_seconds: float = WORKER_POLL_SECONDS, ocr_concurrency: int = OCR_CONCURRENCY,
+                 openai_concurrency: int = OPENAI_CONCURRENCY, worker_id: str = None, document_client=None):
+        """
+        Args:
+            queue: Job queue to claim from
+            openai_client: Initialized OpenAI client
+            concurrency: Jobs processed at once by this process
+            poll_seconds: Idle wait between claims when the queue is empty
+            ocr_concurrency: Maximum concurrent Azure OCR calls of this process
+            openai_concurrency: Maximum concurrent OpenAI calls of this process
+            worker_id: Lease owner name (defaults to host and process id)
+            document_client: Document Intelligence client (defaults to the shared pooled client)
+        """
+        self.queue = queue
+        self.openai_client = openai_client
+        self.document_client = document_client
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._ocr_limiter = threading.BoundedSemaphore(ocr_concurrency)
+        self._llm_limiter = threading.BoundedSemaphore(openai_concurrency)
+        self._stop = threading.Event()
+        self._active: set[str] = set()
+        self._active_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def run(self, exit_when_empty: bool = False):
+        """
+        Process jobs until `stop` is called (or the queue is empty, with `exit_when_empty`).
+
+        Jobs being processed when stopping are finished first.
+        """
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} threads")
+        heartbeat = threading.Thread(target=self._heartbeat, name="worker-heartbeat", daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._loop, args=(exit_when_empty,), name=f"worker-{index}")
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._stop.set()
+        logger.info(f"Worker {self.worker_id} stopped: {self.processed} processed, {self.failed} failed")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, exit_when_empty: bool):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                if exit_when_empty:
+                    return
+                self._stop.wait(self.poll_seconds)
+                continue
+            try:
+                self._process(job)
+            except Exception as e:
+                # The job's lease expires and another attempt picks it up
+                logger.error(f"Failed to record the outcome of job {job.id}: {e}")
+
+    def _process(self, job: Job):
+        with self._active_lock:
+            self._active.add(job.id)
+        try:
+            options = job.options
+            with monitoring.track_in_flight("documents_in_flight"):
+                result = process_document(
+                    job.document, self.openai_client,
+                    ocr_limiter=self._ocr_limiter, llm_limiter=self._llm_limiter,
+                    extraction_mode=options.get("extraction_mode", EXTRACTION_MODE),
+                    form_type=options.get("form_type"), document_client=self.document_client,
+                    document_id=job.id
+                )
+            completed = self.queue.complete(job.id, self.worker_id, result)
+        except Exception as e:
+            with self._active_lock:
+                self.failed += 1
+            monitoring.log_error(error_type=type(e).__name__, error_message=str(e))
+            logger.error(f"Job {job.id} failed on attempt {job.attempts}: {e}")
+            try:
+                self.queue.fail(job.id, self.worker_id, f"{type(e).__name__}: {e}", retryable=is_transient(e))
+            except Exception as fail_error:
+                # The job's lease expires and another attempt picks it up
+                logger.error(f"Failed to record the failure of job {job.id}: {fail_error}")
+            return
+        finally:
+            with self._active_lock:
+                self._active.discard(job.id)
+
+        if completed:
+            with self._active_lock:
+                self.processed += 1
+            if results_store is not None:
+                try:
+                    results_store.append(job.id, result, form_type=options.get("form_type"))
+                except Exception as e:
+                    logger.error(f"Failed to store results of job {job.id}: {e}")
+
+    def _heartbeat(self):
+        """Renew the leases of jobs in progress three times per lease period."""
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            with self._active_lock:
+                active = list(self._active)
+            for job_id in active:
+                try:
+                    if not self.queue.heartbeat(job_id, self.worker_id):
+                        logger.warning(f"Lost the lease of job {job_id}")
+                except Exception as e:
+                    logger.error(f"Failed to renew the lease of job {job_id}: {e}")
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process queued documents from the job queue.")
+    parser.add_argument("--db", default=JOB_DB_PATH, help="Job queue database")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs processed at once")
+    parser.add_argument("--poll-seconds", type=float, default=WORKER_POLL_SECONDS,
+                        help="Idle wait between claims when the queue is empty")
+    parser.add_argument("--ocr-concurrency", type=int, default=OCR_CONCURRENCY, help="Concurrent Azure OCR calls")
+    parser.add_argument("--openai-concurrency", type=int, default=OPENAI_CONCURRENCY, help="Concurrent OpenAI calls")
+    parser.add_argument("--exit-when-empty", action="store_true", help="Stop once no job is available")
+    parser.add_argument("--requeue-dead", action="store_true", help="Queue dead-lettered jobs again and exit")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve Prometheus metrics on this local port (-1 disables)")
+    parser.add_argument("--warmup", action=argparse.BooleanOptionalAction, default=WARMUP,
+                        help="Import SDKs, create clients and open connections before claiming jobs")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.requeue_dead:
+        print(json.dumps({"requeued": queue.requeue_dead()}))
+        return 0
+
+    start_metrics_exporter(args.metrics_port)
+    if args.warmup:
+        warm_up()
+    worker = Worker(
+        queue, init_openai_client(OPENAI_ENDPOINT, OPENAI_KEY),
+        concurrency=args.concurrency,
+        poll_seconds=args.poll_seconds,
+        ocr_concurrency=args.ocr_concurrency,
+        openai_concurrency=args.openai_concurrency
+    )
+    # Finish the jobs in progress on Ctrl+C or `docker stop`; unfinished leases would otherwise have to expire
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+    worker.run(exit_when_empty=args.exit_when_empty)
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
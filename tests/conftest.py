@@ -0,0 +1,21 @@
+"""
+Test settings.
+The services read their configuration from the environment at import time,
+so the test values are set here, before any test module imports them: the
+on-disk caches are disabled. Tests never call `services.environment.configure`,
+so no .env file is loaded and no log file is written.
+"""
+
+import os
+import sys
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="form-parser-tests-")
+
+os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_MODE", "off")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_TEST_DIR, "llm_cache.sqlite3"))
+os.environ.setdefault("RESULTS_STORE_DIR", "")
+os.environ.setdefault("METRICS_PORT", "-1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import pytest
+
+from services.job_queue import JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    job_queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=30, max_attempts=2, retry_delay_seconds=0)
+    yield job_queue
+    job_queue.close()
+
+
+def test_claim_leases_the_oldest_job_once(queue):
+    first = queue.submit(b"first", "first.pdf")
+    queue.submit(b"second", "second.pdf")
+
+    job = queue.claim("worker-1")
+
+    assert job.id == first.id
+    assert job.status == "running"
+    assert job.attempts == 1
+    assert job.document == b"first"
+    assert queue.claim("worker-2").id != first.id
+    assert queue.claim("worker-3") is None
+
+
+def test_resubmitting_returns_the_same_job(queue):
+    assert queue.submit(b"document").id == queue.submit(b"document").id
+    assert queue.submit(b"document", options={"extraction_mode": "combined"}).id != queue.submit(b"document").id
+
+
+def test_expired_lease_is_claimed_again(queue):
+    queue.lease_seconds = 0.05
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+    assert queue.claim("worker-2") is None
+
+    time.sleep(0.1)
+    reclaimed = queue.claim("worker-2")
+
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+    assert not queue.complete(job.id, "worker-1", {"late": True})
+    assert queue.complete(job.id, "worker-2", {"ok": True})
+    assert queue.get(job.id).result == {"ok": True}
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    queue.lease_seconds = 0.2
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+
+    time.sleep(0.12)
+    assert queue.heartbeat(job.id, "worker-1")
+    time.sleep(0.12)
+
+    assert queue.claim("worker-2") is None
+    assert not queue.heartbeat(job.id, "worker-2")
+
+
+def test_failed_attempt_is_retried_with_backoff(queue):
+    queue.retry_delay_seconds = 60
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+
+    assert queue.fail(job.id, "worker-1", "ServiceRequestError: timeout") == "queued"
+    assert queue.get(job.id).error == "ServiceRequestError: timeout"
+    # Not claimable before the retry delay has passed
+    assert queue.claim("worker-1") is None
+
+
+def test_job_is_dead_lettered_after_the_last_attempt(queue):
+    job = queue.submit(b"document")
+    for attempt in range(1, queue.max_attempts + 1):
+        assert queue.claim("worker-1").attempts == attempt
+        status = queue.fail(job.id, "worker-1", "error")
+
+    assert status == "dead"
+    assert queue.claim("worker-1") is None
+    assert queue.stats()["dead"] == 1
+
+
+def test_non_retryable_failure_is_dead_lettered_at_once(queue):
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+
+    assert queue.fail(job.id, "worker-1", "ValueError: bad input", retryable=False) == "dead"
+    assert queue.get(job.id).attempts == 1
+
+
+def test_expired_lease_after_the_last_attempt_is_dead_lettered(queue):
+    queue.lease_seconds = 0.05
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+    queue.fail(job.id, "worker-1", "error")
+    queue.claim("worker-1")  # Last attempt; the worker dies without reporting
+
+    time.sleep(0.1)
+
+    assert queue.claim("worker-2") is None
+    assert queue.get(job.id).status == "dead"
+
+
+def test_requeue_dead_gives_fresh_attempts(queue):
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+    queue.fail(job.id, "worker-1", "error", retryable=False)
+
+    assert queue.requeue_dead(job.id) == 1
+    assert queue.get(job.id).error is None
+    assert queue.claim("worker-1").attempts == 1
+
+
+def test_fail_after_losing_the_lease_is_ignored(queue):
+    job = queue.submit(b"document")
+    queue.claim("worker-1")
+
+    assert queue.fail(job.id, "worker-2", "error") is None
+    assert queue.get(job.id).status == "running"
+
+
+def test_concurrent_processes_claim_and_fail_without_lock_errors(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queues = [JobQueue(path, max_attempts=1, retry_delay_seconds=0) for _ in range(4)]
+    for index in range(40):
+        queues[0].submit(f"document {index}".encode())
+    errors = []
+
+    def work(job_queue, worker_id):
+        try:
+            while (job := job_queue.claim(worker_id)) is not None:
+                job_queue.fail(job.id, worker_id, "error")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(job_queue, f"worker-{index}"))
+               for index, job_queue in enumerate(queues)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert queues[0].stats()["dead"] == 40
+    for job_queue in queues:
+        job_queue.close()
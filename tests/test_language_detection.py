@@ -0,0 +1,54 @@
+from services.openai_helpers import detect_language_local
+
+# OCR of the printed (Hebrew) form filled in with short English answers
+ENGLISH_FILLED_FORM = """המוסד לביטוח לאומי
+מינהל הביטוח והגמלאות
+בקשה למתן טיפול רפואי לנפגע עבודה - עצמאי
+לכבוד קופת חולים
+תאריך מילוי הטופס 01 02 2024
+תאריך קבלת הטופס בקופה 03 02 2024
+1 פרטי התובע
+שם משפחה Cohen
+שם פרטי Dana
+ת. ז. 123456789
+מין זכר נקבה
+תאריך לידה 02 03 1984
+רחוב / תא דואר Herzl
+מס' בית 12 כניסה A דירה 4
+ישוב Haifa מיקוד 3456712
+טלפון קווי 049876543 טלפון נייד 0541234567
+אני מבקש לקבל עזרה רפואית בגלל פגיעה בעבודה כעצמאי
+סוג העבודה Driver
+2 פרטי התאונה
+בתאריך 14 04 2023 בשעה 14:30
+כאשר עבדתי במפעל ת. דרכים בעבודה ת. דרכים בדרך לעבודה/מהעבודה תאונה בדרך ללא רכב אחר
+כתובת מקום התאונה Haifa port
+נסיבות הפגיעה / תאור התאונה Slipped on a wet floor
+האיבר שנפגע Leg
+3 הצהרה
+הנני מצהיר כי כל הפרטים שמסרתי בטופס זה הם נכונים ומלאים
+שם המבקש Dana Cohen
+חתימה Dana
+4 למילוי ע"י המוסד הרפואי
+הנפגע חבר בקופת חולים כללית מאוחדת מכבי לאומית
+מהות התאונה (אבחנות רפואיות)"""
+
+HEBREW_FILLED_FORM = """שם משפחה כהן
+שם פרטי דנה
+סוג העבודה מלצרות
+כתובת מקום התאונה הנשיא 5 חיפה
+נסיבות הפגיעה / תאור התאונה החלקתי על רצפה רטובה ונפלתי על היד
+האיבר שנפגע יד שמאל"""
+
+
+def test_english_filled_form_is_english():
+    assert detect_language_local(ENGLISH_FILLED_FORM) == "English"
+
+
+def test_hebrew_filled_form_is_hebrew():
+    assert detect_language_local(HEBREW_FILLED_FORM) == "Hebrew"
+
+
+def test_unfilled_form_is_inconclusive():
+    unfilled = "\n".join(["המוסד לביטוח לאומי", "שם משפחה", "שם פרטי", "סוג העבודה", "האיבר שנפגע", "חתימה"])
+    assert detect_language_local(unfilled) is None
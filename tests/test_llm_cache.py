@@ -0,0 +1,48 @@
+import pytest
+
+from services.cache import CacheBackend, CacheMissError, MemoryLRUCache
+from services import openai_helpers
+from services.openai_helpers import _lookup_completion
+
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hello"}]}
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = MemoryLRUCache(16)
+    monkeypatch.setattr(openai_helpers, "get_llm_cache", lambda: cache)
+    return cache
+
+
+def test_unknown_cache_mode_is_rejected():
+    with pytest.raises(ValueError, match="read_only"):
+        _lookup_completion(REQUEST, cache_mode="read_only")
+
+
+def test_off_mode_skips_the_cache():
+    assert _lookup_completion(REQUEST, cache_mode="off") == (None, None, None)
+
+
+def test_cache_only_mode_raises_on_a_miss(memory_cache):
+    with pytest.raises(CacheMissError):
+        _lookup_completion(REQUEST, cache_mode="cache_only")
+
+
+def test_read_write_mode_returns_cached_content(memory_cache):
+    memory_cache.set(openai_helpers.llm_cache_key(REQUEST), b'{"ok": true}')
+
+    _, _, content = _lookup_completion(REQUEST, cache_mode="READ_WRITE")
+
+    assert content == '{"ok": true}'
+
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+    class Incomplete(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
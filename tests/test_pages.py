@@ -0,0 +1,35 @@
+from services import pages as pages_module
+from services.pages import _merge_combined, translate_form_data
+
+
+def test_hebrew_form_data_translates_to_english_keys():
+    translated = translate_form_data({"שם פרטי": "דנה", "תאריך לידה": {"יום": "02", "חודש": "03", "שנה": "1984"}},
+                                     "Hebrew", "English")
+
+    assert translated == {"firstName": "דנה", "dateOfBirth": {"day": "02", "month": "03", "year": "1984"}}
+
+
+def test_minority_language_pages_are_merged_in_page_order():
+    results = [
+        ("English", {"firstName": "", "lastName": "Cohen"}),
+        ("Hebrew", {"שם פרטי": "Dana", "שם משפחה": "Levi", "טלפון נייד": "0541234567"}),
+        ("English", {"firstName": "Dan", "mobilePhone": ""}),
+    ]
+
+    language, form_data = _merge_combined(results)
+
+    assert language == "English"
+    assert form_data == {"firstName": "Dana", "lastName": "Cohen", "mobilePhone": "0541234567"}
+
+
+def test_replayed_split_bundle_does_not_observe_first_field(monkeypatch):
+    observed = []
+    monkeypatch.setattr(pages_module, "_should_split", lambda pages: True)
+    monkeypatch.setattr(pages_module, "extract_pages", lambda *args, **kwargs: {"firstName": "Dana"})
+    monkeypatch.setattr(pages_module.monitoring, "observe_stage", lambda stage, ms: observed.append(stage))
+
+    stream = pages_module.stream_extract_pages([], "English", openai_client=None)
+
+    assert list(stream) == [(("firstName",), "Dana")]
+    assert stream.result == {"firstName": "Dana"}
+    assert "extraction_first_field" not in observed
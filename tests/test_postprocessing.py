@@ -0,0 +1,31 @@
+from services.postprocessing import compile_phrases, postprocess_ocr
+
+
+def strip(text: str, phrases: list[str]) -> str:
+    return compile_phrases(phrases).sub("", text)
+
+
+def test_longest_nested_phrase_wins_regardless_of_order():
+    text = "header עמוד 1 מתוך 2 footer"
+
+    assert strip(text, ["עמוד 1", "עמוד 1 מתוך 2"]) == "header  footer"
+    assert strip(text, ["עמוד 1 מתוך 2", "עמוד 1"]) == "header  footer"
+
+
+def test_overlapping_phrases_remove_the_leftmost():
+    assert strip("xabcx", ["bc", "ab"]) == "xcx"
+
+
+def test_removal_does_not_create_new_matches():
+    # Sequential str.replace would remove "ac" once "b" is gone
+    assert strip("abc", ["b", "ac"]) == "ac"
+
+
+def test_empty_phrase_list_matches_nothing():
+    assert compile_phrases(["", ""]) is None
+
+
+def test_postprocess_ocr_strips_the_form_boilerplate():
+    text = "שם פרטי דנה עמוד 1 מתוך 2\nבל/ 283 (05.2010)"
+
+    assert postprocess_ocr(text).split() == ["שם", "פרטי", "דנה"]
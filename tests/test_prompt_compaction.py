@@ -0,0 +1,35 @@
+from services.prompt_compaction import compact_text
+from services.template_registry import registry
+
+
+def english_template_json() -> str:
+    return registry.get_template("English").template_json
+
+
+def test_fields_sharing_a_value_keep_it():
+    text = "\n".join([
+        "Date of injury", "01/02/2024",
+        "Form filling date", "01/02/2024",
+        "Landline phone", "0501234567",
+        "Mobile phone", "0501234567",
+    ])
+
+    result = compact_text(text, english_template_json())
+
+    assert result.text.splitlines() == text.splitlines()
+    assert result.dropped_lines == 0
+
+
+def test_repeated_page_header_is_dropped():
+    header = "National Insurance Institute of Israel"
+    text = "\n".join([header, "First name", "Dana", header, "Last name", "Cohen"])
+
+    result = compact_text(text, english_template_json())
+
+    assert result.text.splitlines() == [header, "First name", "Dana", "Last name", "Cohen"]
+
+
+def test_short_repeated_lines_are_kept():
+    text = "\n".join(["Gender", "Male", "Signature", "Male"])
+
+    assert compact_text(text, english_template_json()).text.splitlines() == text.splitlines()
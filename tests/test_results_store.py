@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+import pytest
+
+from services.results_store import ResultsStore, completeness_analytics, ingest_jsonl
+
+
+def parquet_dirs(root) -> list[str]:
+    return sorted(os.path.basename(directory) for directory, _, files in os.walk(root)
+                  if any(name.endswith(".parquet") for name in files))
+
+
+def test_rows_are_flushed_without_a_further_append(tmp_path):
+    store = ResultsStore(str(tmp_path), flush_rows=100, flush_seconds=0.1)
+    store.append("doc-1", {"language": "English", "form_data": {"firstName": "Dana"}})
+
+    deadline = time.monotonic() + 2
+    while not parquet_dirs(tmp_path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    store.close()
+
+    assert len(parquet_dirs(tmp_path)) == 1
+
+
+def test_ingest_keeps_the_record_timestamp(tmp_path):
+    results = tmp_path / "results.jsonl"
+    records = [
+        {"id": "a", "status": "ok", "processed_at": "2024-01-05T10:00:00+00:00", "language": "English",
+         "form_data": {"firstName": "Dana"}},
+        {"id": "b", "status": "error", "error": "boom"},
+    ]
+    results.write_text("\n".join(json.dumps(record) for record in records) + "\n", encoding="utf-8")
+    root = tmp_path / "store"
+
+    assert ingest_jsonl(str(results), ResultsStore(str(root))) == 1
+    assert parquet_dirs(root) == ["date=2024-01-05"]
+    report = completeness_analytics(str(root), since="2024-01-01")["national_insurance"]["English"]
+    assert report["documents"] == 1
+    assert report["missing_rate"]["firstName"] == 0.0
+
+
+def test_rows_of_a_failed_write_are_kept_for_the_next_flush(tmp_path, monkeypatch):
+    store = ResultsStore(str(tmp_path), flush_rows=100, flush_seconds=0)
+    store.append("doc-1", {"language": "English", "form_data": {"firstName": "Dana"}})
+    store.append("doc-2", {"language": "Hebrew", "form_data": {"שם פרטי": "דנה"}})
+    write = store._write
+    calls = []
+
+    def fail_once(layout, date, rows):
+        calls.append(layout.language)
+        if len(calls) == 1:
+            raise OSError("No space left on device")
+        write(layout, date, rows)
+
+    monkeypatch.setattr(store, "_write", fail_once)
+    with pytest.raises(OSError):
+        store.flush()
+    # The partition after the failing one was still written
+    assert len(calls) == 2 and len(parquet_dirs(tmp_path)) == 1
+
+    store.append("doc-3", {"language": calls[0], "form_data": {}})
+    assert store.flush() == 2
+    report = completeness_analytics(str(tmp_path))["national_insurance"]
+    assert sum(language["documents"] for language in report.values()) == 3
@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.fakes import CannedResponder, FakeOpenAIClient
+from services import openai_helpers
+from services.openai_helpers import extract_form_data, stream_form_data
+
+TEXT = "שם משפחה: כהן\nשם פרטי: דנה"
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(openai_helpers.openai_scheduler, "settle", lambda tokens, actual: calls.append(actual))
+    return calls
+
+
+def client(api_version: str = None) -> FakeOpenAIClient:
+    fake = FakeOpenAIClient(CannedResponder(language="Hebrew"))
+    if api_version is not None:
+        fake._api_version = api_version
+    return fake
+
+
+def test_streamed_result_matches_and_settles_with_reported_usage(settled):
+    expected = extract_form_data(TEXT, "Hebrew", client(), cache_mode="off")
+    settled.clear()
+
+    stream = stream_form_data(TEXT, "Hebrew", client("2024-10-21"), cache_mode="off")
+    fields = list(stream)
+
+    assert fields and stream.result == expected
+    assert len(settled) == 1 and settled[0]
+
+
+def test_old_api_version_is_not_sent_stream_options(settled):
+    stream = stream_form_data(TEXT, "Hebrew", client("2023-07-01-preview"), cache_mode="off")
+    list(stream)
+
+    # Without stream_options no usage is reported; the bucket keeps the estimate
+    assert settled == [None]
+    assert stream.result
+
+
+def test_abandoned_stream_is_recorded_and_settled(settled, monkeypatch):
+    calls = []
+    monkeypatch.setattr(openai_helpers.monitoring, "log_api_call",
+                        lambda api_name, duration, success: calls.append((api_name, success)))
+
+    stream = stream_form_data(TEXT, "Hebrew", client("2024-10-21"), cache_mode="off")
+    fields = iter(stream)
+    next(fields)
+    fields.close()  # What happens when the consumer's loop breaks or raises
+
+    assert calls == [("openai", False)]
+    # Charged for the prompt and the chunks received, not the full completion estimate
+    assert len(settled) == 1 and settled[0]
+    assert stream.result is None